@@ -0,0 +1,299 @@
+"""
+위험성 평가 결과 PDF 렌더러 (현장 출력/서명용)
+여러 프로세스에서 일괄 렌더링할 수 있도록 앱 파일과 분리된 모듈 (Streamlit 의존성 없음)
+"""
+import os
+import re
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+# PDF 내보내기는 fpdf2가 설치된 경우에만 사용
+try:
+    from fpdf import FPDF
+    from fpdf.fonts import FontFace
+except ImportError:
+    FPDF = None
+
+# 한글 글꼴 후보 경로 (PDF_FONT_PATH 미지정 시 순서대로 탐색)
+PDF_FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/nanum/NanumGothic.ttf",
+    "/usr/share/fonts/nanum/NanumGothic.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSansKR-Regular.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansKR-Regular.otf",
+    "C:/Windows/Fonts/malgun.ttf",
+    "/Library/Fonts/NanumGothic.ttf",
+]
+# 위험등급 셀 색상 (배경, 글자)
+PDF_GRADE_COLORS = {
+    "C4": ((229, 57, 53), (255, 255, 255)),  # 빨간색
+    "C3": ((255, 152, 0), (0, 0, 0)),  # 주황색
+    "C2": ((255, 241, 118), (0, 0, 0)),  # 노랑색
+}
+# 위험성 평가표 컬럼 너비 비율 (A4 가로 기준)
+PDF_COLUMN_WEIGHTS = {
+    "순번": 4,
+    "작업 내용": 15,
+    "작업등급": 6,
+    "재해유형": 10,
+    "세부 위험요인": 25,
+    "위험등급-개선전": 7,
+    "위험성 감소대책": 31,
+    "위험등급-개선후": 7,
+}
+# 결재/서명란
+PDF_SIGNATURE_LABELS = ["작성자", "검토자", "승인자"]
+
+
+class PdfExportUnavailable(Exception):
+    """PDF 내보내기 환경이 갖춰지지 않은 경우 (fpdf2 미설치, 한글 글꼴 없음)"""
+
+
+def find_pdf_font(font_path: str = "") -> str:
+    """
+    사용할 한글 글꼴 경로 (지정 경로 우선, 없으면 후보 경로 탐색)
+    """
+    for candidate in ([font_path] if font_path else []) + PDF_FONT_CANDIDATES:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    return ""
+
+
+def pdf_export_status(font_path: str = "") -> str:
+    """
+    PDF 내보내기가 불가능한 사유 (가능하면 빈 문자열)
+    """
+    if FPDF is None:
+        return "PDF 내보내기에는 fpdf2 패키지가 필요합니다. (pip install fpdf2)"
+    if not find_pdf_font(font_path):
+        return "한글 글꼴을 찾을 수 없습니다. PDF_FONT_PATH 환경변수에 .ttf 글꼴 경로를 지정하세요."
+    return ""
+
+
+@lru_cache(maxsize=4)
+def load_pdf_layout(font_path: str = "") -> dict:
+    """
+    프로세스별로 한 번만 준비하는 글꼴/레이아웃 정보
+    """
+    status = pdf_export_status(font_path)
+    if status:
+        raise PdfExportUnavailable(status)
+    probe = FPDF(orientation="L", format="A4")
+    table_width = probe.w - probe.l_margin - probe.r_margin
+    total_weight = sum(PDF_COLUMN_WEIGHTS.values())
+    return {
+        "font_path": find_pdf_font(font_path),
+        "table_width": table_width,
+        "column_widths": tuple(weight * table_width / total_weight for weight in PDF_COLUMN_WEIGHTS.values()),
+        "header_style": FontFace(fill_color=(230, 230, 230)),
+        "grade_styles": {
+            grade: FontFace(fill_color=fill, color=color)
+            for grade, (fill, color) in PDF_GRADE_COLORS.items()
+        },
+    }
+
+
+def _plain_text(line: str) -> str:
+    """
+    마크다운 강조/제목 기호 제거
+    """
+    line = re.sub(r"^#+\s*", "", line.strip())
+    return line.replace("**", "").replace("__", "")
+
+
+def _render_assessment_pages(pdf, layout: dict, payload: dict) -> None:
+    """
+    분석 결과 한 건을 새 페이지부터 그림
+    payload: work_description, timestamp, used_references, sections(작업분석/추가안전조치/체크리스트), columns, rows
+    """
+    pdf.add_page()
+
+    # 머리말
+    pdf.set_font("korean", size=16)
+    pdf.cell(0, 10, "작업 위험성 평가서", new_x="LMARGIN", new_y="NEXT", align="C")
+    pdf.set_font("korean", size=9)
+    pdf.multi_cell(0, 5, f"작업 내용: {payload.get('work_description', '')}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 5, f"생성 시간: {payload.get('timestamp', '')}", new_x="LMARGIN", new_y="NEXT")
+    if payload.get("used_references"):
+        pdf.cell(0, 5, f"참조 파일: {', '.join(payload['used_references'])}", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(3)
+
+    sections = payload.get("sections", {})
+
+    def section_title(title):
+        pdf.set_font("korean", size=11)
+        pdf.cell(0, 7, title, new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("korean", size=9)
+
+    if sections.get("work_analysis"):
+        section_title("1. 작업 내용 분석")
+        for line in sections["work_analysis"].splitlines():
+            if line.strip():
+                pdf.multi_cell(0, 5, _plain_text(line), new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(2)
+
+    # 위험성 평가표 (위험등급 셀 색상 표시)
+    if payload.get("rows"):
+        section_title("2. 위험성 평가표")
+        pdf.set_font("korean", size=7)
+        columns = payload["columns"]
+        grade_positions = {pos for pos, column in enumerate(columns) if column.startswith("위험등급")}
+        with pdf.table(
+            col_widths=layout["column_widths"],
+            width=layout["table_width"],
+            headings_style=layout["header_style"],
+            line_height=4,
+            text_align="LEFT",
+            repeat_headings=1,
+        ) as table:
+            header = table.row()
+            for column in columns:
+                header.cell(column)
+            for values in payload["rows"]:
+                row = table.row()
+                for pos, value in enumerate(values):
+                    style = layout["grade_styles"].get(value) if pos in grade_positions else None
+                    row.cell(str(value), style=style)
+        pdf.ln(3)
+
+    if sections.get("additional_safety"):
+        section_title("3. 추가 안전 조치")
+        for line in sections["additional_safety"].splitlines():
+            if line.strip():
+                pdf.multi_cell(0, 5, _plain_text(line), new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(2)
+
+    # 체크리스트 (체크 표시용 빈 상자)
+    if sections.get("safety_checklist"):
+        section_title("4. 작업 전 체크리스트")
+        for line in sections["safety_checklist"].splitlines():
+            item = re.sub(r"^[-*]\s*(\[[ xX]?\]\s*)?", "", line.strip())
+            if not item:
+                continue
+            if pdf.will_page_break(5):
+                pdf.add_page()
+            pdf.rect(pdf.l_margin, pdf.get_y() + 1, 3.5, 3.5)
+            pdf.set_x(pdf.l_margin + 6)
+            pdf.multi_cell(0, 5, _plain_text(item), new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(2)
+
+    # 결재/서명란
+    if pdf.will_page_break(22):
+        pdf.add_page()
+    pdf.set_font("korean", size=9)
+    box_width = 35
+    pdf.set_x(pdf.w - pdf.r_margin - box_width * len(PDF_SIGNATURE_LABELS))
+    for label in PDF_SIGNATURE_LABELS:
+        pdf.cell(box_width, 6, label, border=1, align="C")
+    pdf.ln()
+    pdf.set_x(pdf.w - pdf.r_margin - box_width * len(PDF_SIGNATURE_LABELS))
+    for _ in PDF_SIGNATURE_LABELS:
+        pdf.cell(box_width, 14, "", border=1)
+    pdf.ln()
+
+
+def render_assessments_pdf(payloads, font_path: str = "") -> bytes:
+    """
+    분석 결과들을 하나의 PDF로 렌더링 (건마다 새 페이지)
+    fpdf2는 문서마다 글꼴을 다시 파싱하고 출력 시 글꼴을 제자리에서 서브셋하므로,
+    여러 건을 한 문서에 그려 글꼴 파싱을 문서당 한 번으로 줄임
+    """
+    layout = load_pdf_layout(font_path)
+    pdf = FPDF(orientation="L", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=12)
+    pdf.add_font("korean", fname=layout["font_path"])
+    for payload in payloads:
+        _render_assessment_pages(pdf, layout, payload)
+    return bytes(pdf.output())
+
+
+def render_assessment_pdf(payload: dict, font_path: str = "") -> bytes:
+    """
+    분석 결과 한 건을 PDF로 렌더링
+    """
+    return render_assessments_pdf([payload], font_path)
+
+
+def _init_render_worker(font_path: str) -> None:
+    # 작업 프로세스 시작 시 글꼴/레이아웃 준비
+    load_pdf_layout(font_path)
+
+
+# 글꼴 경로/작업 수별 렌더링 프로세스 풀 (프로세스 전체에서 재사용)
+_render_pools = {}
+_render_pools_lock = threading.Lock()
+
+
+def get_render_pool(font_path: str, workers: int) -> ProcessPoolExecutor:
+    """
+    처음 요청할 때 한 번만 만들어 재사용하는 렌더링 프로세스 풀
+    (내보낼 때마다 인터프리터 시작, fpdf2 import, 글꼴 준비 비용을 다시 내지 않도록 함)
+    Streamlit 서버의 스레드/잠금 상태를 fork하지 않도록 spawn 방식으로 작업 프로세스 생성
+    """
+    with _render_pools_lock:
+        pool = _render_pools.get((font_path, workers))
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_render_worker,
+                initargs=(font_path,),
+            )
+            _render_pools[(font_path, workers)] = pool
+        return pool
+
+
+def _discard_render_pool(font_path: str, workers: int, pool: ProcessPoolExecutor) -> None:
+    # 작업 프로세스가 비정상 종료된 풀은 버리고 다음 요청 때 새로 만듦
+    with _render_pools_lock:
+        if _render_pools.get((font_path, workers)) is pool:
+            del _render_pools[(font_path, workers)]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_pdf_batch(payloads, font_path: str = "", workers: int = 4, chunk_size: int = 25):
+    """
+    분석 결과들을 chunk_size건씩 한 PDF로 묶어 렌더링하고, 입력 순서대로 (묶은 건수, PDF bytes)를 반환하는 제너레이터
+    - 묶음이 하나뿐이면(소량) 현재 프로세스에서 렌더링
+    - 여러 묶음은 공유 프로세스 풀에서 병렬 렌더링하되, 미리 렌더링하는 묶음 수를 workers*2로 제한하여 메모리 사용을 일정하게 유지
+    """
+    def iter_chunks():
+        chunk = []
+        for payload in payloads:
+            chunk.append(payload)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    chunks = iter_chunks()
+    first_chunks = list(itertools.islice(chunks, 2))
+    chunks = itertools.chain(first_chunks, chunks)
+    if workers <= 1 or len(first_chunks) <= 1:
+        for chunk in chunks:
+            yield len(chunk), render_assessments_pdf(chunk, font_path)
+        return
+
+    executor = get_render_pool(font_path, workers)
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append((len(chunk), executor.submit(render_assessments_pdf, chunk, font_path)))
+            if len(pending) >= workers * 2:
+                count, future = pending.popleft()
+                yield count, future.result()
+        while pending:
+            count, future = pending.popleft()
+            yield count, future.result()
+    except BrokenProcessPool:
+        _discard_render_pool(font_path, workers, executor)
+        raise
+    finally:
+        # 중간에 멈춘 내보내기의 남은 묶음은 렌더링하지 않음
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,121 @@
+"""
+앱 파일의 함수/클래스 정의 부분(Streamlit UI 시작 전까지)을 모듈로 불러와 테스트에 제공
+앱 파일명에 점이 있어 import할 수 없으므로 UI 시작 표시 앞까지만 실행
+"""
+import csv
+import os
+import sys
+import types
+import warnings
+import logging
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(ROOT, "text_risk_assessment_app_0825_v0.1.py")
+UI_MARKER = "# Streamlit App UI"
+
+
+@pytest.fixture(scope="session")
+def app():
+    # 테스트에서는 외부 모델 호출 없이 참조자료 템플릿 백엔드 사용
+    os.environ.setdefault("MODEL_BACKEND", "template")
+    warnings.filterwarnings("ignore", module="streamlit")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    with open(APP_FILE, encoding="utf-8") as f:
+        source = f.read().split(UI_MARKER)[0]
+    module = types.ModuleType("risk_assessment_app")
+    module.__file__ = APP_FILE
+    sys.modules[module.__name__] = module
+    exec(compile(source, APP_FILE, "exec"), module.__dict__)
+    return module
+
+
+# 테스트용 참조자료 (작업 2개, 작업별 위험요인 4개)
+REFERENCE_ROWS = [
+    ("맨홀 밀폐공간 작업", "C3", "질식", "밀폐공간 내부 산소결핍으로 인한 질식 위험", "C3", "작업 전 산소·유해가스 농도 측정 및 환기", "C1"),
+    ("맨홀 밀폐공간 작업", "C3", "떨어짐", "맨홀 출입 시 사다리에서 추락 위험", "C3", "사다리 고정 및 안전대 착용", "C1"),
+    ("맨홀 밀폐공간 작업", "C3", "부딪힘", "도로 작업 중 통행 차량과 충돌 위험", "C2", "작업구역 라바콘 설치 및 신호수 배치", "C1"),
+    ("맨홀 밀폐공간 작업", "C3", "베임", "케이블 절단 공구 사용 중 손 베임", "C2", "절단 방지 장갑 착용", "C1"),
+    ("철탑 안테나 점검 작업", "C4", "떨어짐", "철탑 승강 중 추락 위험", "C4", "전신 안전대 및 추락방지대 사용", "C2"),
+    ("철탑 안테나 점검 작업", "C4", "맞음", "공구 및 자재 낙하로 인한 하부 작업자 맞음", "C3", "공구 낙하방지끈 사용 및 하부 출입 통제", "C1"),
+    ("철탑 안테나 점검 작업", "C4", "감전", "인접 전력선 접촉으로 인한 감전", "C3", "전력선 이격거리 확보", "C1"),
+    ("철탑 안테나 점검 작업", "C4", "온열질환", "하절기 고온 작업으로 인한 열사병", "C2", "휴식시간 부여 및 음료 비치", "C1"),
+]
+
+
+@pytest.fixture
+def reference_rows(app):
+    import pandas as pd
+
+    rows = pd.DataFrame(
+        [
+            ["참조.xlsx", "Sheet1", str(number), "통신", "설비", "현장", *values]
+            for number, values in enumerate(REFERENCE_ROWS, start=1)
+        ],
+        columns=app.REFERENCE_ROW_COLUMNS,
+    )
+    return app.to_compact_risk_frame(rows)
+
+
+# 참조 양식 CSV (제목 행 + 헤더 행, 병합 셀처럼 비어 있는 작업 정보 포함)
+REFERENCE_CSV_HEADER = ["No", "구분", "대분류", "중분류", "소분류(작업기준)", "작업등급", "재해유형", "세부 위험요인", "위험등급", "위험성 감소대책", "위험등급"]
+REFERENCE_CSV_ROWS = [
+    ["1", "통신", "설비", "현장", "맨홀 밀폐공간 작업", "C3", "질식", "산소결핍으로 인한 질식 위험", "C3", "산소농도 측정", "C1"],
+    ["2", "", "", "", "", "", "떨어짐", "사다리 추락 위험", "C3", "사다리 고정", "C1"],
+    ["3", "통신", "설비", "현장", "철탑 안테나 점검 작업", "C4", "떨어짐", "철탑 승강 중 추락 위험", "C4", "전신 안전대 사용", "C2"],
+    ["4", "", "", "", "", "", "감전", "인접 전력선 접촉 감전", "C3", "이격거리 확보", "C1"],
+]
+
+
+@pytest.fixture
+def reference_file(app, tmp_path, monkeypatch):
+    """
+    참조 CSV 파일을 쓰고 참조 파일 목록(reference_files 형식)을 반환하는 함수 (버전 기록은 임시 폴더에)
+    """
+    monkeypatch.setattr(app, "REFERENCE_VERSION_FOLDER", str(tmp_path / "reference_versions"))
+    path = tmp_path / "참조.csv"
+    state = {"mtime": 1_700_000_000}
+
+    def write(rows):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["위험성 평가표"] + [""] * (len(REFERENCE_CSV_HEADER) - 1))
+            writer.writerow(REFERENCE_CSV_HEADER)
+            writer.writerows(rows)
+        # 캐시가 파일 수정 시각 기준이므로 쓸 때마다 수정 시각을 앞으로 옮김
+        state["mtime"] += 10
+        os.utime(path, (state["mtime"], state["mtime"]))
+        return {"참조.csv": {"path": str(path), "modified": "", "size": os.path.getsize(path)}}
+
+    return write
+
+
+# 테스트용 위험성 평가표 행 (RISK_TABLE_COLUMNS 순서)
+ASSESSMENT_TABLE_ROWS = [
+    ["1", "맨홀 밀폐공간 작업", "C3", "질식", "산소결핍으로 인한 질식 위험", "C4(매우높음)", "산소농도 측정", "C1"],
+    ["2", "맨홀 밀폐공간 작업", "C3", "떨어짐", "사다리 추락 위험", "C3", "사다리 고정", "C1"],
+    ["3", "맨홀 밀폐공간 작업", "C3", "베임", "케이블 절단 중 손 베임", "C2", "절단 방지 장갑 착용", "C1"],
+]
+
+
+def make_assessment(app, assessment_id="a1", rows=ASSESSMENT_TABLE_ROWS, work_description="맨홀 작업"):
+    """
+    보고서 전체 섹션(작업 분석/위험성 평가표/추가 조치/체크리스트)을 갖춘 분석 결과
+    """
+    report = "\n".join([
+        "## 작업 내용 분석", f"{work_description} 분석", "",
+        "## 오늘 작업에서 예상되는 위험요인과 감소대책은 아래와 같습니다.", *app.risk_table_markdown(rows), "",
+        "## 추가 안전 조치", "- 감시인 배치", "",
+        "## 작업 전 체크리스트", "- [ ] 가스 측정",
+    ])
+    return {
+        "assessment_id": assessment_id,
+        "timestamp": "2025-08-25 09:00:00",
+        "work_description": work_description,
+        "used_references": ["참조.csv"],
+        "full_report": report,
+        "sections": app.parse_analysis_sections(report),
+    }
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def saved(app, monkeypatch):
+    """
+    작업이 이력에 저장한 결과 목록 (이력 폴더에 쓰지 않음)
+    """
+    results = []
+    monkeypatch.setattr(app, "save_assessment_to_history", lambda result, risk_df: results.append(result))
+    return results
+
+
+def wait_finished(manager, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.status(job_id)
+        if job is None or job["finished_at"] is not None:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("작업이 끝나지 않음")
+
+
+def test_job_runs_with_submitted_reference_files(app, saved):
+    manager = app.AnalysisJobManager(max_workers=2)
+
+    def analyze_work_risk(work_description, selected_references, user_id, backend, on_queue_update, **options):
+        on_queue_update(1)
+        files = app.current_reference_files()
+        return {"work_description": work_description, "full_report": "", "files": sorted(files), "options": options}
+
+    job_id = manager.submit(analyze_work_risk, "맨홀 작업", ["참조.csv"], {"참조.csv": {"path": "참조.csv"}}, use_cache=False)
+    job = wait_finished(manager, job_id)
+
+    assert job["status"] == "done" and job["queue_position"] is None
+    assert job["result"]["files"] == ["참조.csv"] and job["result"]["options"] == {"use_cache": False}
+    assert saved == [job["result"]]
+    assert manager.active_count() == 0
+
+
+def test_duplicate_submission_reuses_running_job(app, saved):
+    manager = app.AnalysisJobManager(max_workers=2)
+    release = threading.Event()
+
+    def analyze_work_risk(work_description, selected_references, **kwargs):
+        release.wait(5)
+        return {"work_description": work_description, "full_report": ""}
+
+    first = manager.submit(analyze_work_risk, "맨홀 작업", ["참조.csv"], {})
+    assert manager.submit(analyze_work_risk, "맨홀 작업", ["참조.csv"], {}) == first
+    other = manager.submit(analyze_work_risk, "맨홀 작업", ["참조.csv"], {}, user_id="other")
+    assert other != first and manager.active_count() == 2
+
+    release.set()
+    assert wait_finished(manager, first)["status"] == "done"
+    # 끝난 작업과 같은 조건이면 새 작업으로 실행
+    assert manager.submit(analyze_work_risk, "맨홀 작업", ["참조.csv"], {}) != first
+
+
+def test_failures_are_recorded(app, monkeypatch):
+    manager = app.AnalysisJobManager(max_workers=1)
+
+    def analyze_work_risk(work_description, selected_references, **kwargs):
+        raise ValueError("모델 오류")
+
+    job = wait_finished(manager, manager.submit(analyze_work_risk, "맨홀 작업", [], {}))
+    assert job["status"] == "failed" and str(job["error"]) == "모델 오류"
+
+    def save_fails(result, risk_df):
+        raise OSError("디스크 가득 참")
+
+    monkeypatch.setattr(app, "save_assessment_to_history", save_fails)
+    job = wait_finished(manager, manager.submit(lambda *args, **kwargs: {"full_report": ""}, "철탑 작업", [], {}))
+    # 이력 저장 실패는 결과를 잃지 않고 기록만 함
+    assert job["status"] == "done" and job["history_error"] == "디스크 가득 참"
+
+
+def test_finished_jobs_expire_after_retention(app, saved):
+    manager = app.AnalysisJobManager(max_workers=1, retention=0.5)
+    job_id = manager.submit(lambda *args, **kwargs: {"full_report": ""}, "맨홀 작업", [], {})
+    assert wait_finished(manager, job_id)["status"] == "done"
+
+    time.sleep(0.6)
+    assert manager.status(job_id) is None
@@ -0,0 +1,38 @@
+import pandas as pd
+
+
+def test_normalize_grade_parses_labels(app):
+    grades = app.normalize_grade(pd.Series(["C3(높음)", "c4", "S등급", " C1 ", "없음"]))
+
+    assert grades.dtype == app.RISK_GRADE_DTYPE
+    assert list(grades.astype(object).where(grades.notna(), None)) == ["C3", "C4", "S", "C1", None]
+    # 순서가 있는 범주형이라 등급 비교가 가능
+    assert list(grades >= "C3") == [True, True, True, False, False]
+
+
+def test_compact_frame_dtypes_and_size(app):
+    rows = pd.DataFrame({
+        "순번": [str(number) for number in range(1, 1001)],
+        "작업 내용": ["맨홀 밀폐공간 작업", "철탑 안테나 점검 작업"] * 500,
+        "위험등급-개선전": ["C3", "C4(매우높음)"] * 500,
+        "세부 위험요인": ["산소결핍으로 인한 질식 위험"] * 1000,
+    })
+    compact = app.to_compact_risk_frame(rows)
+
+    assert str(compact["순번"].dtype) == "Int32"
+    assert compact["위험등급-개선전"].dtype == app.RISK_GRADE_DTYPE
+    assert isinstance(compact["작업 내용"].dtype, pd.CategoricalDtype)
+    assert list(compact["작업 내용"].cat.categories) == ["맨홀 밀폐공간 작업", "철탑 안테나 점검 작업"]
+    assert compact.memory_usage(deep=True).sum() < rows.memory_usage(deep=True).sum() / 5
+
+
+def test_concat_compact_frames_keeps_categories(app, reference_rows):
+    first = reference_rows.iloc[:4]
+    second = app.to_compact_risk_frame(reference_rows.iloc[4:].astype(str))
+    combined = app.concat_compact_frames([first, second])
+
+    assert len(combined) == len(reference_rows)
+    assert isinstance(combined["세부 위험요인"].dtype, pd.CategoricalDtype)
+    assert combined["위험등급-개선전"].dtype == app.RISK_GRADE_DTYPE
+    assert list(combined["세부 위험요인"].astype(str)) == list(reference_rows["세부 위험요인"].astype(str))
+    assert list(app.concat_compact_frames([]).columns) == app.REFERENCE_ROW_COLUMNS
@@ -0,0 +1,108 @@
+import json
+
+from conftest import REFERENCE_CSV_ROWS as ROWS
+
+
+def report_with_rows(app, rows):
+    return "\n".join(["## 위험요인과 감소대책", *app.risk_table_markdown(rows), "", "## 작업 전 체크리스트", "- [ ] 가스 측정"])
+
+
+def assessment(app, rows):
+    return {
+        "assessment_id": "a1",
+        "timestamp": "2025-08-25 09:00:00",
+        "work_description": "맨홀 작업",
+        "used_references": ["참조.csv"],
+        "full_report": report_with_rows(app, rows),
+    }
+
+
+REFERENCE_ROW = ["1", "맨홀 밀폐공간 작업", "C3", "떨어짐", "사다리 추락 위험", "C3", "사다리 고정", "C1"]
+CUSTOM_ROW = ["2", "맨홀 밀폐공간 작업", "C3", "화재", "가스 폭발 화재", "C4", "화기 작업 금지", "C2"]
+
+
+def test_compact_rows_use_stable_reference_row_ids(app, reference_file):
+    files = reference_file(ROWS)
+    result = assessment(app, [REFERENCE_ROW, CUSTOM_ROW])
+    compact = app.compact_assessment(result, files)
+    row_id = app.reference_row_versions(files["참조.csv"]["path"])["row_id"].iloc[1]
+
+    assert compact["refs"] == [["참조.csv", app.reference_table_etag(files["참조.csv"]["path"])]]
+    assert compact["rows"][0] == [0, row_id, app.grade_code("C3"), app.grade_code("C1")]
+    assert compact["rows"][1] == ["맨홀 밀폐공간 작업", app.grade_code("C3"), "화재", "가스 폭발 화재",
+                                  app.grade_code("C4"), "화기 작업 금지", app.grade_code("C2")]
+    assert compact["checklist"] == "- [ ] 가스 측정"
+
+    # 앞에 행이 끼어들어도 같은 행은 같은 ID로 전송
+    inserted = [["0", "통신", "설비", "현장", "맨홀 밀폐공간 작업", "C3", "베임", "공구 베임", "C2", "장갑 착용", "C1"]]
+    files = reference_file(inserted + ROWS)
+    assert app.compact_assessment(result, files)["rows"][0][1] == row_id
+
+
+def test_compact_reference_table_is_keyed_by_row_id(app, reference_file):
+    files = reference_file(ROWS)
+    path = files["참조.csv"]["path"]
+    table = app.compact_reference_table(path)
+    versions = app.reference_row_versions(path)
+
+    assert [row[0] for row in table["rows"]] == list(versions["row_id"])
+    first = table["rows"][0]
+    assert [table["strings"][pos] for pos in first[1:5]] == ["맨홀 밀폐공간 작업", "질식", "산소결핍으로 인한 질식 위험", "산소농도 측정"]
+    assert first[5:] == [app.grade_code("C3"), app.grade_code("C3"), app.grade_code("C1")]
+    assert table["etag"] == app.reference_table_etag(path)
+
+
+def test_history_index_reads_only_appended_lines(app, tmp_path):
+    path = tmp_path / "assessments.jsonl"
+
+    def append(text):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(text)
+
+    append(json.dumps({"assessment_id": "a1", "work_description": "첫 작업"}, ensure_ascii=False) + "\n")
+    index = app.AssessmentHistoryIndex(str(path))
+    assert index.get("a1")["work_description"] == "첫 작업"
+    assert index.get("a2") is None
+
+    # 쓰는 중인 줄은 끝날 때까지 색인하지 않음
+    line = json.dumps({"assessment_id": "a2", "work_description": "두 번째"}, ensure_ascii=False)
+    append(line[:10])
+    assert index.get("a2") is None
+    append(line[10:] + "\n" + "깨진 줄\n")
+    assert index.get("a2")["work_description"] == "두 번째"
+
+    # 이력 파일을 새로 만들면 처음부터 다시 색인
+    path.write_text(json.dumps({"assessment_id": "b1"}) + "\n", encoding="utf-8")
+    assert index.get("a1") is None
+    assert index.get("b1") == {"assessment_id": "b1"}
+
+
+def test_compact_api_authorization(app, monkeypatch):
+    monkeypatch.setattr(app, "COMPACT_API_TOKEN", "")
+    assert app.compact_api_authorized("", "127.0.0.1")
+    assert not app.compact_api_authorized("", "10.0.0.5")
+
+    monkeypatch.setattr(app, "COMPACT_API_TOKEN", "secret")
+    assert app.compact_api_authorized("Bearer secret", "10.0.0.5")
+    assert not app.compact_api_authorized("Bearer wrong", "127.0.0.1")
+    assert not app.compact_api_authorized("", "127.0.0.1")
+
+
+def test_compact_api_reference_route(app, reference_file):
+    files = reference_file(ROWS)
+    status, body = app.compact_api_response("/api/references/%EC%B0%B8%EC%A1%B0.csv", files)
+    assert status == 200 and body["file"] == "참조.csv"
+    assert app.compact_api_response("/api/references/없음.csv", files) == (404, {"status": "not_found"})
+    assert app.compact_api_response("/api/unknown", files)[0] == 404
+
+
+def test_compact_rows_expand_to_risk_table_rows(app, reference_file):
+    files = reference_file(ROWS)
+    compact = app.compact_assessment(assessment(app, [REFERENCE_ROW, CUSTOM_ROW]), files)
+    tables = {"참조.csv": app.load_compact_reference_table(files["참조.csv"]["path"])}
+
+    # 참조 행은 행 표에서, 나머지는 응답에 담긴 문구로 원래 표를 복원
+    assert app.expand_compact_rows(compact, tables) == [REFERENCE_ROW, CUSTOM_ROW]
+    # 행 표가 없는 참조 행은 건너뜀
+    assert app.expand_compact_rows(compact, {}) == [["1"] + CUSTOM_ROW[1:]]
+    assert app.grade_label(app.grade_code("C4")) == "C4" and app.grade_label(0) == ""
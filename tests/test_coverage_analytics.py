@@ -0,0 +1,112 @@
+import time
+
+import pandas as pd
+
+from conftest import REFERENCE_ROWS
+
+
+def history_rows(app, assessment_id, work_item, hazards):
+    return pd.DataFrame(
+        [
+            [assessment_id, "2025-08-25 09:00:00", str(number), work_item, "C3", hazard_type, hazard, "C3", "대책", "C1"]
+            for number, (hazard_type, hazard) in enumerate(hazards, start=1)
+        ],
+        columns=["assessment_id", "timestamp"] + app.RISK_TABLE_COLUMNS,
+    )
+
+
+def test_reworded_hazards_are_not_reported_missing(app, reference_rows, tmp_path):
+    analytics = app.ReferenceCoverageAnalytics(str(tmp_path / "risk_rows.csv"), reference_rows)
+    rows = history_rows(app, "a1", "맨홀 밀폐공간 작업", [
+        ("질식", "밀폐공간 내부의 산소 결핍으로 인한 질식 위험"),
+        ("떨어짐", "맨홀 출입할 때 사다리에서 추락하는 위험"),
+    ])
+    analytics.update(rows)
+
+    verification = app.verify_risk_table(rows[app.RISK_TABLE_COLUMNS], reference_rows)
+    summary = analytics.summary()
+    assert summary["missing"].empty
+    assert int(analytics.expected_counts.sum()) == 2
+    # 결과 화면 점검에서 C3/C4 위험요인은 모두 포함으로 인정 (C2 위험요인만 누락)
+    assert set(verification["missing"]["위험등급-개선전"].astype(str)) == {"C2"}
+
+
+def test_missing_c34_hazard_is_counted_per_assessment(app, reference_rows, tmp_path):
+    analytics = app.ReferenceCoverageAnalytics(str(tmp_path / "risk_rows.csv"), reference_rows)
+    analytics.update(pd.concat([
+        # 작업 내용 표기가 달라도 같은 참조 작업으로 대응
+        history_rows(app, "a1", "맨홀 밀폐 공간 작업", [("질식", "밀폐공간 산소결핍 질식 위험")]),
+        history_rows(app, "a2", "철탑 안테나 점검 작업", [
+            ("떨어짐", "철탑 승강 중 추락 위험"),
+            ("맞음", "공구·자재 낙하로 인한 하부 작업자 맞음"),
+        ]),
+    ], ignore_index=True))
+
+    missing = analytics.summary()["missing"].set_index("세부 위험요인")
+    assert set(missing.index) == {"맨홀 출입 시 사다리에서 추락 위험", "인접 전력선 접촉으로 인한 감전"}
+    assert (missing["누락 횟수"] == 1).all()
+    assert (missing["누락률(%)"] == 100.0).all()
+
+
+def test_refresh_reads_only_appended_rows(app, reference_rows, tmp_path):
+    path = tmp_path / "risk_rows.csv"
+    first = history_rows(app, "a1", "맨홀 밀폐공간 작업", [("질식", "밀폐공간 내부 산소결핍으로 인한 질식 위험")])
+    first.to_csv(path, index=False, encoding="utf-8")
+    analytics = app.ReferenceCoverageAnalytics(str(path), reference_rows)
+    assert analytics.refresh() == 1
+    assert analytics.refresh() == 0
+
+    second = history_rows(app, "a2", "맨홀 밀폐공간 작업", [("떨어짐", "맨홀 출입 시 사다리에서 추락 위험")])
+    second.to_csv(path, mode="a", header=False, index=False, encoding="utf-8")
+    assert analytics.refresh() == 1
+    assert analytics.assessment_count == 2
+    missing = analytics.summary()["missing"].set_index("세부 위험요인")["누락 횟수"].to_dict()
+    assert missing == {"맨홀 출입 시 사다리에서 추락 위험": 1, "밀폐공간 내부 산소결핍으로 인한 질식 위험": 1}
+
+
+def test_vectorized_matching_agrees_with_hazards_covered(app, reference_rows, tmp_path):
+    analytics = app.ReferenceCoverageAnalytics(str(tmp_path / "risk_rows.csv"), reference_rows)
+    variants = [
+        ("질식", "밀폐공간 산소 결핍 질식"),
+        ("떨어짐", "사다리 추락"),
+        ("떨어짐", "맨홀 출입 시 사다리에서 추락 위험!!"),
+        ("감전", "전력선 접촉 감전"),
+        ("맞음", "공구 낙하로 인한 하부 작업자 맞음"),
+        ("기타", "ＡＢ"),
+    ]
+    rows = pd.concat([
+        history_rows(app, f"a{number}", work_item, variants[number % len(variants):] + variants[:number % 2])
+        for number, work_item in enumerate(["맨홀 밀폐공간 작업", "철탑 안테나 점검 작업"] * 6)
+    ], ignore_index=True)
+    analytics.update(rows)
+
+    expected_missing = {}
+    reference = reference_rows[reference_rows["위험등급-개선전"].isin(["C3", "C4"])]
+    for assessment_id, group in rows.groupby("assessment_id"):
+        hazards = reference[reference["작업 내용"] == group["작업 내용"].iloc[0]]["세부 위험요인"].astype(str)
+        for hazard, found in zip(hazards, app.hazards_covered(hazards, group["세부 위험요인"])):
+            if not found:
+                expected_missing[hazard] = expected_missing.get(hazard, 0) + 1
+    missing = analytics.summary()["missing"].set_index("세부 위험요인")["누락 횟수"].to_dict()
+    assert expected_missing and missing == expected_missing
+
+
+def test_update_scales_to_large_histories(app, reference_rows, tmp_path):
+    analytics = app.ReferenceCoverageAnalytics(str(tmp_path / "risk_rows.csv"), reference_rows)
+    # 평가 5,000건 × 8행, 생성 위험요인 문구는 모두 다름
+    rows = pd.DataFrame(
+        [
+            [f"a{number // 8}", "2025-08-25 09:00:00", str(number % 8 + 1), work_item, grade, hazard_type,
+             f"{hazard} {number}", grade, "대책", "C1"]
+            for number, (work_item, grade, hazard_type, hazard, *_rest) in enumerate(REFERENCE_ROWS * 5000)
+        ],
+        columns=["assessment_id", "timestamp"] + app.RISK_TABLE_COLUMNS,
+    )
+    started = time.perf_counter()
+    analytics.update(rows)
+    elapsed = time.perf_counter() - started
+
+    assert analytics.row_count == 40_000
+    assert int(analytics.expected_counts.sum()) == 25_000
+    assert analytics.missing_counts.empty
+    assert elapsed < 2.5
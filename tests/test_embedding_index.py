@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+
+def work_item_frame(app, count):
+    work_items = [f"{place} {equipment} {task} {number}"
+                  for number in range(count // 24 + 1)
+                  for place in ["맨홀", "철탑", "옥상"]
+                  for equipment in ["안테나", "케이블", "중계기", "전원장치"]
+                  for task in ["점검", "교체"]][:count]
+    return pd.DataFrame({
+        "작업 내용": work_items,
+        "대분류": "통신",
+        "중분류": "설비",
+        "재해유형": ["떨어짐", "감전", "질식"] * (count // 3) + ["떨어짐"] * (count % 3),
+    })
+
+
+def test_build_and_load_round_trip(app, reference_rows, tmp_path):
+    folder = str(tmp_path / "index")
+    stats = app.build_embedding_index(reference_rows, folder)
+    index = app.EmbeddingIndex(folder)
+
+    assert stats["items"] == 2 and stats["dim"] == app.EMBEDDING_HASH_DIM
+    # 벡터는 메모리 매핑으로 읽고, 저장한 값과 같음
+    assert isinstance(index.vectors, np.memmap)
+    encoder = app.create_embedding_encoder(idf=np.load(tmp_path / "index" / "idf.npy"))
+    expected = encoder.encode(app.embedding_item_texts(reference_rows)[1])
+    np.testing.assert_allclose(np.asarray(index.vectors), expected, rtol=1e-6)
+    assert index.query("타워 안테나 점검")[0][0] == "철탑 안테나 점검 작업"
+    assert index.query("맨홀 산소 질식", allowed_items={"철탑 안테나 점검 작업"}) == []
+    assert app.get_embedding_index(folder) is not None
+    assert app.get_embedding_index(str(tmp_path / "missing")) is None
+
+
+def test_empty_reference_builds_empty_index(app, reference_rows, tmp_path):
+    folder = str(tmp_path / "index")
+    stats = app.build_embedding_index(reference_rows.iloc[:0], folder)
+    index = app.EmbeddingIndex(folder)
+
+    assert stats["items"] == 0
+    assert index.vectors.shape == (0, app.EMBEDDING_HASH_DIM) and len(index.centroids) == 0
+    assert index.query("철탑 안테나", mode="ann") == [] and index.query("철탑 안테나") == []
+
+
+def test_ivf_search_matches_exact_search(app, tmp_path, monkeypatch):
+    reference_df = work_item_frame(app, 120)
+    folder = str(tmp_path / "index")
+    app.build_embedding_index(reference_df, folder)
+    index = app.EmbeddingIndex(folder)
+
+    assert len(index.centroids) == 11
+    assert sorted(np.concatenate(index.clusters)) == list(range(120))
+    # 모든 군집을 탐색하면 근사 검색이 전체 탐색과 같음
+    monkeypatch.setattr(app, "EMBEDDING_IVF_PROBE_RATIO", 1.0)
+    for query in ["철탑 안테나 교체", "맨홀 케이블 점검"]:
+        assert index.query(query, top_n=5, mode="ann") == index.query(query, top_n=5, mode="exact")
+
+    # 작업 수가 기준 이상이면 자동으로 근사 검색 (일부 군집만 탐색)
+    monkeypatch.setattr(app, "EMBEDDING_IVF_PROBE_RATIO", 0.2)
+    monkeypatch.setattr(app, "EMBEDDING_ANN_MIN_ITEMS", 100)
+    results = index.query("옥상 중계기 점검", top_n=3)
+    assert results == index.query("옥상 중계기 점검", top_n=3, mode="ann")
+    assert results[0][0].startswith("옥상 중계기 점검")
@@ -0,0 +1,33 @@
+import io
+
+import openpyxl
+
+from conftest import ASSESSMENT_TABLE_ROWS, make_assessment
+
+
+def test_workbook_streams_all_assessments(app):
+    results = (make_assessment(app, f"a{number}", work_description=f"작업 {number}") for number in range(3))
+    with app.build_excel_file(results, include_assessment_columns=True) as output:
+        workbook = openpyxl.load_workbook(output)
+
+    assert workbook.sheetnames == ["위험성평가표", "작업분석", "추가안전조치", "작업전체크리스트"]
+    risk_sheet = workbook["위험성평가표"]
+    rows = list(risk_sheet.iter_rows(values_only=True))
+    assert rows[0] == ("평가 ID", "작업 설명", "생성 시간", *app.RISK_TABLE_COLUMNS)
+    assert len(rows) == 1 + 3 * len(ASSESSMENT_TABLE_ROWS)
+    # 순번은 숫자, 등급은 등급 기호만 기록
+    assert rows[1][:4] == ("a0", "작업 0", "2025-08-25 09:00:00", 1)
+    assert rows[1][8] == "C4"
+    assert risk_sheet.auto_filter.ref == f"A1:K{len(rows)}"
+    formats = [rule.formula[0] for rules in risk_sheet.conditional_formatting for rule in rules.rules]
+    assert sorted(formats) == ['"C2"', '"C3"', '"C4"']
+
+    analysis = [row[0] for row in workbook["작업분석"].iter_rows(values_only=True) if row[0]]
+    assert analysis[:2] == ["[2025-08-25 09:00:00] 작업 0", "작업 0 분석"]
+    assert "- [ ] 가스 측정" in [row[0] for row in workbook["작업전체크리스트"].iter_rows(values_only=True)]
+
+
+def test_single_report_has_no_assessment_columns(app):
+    workbook = openpyxl.load_workbook(io.BytesIO(app.build_excel_report(make_assessment(app))))
+    header = next(workbook["위험성평가표"].iter_rows(values_only=True))
+    assert list(header) == app.RISK_TABLE_COLUMNS
@@ -0,0 +1,67 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+
+@pytest.fixture
+def health_server(app):
+    """
+    빈 포트(0)에 띄운 헬스 서버와 워밍업 상태
+    """
+    warmup = app.ServerWarmup()
+    server = app.start_health_server(warmup, port=0, host="127.0.0.1")
+    yield warmup, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=5) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read() or b"null")
+
+
+def test_port_zero_skips_health_server(app, monkeypatch):
+    started = []
+    monkeypatch.setattr(app, "HEALTH_PORT", 0)
+    monkeypatch.setattr(app, "start_health_server", lambda warmup: started.append(warmup))
+    monkeypatch.setattr(app.ServerWarmup, "run", lambda self: self.ready.set())
+    app.start_server_warmup.clear()
+    try:
+        warmup = app.start_server_warmup()
+        assert warmup.ready.wait(5)
+    finally:
+        app.start_server_warmup.clear()
+
+    assert started == [] and "health_server" not in warmup.errors
+
+
+def test_readiness_follows_warmup(app, health_server):
+    warmup, base = health_server
+
+    assert get(f"{base}/healthz") == (200, {"status": "ok"})
+    status, body = get(f"{base}/readyz")
+    assert status == 503 and body["status"] == "warming_up"
+
+    warmup._run_stage("reference_index", lambda: {"files": 1})
+    warmup._run_stage("model_connection", lambda: 1 / 0)
+    warmup.ready.set()
+    status, body = get(f"{base}/readyz")
+    assert status == 200 and body["status"] == "ready"
+    assert body["details"] == {"reference_index": {"files": 1}}
+    # 단계 오류는 기록만 하고 준비 완료로 전환
+    assert "division by zero" in body["errors"]["model_connection"]
+    assert get(f"{base}/unknown") == (404, {"status": "not_found"})
+
+
+def test_api_routes_require_token(app, health_server, monkeypatch):
+    _, base = health_server
+    monkeypatch.setattr(app, "COMPACT_API_TOKEN", "secret")
+
+    assert get(f"{base}/api/assessments/none") == (401, {"status": "unauthorized"})
+    status, _ = get(f"{base}/api/unknown", headers={"Authorization": "Bearer secret"})
+    assert status == 404
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def policy(app, **options):
+    settings = {"enabled": True, "default_delay": 0.2, "min_delay": 0.1, "deadline": 2.0,
+                "fallback_model": "", "fallback_timeout": 1.0}
+    settings.update(options)
+    return app.HedgedRequestPolicy(**settings)
+
+
+def test_slow_primary_is_hedged_and_hedge_wins(app):
+    calls = []
+    release = threading.Event()
+
+    def request(model, timeout, on_wait, on_start, cancelled):
+        on_start()
+        calls.append(model)
+        if len(calls) == 1:
+            release.wait(2)
+            return {"text": "primary"}
+        return {"text": "hedge"}
+
+    result = policy(app).complete(request, "main")
+    release.set()
+
+    assert result["winner"] == "hedge" and result["hedged"]
+    assert result["response"] == {"text": "hedge"}
+
+
+def test_deadline_falls_back_to_secondary_model(app):
+    cancelled_seen = threading.Event()
+
+    def request(model, timeout, on_wait, on_start, cancelled):
+        if model == "backup":
+            return {"text": "backup"}
+        on_start()
+        cancelled.wait(2)
+        cancelled_seen.set()
+        raise StatusError(503)
+
+    hedged = policy(app, enabled=False, deadline=0.3, fallback_model="backup")
+    result = hedged.complete(request, "main")
+
+    assert result["winner"] == "fallback" and result["model"] == "backup"
+    assert cancelled_seen.wait(2)
+    assert hedged.metrics["deadline_exceeded"] == 1
+
+
+def test_retryable_error_falls_back_to_reference(app):
+    def request(model, timeout, on_wait, on_start, cancelled):
+        on_start()
+        raise StatusError(503)
+
+    result = policy(app, enabled=False).complete(request, "main")
+    assert result["winner"] == "reference" and result["response"] is None
+    assert "503" in result["error"]
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 404])
+def test_non_retryable_error_is_raised(app, status_code):
+    models = []
+
+    def request(model, timeout, on_wait, on_start, cancelled):
+        models.append(model)
+        if on_start:
+            on_start()
+        raise StatusError(status_code)
+
+    hedged = policy(app, enabled=False, fallback_model="backup")
+    with pytest.raises(StatusError):
+        hedged.complete(request, "main")
+    # 설정 오류는 보조 모델이나 참조자료 표로 감추지 않음
+    assert models == ["main"]
+    assert hedged.metrics["fallback_reference"] == 0
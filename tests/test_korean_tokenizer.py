@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.mark.parametrize("text, tokens", [
+    ("오늘 철탑에서 안테나 재설치 작업", ["철탑", "안테나", "설치"]),
+    ("타워에서 ANT 점검", ["철탑", "안테나", "점검"]),
+    ("전신주 에서 작업", ["전주"]),
+    ("타워점검 작업", ["철탑", "점검"]),
+    # 동의어는 토큰 전체가 같을 때만 치환 (일반 단어 안의 부분 문자열은 그대로)
+    ("시설물 점검", ["시설물", "점검"]),
+    ("지하철 역사 공사", ["지하철", "역사", "공사"]),
+    ("전화국사 시설", ["전화국사", "시설"]),
+])
+def test_tokenize_korean(app, text, tokens):
+    assert app.tokenize_korean(text) == tokens
+
+
+def test_canonical_text_ignores_spacing_particles_and_synonyms(app):
+    assert app.canonical_korean_text("타워에서 안테나 재설치") == app.canonical_korean_text("철탑 안테나 설치")
+    assert app.canonical_korean_text("지하철 공사") != app.canonical_korean_text("맨홀철 공사")
+    # 일반어도 남겨 캐시 키가 요청 문구를 구분
+    assert app.canonical_korean_text("오늘 작업") == "오늘 작업"
+
+
+def test_normalize_and_features(app):
+    assert app.normalize_korean_text("  Ｃ３  위험!!  ") == "c3 위험"
+    assert app.korean_token_features("철탑 안테나") == frozenset({"철탑", "안테나", "안테", "테나"})
+
+
+def test_cache_key_distinguishes_unrelated_descriptions(app):
+    key = lambda text: app.analysis_cache_key(text, ["참조.xlsx"], "template", "model", "v3")
+    assert key("타워 안테나 재설치") == key("철탑에서 안테나 설치")
+    assert key("지하철 역사 공사") != key("맨홀 역사 공사")
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(
+            model="served-model",
+            choices=[SimpleNamespace(message=SimpleNamespace(content="| 1 | 작업 |"), finish_reason="length")],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30,
+                                  prompt_tokens_details=SimpleNamespace(cached_tokens=96)),
+        )
+
+
+def test_backend_selection_follows_configuration(app, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr(app, "LOCAL_MODEL_BASE_URL", "")
+    assert app.create_model_backend("openai") is None
+    assert app.create_model_backend("local") is None
+    assert app.create_model_backend("unknown") is None
+    assert isinstance(app.create_model_backend("template"), app.TemplateBackend)
+    assert list(app.available_model_backends()) == ["template"]
+
+    monkeypatch.setattr(app, "LOCAL_MODEL_BASE_URL", "http://127.0.0.1:8000/v1")
+    local = app.create_model_backend("local")
+    assert isinstance(local, app.OpenAICompatibleBackend) and local.remote
+    assert str(local.client.base_url).startswith("http://127.0.0.1:8000/v1")
+    # 재시도는 스케줄러가 담당하므로 클라이언트 자체 재시도는 끔
+    assert local.client.max_retries == 0
+
+
+def test_openai_backend_normalizes_response(app):
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    backend = app.OpenAIBackend(client, default_model="default-model")
+
+    result = backend.complete([{"role": "user", "content": "질문"}], max_tokens=50, timeout=5)
+
+    assert completions.requests[0]["model"] == "default-model"
+    assert completions.requests[0]["max_tokens"] == 50
+    assert result == {
+        "text": "| 1 | 작업 |",
+        "finish_reason": "length",
+        "model": "served-model",
+        "usage": {"prompt_tokens": 120, "completion_tokens": 30, "cached_tokens": 96},
+    }
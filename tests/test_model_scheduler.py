@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+
+def start_waiter(scheduler, user_id, tokens, positions, errors):
+    """
+    별도 스레드에서 실행 권한을 기다리는 요청 (대기 순번과 거절 오류를 기록)
+    """
+    granted = threading.Event()
+
+    def wait():
+        try:
+            scheduler._acquire(user_id, tokens, on_wait=positions.append)
+            granted.set()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=wait, daemon=True)
+    thread.start()
+    return thread, granted
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_equal_sized_waiters_report_distinct_positions(app):
+    scheduler = app.ModelRequestScheduler(max_concurrency=1, tokens_per_minute=0, queue_timeout=5)
+    scheduler._acquire("holder", 100)
+    first_positions, second_positions, errors = [], [], []
+    first, first_granted = start_waiter(scheduler, "u1", 100, first_positions, errors)
+    assert wait_until(lambda: scheduler.queue_length() == 1)
+    second, second_granted = start_waiter(scheduler, "u1", 100, second_positions, errors)
+    assert wait_until(lambda: second_positions)
+
+    assert first_positions == [1]
+    assert second_positions == [2]
+
+    scheduler._release()
+    assert first_granted.wait(2)
+    scheduler._release()
+    assert second_granted.wait(2)
+    scheduler._release()
+    assert not errors
+    assert scheduler._active == 0
+
+
+def test_timed_out_waiter_removes_only_its_own_ticket(app):
+    scheduler = app.ModelRequestScheduler(max_concurrency=1, tokens_per_minute=0, queue_timeout=5)
+    scheduler._acquire("holder", 100)
+    positions, errors = [], []
+    first, first_granted = start_waiter(scheduler, "u1", 100, positions, errors)
+    assert wait_until(lambda: scheduler.queue_length() == 1)
+
+    # 같은 크기의 두 번째 요청만 먼저 대기 시간 초과
+    scheduler.queue_timeout = 0.2
+    second, second_granted = start_waiter(scheduler, "u1", 100, [], errors)
+    second.join(3)
+    assert len(errors) == 1 and isinstance(errors[0], app.ModelRequestRejected)
+    assert scheduler.queue_length() == 1
+
+    # 남은 첫 번째 요청이 실행 권한을 받고, 실행 슬롯이 새지 않아야 함
+    scheduler._release()
+    assert first_granted.wait(2)
+    assert not second_granted.is_set()
+    scheduler._release()
+    assert scheduler._active == 0
+    assert scheduler.queue_length() == 0
+
+
+def test_full_queue_is_rejected(app):
+    scheduler = app.ModelRequestScheduler(max_concurrency=1, tokens_per_minute=0, max_queue_size=1, queue_timeout=5)
+    scheduler._acquire("holder", 10)
+    errors = []
+    waiter, granted = start_waiter(scheduler, "u1", 10, [], errors)
+    assert wait_until(lambda: scheduler.queue_length() == 1)
+    with pytest.raises(app.ModelRequestRejected):
+        scheduler._acquire("u2", 10)
+    scheduler._release()
+    assert granted.wait(2)
+    scheduler._release()
+
+
+def test_retryable_errors_are_retried(app, monkeypatch):
+    scheduler = app.ModelRequestScheduler(max_concurrency=1, tokens_per_minute=0, max_retries=2)
+    monkeypatch.setattr(app, "is_retryable_model_error", lambda e: isinstance(e, ConnectionError))
+    monkeypatch.setattr(app.time, "sleep", lambda seconds: None)
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("temporary")
+        return "ok"
+
+    assert scheduler.run(request) == "ok"
+    assert len(calls) == 3
+    assert scheduler._active == 0
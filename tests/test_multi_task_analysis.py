@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from conftest import ASSESSMENT_TABLE_ROWS, REFERENCE_CSV_ROWS, make_assessment
+
+
+@pytest.fixture
+def job_references(app, reference_file):
+    files = reference_file(REFERENCE_CSV_ROWS)
+    app._job_context.reference_files = files
+    yield files
+    app._job_context.reference_files = None
+
+
+def test_split_work_description_by_reference_work_items(app, reference_rows):
+    assert app.split_work_description("맨홀 밀폐공간 작업 후 철탑 안테나 점검", reference_rows) == [
+        "맨홀 밀폐공간 작업", "철탑 안테나 점검",
+    ]
+    # 참조자료 작업과 맞지 않는 조각은 앞 작업에 붙임
+    assert app.split_work_description("맨홀 밀폐공간 작업 후 정리", reference_rows) == ["맨홀 밀폐공간 작업 후 정리"]
+    assert app.split_work_description("맨홀 작업 후 철탑 점검", reference_rows.iloc[:0]) == ["맨홀 작업 후 철탑 점검"]
+
+
+def test_merge_risk_tables_keeps_highest_grade_once(app):
+    first = pd.DataFrame(ASSESSMENT_TABLE_ROWS, columns=app.RISK_TABLE_COLUMNS)
+    second = pd.DataFrame([
+        ["1", "철탑 안테나 점검", "C4", "떨어짐", "사다리  추락 위험", "C4", "안전대 착용", "C2"],
+        ["2", "철탑 안테나 점검", "C4", "감전", "인접 전력선 접촉 감전", "C3", "이격거리 확보", "C1"],
+        ["3", "철탑 안테나 점검", "C4", "질식", "산소결핍으로 인한 질식 위험", "C3", "환기", "C1"],
+    ], columns=app.RISK_TABLE_COLUMNS)
+    merged = app.merge_risk_tables([first, None, second])
+
+    assert list(merged["순번"]) == [1, 2, 3, 4]
+    assert list(merged["세부 위험요인"].astype(str)) == [
+        "산소결핍으로 인한 질식 위험", "케이블 절단 중 손 베임", "사다리  추락 위험", "인접 전력선 접촉 감전",
+    ]
+    # 공통 위험요인은 개선 전 등급이 높은 행을 유지 ("C4(매우높음)" 같은 표기도 등급으로 비교)
+    assert str(merged.loc[2, "위험등급-개선전"]) == "C4"
+    assert str(merged.loc[0, "위험성 감소대책"]) == "산소농도 측정"
+    assert app.merge_risk_tables([]).empty
+
+
+def test_multi_task_report_merges_sections(app):
+    first = make_assessment(app, "a1")
+    second = make_assessment(app, "a2", rows=[ASSESSMENT_TABLE_ROWS[0]], work_description="철탑 작업")
+    report = app.build_multi_task_report([first, second])
+    sections = app.parse_analysis_sections(report)
+
+    assert "### 작업 1: 맨홀 작업" in report and "### 작업 2: 철탑 작업" in report
+    assert len(app.extract_risk_table_rows(report)) == 3
+    assert sections["additional_safety"].count("감시인 배치") == 1
+    assert sections["safety_checklist"].count("가스 측정") == 1
+
+
+def test_multi_task_analysis_runs_each_task(app, job_references):
+    result = app.analyze_multi_task_work_risk(
+        "맨홀 밀폐공간 작업 후 철탑 안테나 점검", ["참조.csv"], backend=app.TemplateBackend(), use_cache=False,
+    )
+
+    assert [sub["work_description"] for sub in result["subtasks"]] == ["맨홀 밀폐공간 작업", "철탑 안테나 점검"]
+    assert all(sub["risk_rows"] for sub in result["subtasks"])
+    hazards = {row[4] for row in app.extract_risk_table_rows(result["full_report"])}
+    assert {"산소결핍으로 인한 질식 위험", "철탑 승강 중 추락 위험"} <= hazards
+    assert result["used_references"] == ["참조.csv"]
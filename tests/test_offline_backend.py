@@ -0,0 +1,20 @@
+def test_offline_backend_only_changes_notice(app, reference_rows):
+    context = {"work_description": "맨홀 밀폐공간 작업", "reference_df": reference_rows}
+    template = app.TemplateBackend().complete([], context=context)
+    offline = app.OfflineBackend().complete([], context=context)
+
+    assert app.OfflineBackend.notice in offline["text"]
+    assert app.TemplateBackend.notice in template["text"]
+    assert offline["text"].replace(app.OfflineBackend.notice, "") == template["text"].replace(app.TemplateBackend.notice, "")
+    assert offline["model"] == "오프라인 참조자료 평가"
+    assert template["finish_reason"] == offline["finish_reason"] == "stop"
+
+
+def test_offline_reason_follows_mode_and_connectivity(app, monkeypatch):
+    monkeypatch.setattr(app, "OFFLINE_MODE", "off")
+    assert app.offline_assessment_reason(None) == ""
+    monkeypatch.setattr(app, "OFFLINE_MODE", "on")
+    assert app.offline_assessment_reason(app.TemplateBackend())
+    monkeypatch.setattr(app, "OFFLINE_MODE", "auto")
+    assert app.offline_assessment_reason(None)
+    assert app.offline_assessment_reason(app.TemplateBackend()) == ""
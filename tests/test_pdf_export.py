@@ -0,0 +1,69 @@
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import make_assessment
+
+
+@pytest.fixture
+def pdf(app):
+    return app.risk_report_pdf
+
+
+def fake_render(payloads, font_path=""):
+    return ",".join(payload["work_description"] for payload in payloads).encode("utf-8")
+
+
+def test_pdf_payload_is_plain_data(app):
+    payload = app.build_pdf_payload(make_assessment(app))
+
+    assert payload["columns"] == app.RISK_TABLE_COLUMNS
+    assert [row[5] for row in payload["rows"]] == ["C4", "C3", "C2"]
+    assert payload["sections"]["safety_checklist"] == "- [ ] 가스 측정"
+    assert set(payload["sections"]) == {"work_analysis", "additional_safety", "safety_checklist"}
+
+
+def test_single_chunk_renders_in_process(pdf, monkeypatch):
+    monkeypatch.setattr(pdf, "render_assessments_pdf", fake_render)
+    monkeypatch.setattr(pdf, "get_render_pool", lambda *args: pytest.fail("소량 렌더링에 프로세스 풀 사용"))
+
+    chunks = list(pdf.render_pdf_batch(({"work_description": f"w{number}"} for number in range(3)), workers=4, chunk_size=5))
+    assert chunks == [(3, b"w0,w1,w2")]
+
+
+def test_batches_use_shared_pool_in_order(pdf, monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    requested = []
+    monkeypatch.setattr(pdf, "render_assessments_pdf", fake_render)
+    monkeypatch.setattr(pdf, "get_render_pool", lambda font_path, workers: requested.append(workers) or pool)
+
+    payloads = [{"work_description": f"w{number}"} for number in range(5)]
+    chunks = list(pdf.render_pdf_batch(payloads, workers=2, chunk_size=2))
+    list(pdf.render_pdf_batch(payloads, workers=2, chunk_size=2))
+    pool.shutdown()
+
+    assert chunks == [(2, b"w0,w1"), (2, b"w2,w3"), (1, b"w4")]
+    assert requested == [2, 2]
+
+
+def test_render_pool_is_created_once(pdf):
+    try:
+        first = pdf.get_render_pool("", 2)
+        assert pdf.get_render_pool("", 2) is first
+        assert pdf.get_render_pool("", 3) is not first
+    finally:
+        for key in [("", 2), ("", 3)]:
+            pdf._render_pools.pop(key).shutdown()
+
+
+def test_pdf_bundle_names_entries_by_range(app, pdf, monkeypatch):
+    monkeypatch.setattr(pdf, "render_assessments_pdf", fake_render)
+    monkeypatch.setattr(app, "PDF_BATCH_CHUNK_SIZE", 2)
+    output = io.BytesIO()
+
+    count = app.write_pdf_bundle((make_assessment(app, f"a{number}") for number in range(3)), output, workers=1)
+
+    assert count == 3
+    assert zipfile.ZipFile(output).namelist() == ["위험성평가서_001-002.pdf", "위험성평가서_003-003.pdf"]
@@ -0,0 +1,51 @@
+import pytest
+
+from conftest import REFERENCE_CSV_ROWS as ROWS
+
+
+@pytest.fixture
+def job_references(app, reference_file):
+    """
+    백그라운드 작업처럼 참조 파일 목록을 스레드에 지정 (세션 상태 없이 프롬프트 생성)
+    """
+    files = reference_file(ROWS)
+    app._job_context.reference_files = files
+    yield files
+    app._job_context.reference_files = None
+
+
+def test_static_prefix_is_shared_across_work_descriptions(app, job_references):
+    template = app.PromptTemplate("test", static_prefix=True, request_format=app.PROMPT_TEMPLATES["v3"].request_format)
+    first = template.build_messages("맨홀 작업", ["참조.csv"], ["맨홀 밀폐공간 작업"])
+    second = template.build_messages("철탑 안테나 점검", ["참조.csv"])
+
+    assert [message["role"] for message in first] == ["system", "user"]
+    # 작업 내용과 후보는 마지막 user 메시지에만 들어가고, 고정 접두부는 같은 객체를 재사용
+    assert first[0]["content"] is second[0]["content"]
+    assert "맨홀 밀폐공간 작업" in first[0]["content"] and "산소결핍으로 인한 질식 위험" in first[0]["content"]
+    assert first[1]["content"].startswith("**작업 내용**: 맨홀 작업")
+    assert "**참조자료의 유사 작업 후보**: 맨홀 밀폐공간 작업" in first[1]["content"]
+    assert "**참조자료의 유사 작업 후보**: 없음" in second[1]["content"]
+
+
+def test_prefix_cache_follows_reference_signature(app, job_references):
+    template = app.PromptTemplate("test", static_prefix=True, request_format="{work_description}", max_cached_prefixes=1)
+    prefix = template.prefix(["참조.csv"])
+    assert template.prefix(["참조.csv"]) is prefix
+
+    job_references["참조.csv"]["modified"] = "2025-08-26 10:00:00"
+    assert template.prefix(["참조.csv"]) is not prefix
+    assert len(template._prefixes) == 1
+
+
+def test_v1_template_keeps_work_description_before_references(app, job_references):
+    messages = app.PROMPT_TEMPLATES["v1"].build_messages("맨홀 작업", ["참조.csv"])
+
+    assert len(messages) == 1 and messages[0]["role"] == "user"
+    content = messages[0]["content"]
+    assert content.index("**작업 내용**: 맨홀 작업") < content.index("=== 참조.csv ===")
+
+
+def test_summarize_prompt_usage_reports_cache_ratio(app):
+    assert app.summarize_prompt_usage({"prompt_tokens": 200, "cached_tokens": 150})["cached_ratio"] == 75.0
+    assert app.summarize_prompt_usage({})["cached_ratio"] is None
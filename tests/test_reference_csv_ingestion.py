@@ -0,0 +1,91 @@
+import codecs
+import csv
+
+import pandas as pd
+
+from conftest import REFERENCE_CSV_HEADER as HEADER
+from conftest import REFERENCE_CSV_ROWS as ROWS
+
+
+def write_csv(path, rows, encoding, prefix_rows=()):
+    with open(path, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerows(prefix_rows)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_sniff_text_encoding(app, tmp_path, monkeypatch):
+    text = "작업,위험요인\n맨홀,질식\n"
+    for name, encoding, expected in [
+        ("bom.csv", "utf-8-sig", "utf-8-sig"),
+        ("utf8.csv", "utf-8", "utf-8"),
+        ("cp949.csv", "cp949", "cp949"),
+    ]:
+        path = tmp_path / name
+        path.write_text(text, encoding=encoding)
+        assert app.sniff_text_encoding(str(path)) == expected
+
+    # 앞부분 끝에서 잘린 UTF-8 멀티바이트 문자는 오류로 보지 않음
+    path = tmp_path / "cut.csv"
+    path.write_bytes("가".encode("utf-8") * 10)
+    monkeypatch.setattr(app, "REFERENCE_ENCODING_SNIFF_BYTES", 4)
+    assert app.sniff_text_encoding(str(path)) == "utf-8"
+
+
+def test_cp949_after_ascii_prefix_falls_back(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "REFERENCE_ENCODING_SNIFF_BYTES", 64)
+    filler = [["# ascii only filler row"] + [""] * (len(HEADER) - 1)] * 4
+    path = write_csv(tmp_path / "참조.csv", ROWS, "cp949", prefix_rows=filler)
+    assert app.sniff_text_encoding(path) == "utf-8"
+    assert app.text_encoding_candidates(path) == ["utf-8", "cp949"]
+
+    rows, text = app.parse_reference_csv(path)
+    assert "맨홀 밀폐공간 작업" in text and "�" not in text
+    assert list(rows["세부 위험요인"]) == [row[7] for row in ROWS]
+
+    txt = tmp_path / "참조.txt"
+    txt.write_bytes(b"a" * 100 + "밀폐공간 질식".encode("cp949"))
+    assert app.load_file_content(str(txt)).endswith("밀폐공간 질식")
+
+
+def test_chunked_rows_match_single_chunk(app, tmp_path, monkeypatch):
+    title = [["위험성 평가표"] + [""] * (len(HEADER) - 1)]
+    whole = app.parse_reference_csv(write_csv(tmp_path / "whole.csv", ROWS, "utf-8", title))[0]
+    # 한 행씩 나눠 읽어도 병합 셀 채움이 묶음 경계를 넘어 이어짐
+    monkeypatch.setattr(app, "REFERENCE_CSV_CHUNK_ROWS", 1)
+    chunked = app.parse_reference_csv(write_csv(tmp_path / "chunked.csv", ROWS, "utf-8", title))[0]
+
+    pd.testing.assert_frame_equal(chunked.astype(str), whole.astype(str))
+    assert list(chunked["작업 내용"]) == ["맨홀 밀폐공간 작업"] * 2 + ["철탑 안테나 점검 작업"] * 2
+
+
+def test_text_is_truncated_at_limit(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "REFERENCE_TEXT_MAX_CHARS", 300)
+    monkeypatch.setattr(app, "REFERENCE_CSV_CHUNK_ROWS", 2)
+    rows = [[str(number)] + row[1:] for number, row in enumerate(ROWS * 10, start=1)]
+    parsed, text = app.parse_reference_csv(write_csv(tmp_path / "참조.csv", rows, "utf-8"))
+
+    body, _, note = text.rpartition("\n")
+    assert len(body) <= 300 and note.startswith("... (이하 생략")
+    # 텍스트가 잘려도 행은 모두 변환됨
+    assert len(parsed) == len(rows)
+
+
+def test_csv_is_parsed_once_for_text_and_rows(app, reference_file, monkeypatch):
+    path = reference_file(ROWS)["참조.csv"]["path"]
+    calls = []
+    read_csv = pd.read_csv
+
+    def counting_read_csv(*args, **kwargs):
+        calls.append(args[0])
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(app.pd, "read_csv", counting_read_csv)
+    text = app.load_file_content(path)
+    rows = app.parse_reference_rows(path)
+
+    assert calls == [path]
+    assert "맨홀 밀폐공간 작업" in text
+    assert len(rows) == len(ROWS)
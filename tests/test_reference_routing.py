@@ -0,0 +1,78 @@
+import copy
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import REFERENCE_CSV_HEADER, REFERENCE_CSV_ROWS
+
+
+def write_reference_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["위험성 평가표"] + [""] * (len(REFERENCE_CSV_HEADER) - 1))
+        writer.writerow(REFERENCE_CSV_HEADER)
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def reference_folder(app, tmp_path, monkeypatch):
+    """
+    작업이 다른 참조 CSV 두 개를 담은 참조 폴더 (기본 파일: 맨홀.csv)
+    """
+    monkeypatch.setattr(app, "REFERENCE_VERSION_FOLDER", str(tmp_path / "reference_versions"))
+    monkeypatch.setattr(app, "REFERENCE_FILES_FOLDER", str(tmp_path / "reference_files"))
+    monkeypatch.setattr(app, "DEFAULT_REFERENCE_FILE", "맨홀.csv")
+    monkeypatch.setattr(app, "REFERENCE_AUTO_ROUTING", True)
+    os.makedirs(app.REFERENCE_FILES_FOLDER)
+    write_reference_csv(os.path.join(app.REFERENCE_FILES_FOLDER, "맨홀.csv"), REFERENCE_CSV_ROWS[:2])
+    write_reference_csv(os.path.join(app.REFERENCE_FILES_FOLDER, "철탑.csv"), REFERENCE_CSV_ROWS[2:])
+    return app.REFERENCE_FILES_FOLDER
+
+
+@pytest.fixture
+def job_files(app, reference_folder):
+    files = app.load_reference_files_from_folder()
+    app._job_context.reference_files = files
+    yield files
+    app._job_context.reference_files = None
+
+
+def test_folder_listing_keeps_only_file_information(app, job_files):
+    assert sorted(job_files) == ["맨홀.csv", "철탑.csv"]
+    # 내용은 목록에 두지 않고 필요할 때 캐시에서 읽음
+    assert all(set(info) == {"path", "size", "modified"} for info in job_files.values())
+
+
+def test_routing_selects_files_with_matching_work_items(app, job_files):
+    routed = app.route_reference_files("오늘 타워 안테나 점검", ["맨홀.csv", "철탑.csv"])
+    assert routed["routed"] and routed["selected"] == ["철탑.csv"]
+
+    routed = app.route_reference_files("전혀 관계없는 문장", ["맨홀.csv", "철탑.csv"])
+    assert not routed["routed"] and routed["selected"] == ["맨홀.csv", "철탑.csv"]
+
+
+def test_reference_content_does_not_mutate_shared_listing(app, job_files):
+    listing = copy.deepcopy(job_files)
+
+    def build(_):
+        # 백그라운드 작업 스레드처럼 같은 참조 파일 목록을 사용
+        app._job_context.reference_files = job_files
+        return app.build_reference_block(["맨홀.csv", "철탑.csv"])
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        blocks = list(pool.map(build, range(8)))
+
+    assert len(set(blocks)) == 1
+    assert "=== 맨홀.csv ===" in blocks[0] and "철탑 안테나 점검 작업" in blocks[0]
+    assert job_files == listing
+
+
+def test_reference_content_follows_file_changes(app, job_files):
+    path = job_files["철탑.csv"]["path"]
+    assert "감전" in app.reference_file_content("철탑.csv")
+
+    write_reference_csv(path, REFERENCE_CSV_ROWS[2:3])
+    os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+    assert "감전" not in app.reference_file_content("철탑.csv")
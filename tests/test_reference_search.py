@@ -0,0 +1,40 @@
+import pandas as pd
+
+
+def test_search_ranks_matching_rows(app, reference_rows):
+    index = app.ReferenceSearchIndex(reference_rows)
+    results = index.search("사다리 추락")
+
+    assert results.columns[0] == "점수"
+    assert list(results["세부 위험요인"].astype(str))[:1] == ["맨홀 출입 시 사다리에서 추락 위험"]
+    assert results["점수"].is_monotonic_decreasing
+    # 동의어(타워 → 철탑)로도 검색
+    assert set(index.search("타워 승강")["작업 내용"].astype(str)) == {"철탑 안테나 점검 작업"}
+    assert index.search("   ").empty and "점수" in index.search("   ").columns
+
+
+def test_match_work_items_uses_token_features(app, reference_rows):
+    index = app.ReferenceSearchIndex(reference_rows)
+
+    assert index.match_work_items("오늘 타워에서 안테나 점검", top_n=2)[0] == "철탑 안테나 점검 작업"
+    assert index.match_work_items("맨홀 밀폐 공간 작업") == ["맨홀 밀폐공간 작업"]
+    assert index.match_work_items("전혀 관계없는 문장") == []
+
+
+def test_saved_index_matches_in_memory_index(app, reference_rows, tmp_path):
+    built = app.ReferenceSearchIndex(reference_rows)
+    built.save(str(tmp_path / "index"))
+    loaded = app.ReferenceSearchIndex.load(str(tmp_path / "index"))
+
+    assert isinstance(loaded.postings["세부 위험요인"], app.MappedPostings)
+    for query in ["사다리 추락", "감전", "산소결핍 질식"]:
+        pd.testing.assert_frame_equal(
+            loaded.search(query).reset_index(drop=True).astype(str),
+            built.search(query).reset_index(drop=True).astype(str),
+        )
+    assert list(loaded.work_item_scores("철탑 안테나")) == list(built.work_item_scores("철탑 안테나"))
+
+
+def test_highlight_matches_marks_query_and_synonyms(app):
+    assert app.highlight_matches("철탑 승강 중 추락", "추락") == "철탑 승강 중 **추락**"
+    assert app.highlight_matches("타워 승강 중 추락", "철탑") == "**타워** 승강 중 추락"
@@ -0,0 +1,82 @@
+import os
+
+from conftest import REFERENCE_CSV_ROWS as ROWS
+
+
+def edited(rows, position, column, value):
+    rows = [list(row) for row in rows]
+    rows[position][column] = value
+    return rows
+
+
+def test_row_ids_are_stable_across_edits(app, reference_file):
+    files = reference_file(ROWS)
+    before = app.reference_row_versions(files["참조.csv"]["path"])
+    files = reference_file(edited(ROWS, 3, 9, "이격거리 3m 이상 확보"))
+    after = app.reference_row_versions(files["참조.csv"]["path"])
+
+    assert list(before["row_id"]) == list(after["row_id"])
+    assert list(before["row_hash"] == after["row_hash"]) == [True, True, True, False]
+    assert before.attrs["version"] != after.attrs["version"]
+    # 병합 셀로 비어 있던 작업 내용도 위 행의 작업으로 채워짐
+    assert list(after["작업키"]) == ["맨홀밀폐공간작업"] * 2 + ["철탑안테나점검작업"] * 2
+
+
+def test_diff_reference_versions(app, reference_file):
+    files = reference_file(ROWS)
+    path = files["참조.csv"]["path"]
+    first = app.record_reference_version(path)
+    assert app.record_reference_version(path) == first
+
+    rows = edited(ROWS, 0, 9, "산소·유해가스 농도 측정")
+    rows = rows[:3] + [["5", "", "", "", "", "", "맞음", "공구 낙하 맞음", "C3", "낙하방지끈 사용", "C1"]]
+    files = reference_file(rows)
+    second = app.record_reference_version(path)
+    assert [item["version"] for item in app.list_reference_versions("참조.csv")] == [first, second]
+
+    changes = app.diff_reference_versions(
+        app.load_reference_version("참조.csv", first), app.load_reference_version("참조.csv", second)
+    ).set_index("세부 위험요인")
+    assert changes["변경"].to_dict() == {
+        "산소결핍으로 인한 질식 위험": "변경",
+        "인접 전력선 접촉 감전": "삭제",
+        "공구 낙하 맞음": "추가",
+    }
+    assert changes.loc["산소결핍으로 인한 질식 위험", "변경 내용"] == "위험성 감소대책: 산소농도 측정 → 산소·유해가스 농도 측정"
+    # 번호(No)만 바뀐 행은 변경으로 보지 않음
+    assert app.diff_reference_versions(
+        app.load_reference_version("참조.csv", first), app.load_reference_version("참조.csv", first)
+    ).empty
+
+
+def test_only_dependent_results_are_invalidated(app, reference_file):
+    files = reference_file(ROWS)
+    manhole = {"used_references": ["참조.csv"], "candidate_items": ["맨홀 밀폐공간 작업"]}
+    tower = {"used_references": ["참조.csv"], "candidate_items": ["철탑 안테나 점검 작업"]}
+    for result in (manhole, tower):
+        result["reference_dependencies"] = app.reference_dependencies(result, files)
+    assert len(manhole["reference_dependencies"]["rows"]["참조.csv"]) == 2
+
+    # 철탑 작업의 행만 수정
+    files = reference_file(edited(ROWS, 3, 9, "이격거리 3m 이상 확보"))
+    assert app.reference_dependencies_valid(manhole, files)
+    assert not app.reference_dependencies_valid(tower, files)
+    edited_row_id = app.reference_row_versions(files["참조.csv"]["path"])["row_id"].iloc[3]
+    assert app.changed_reference_rows(tower["reference_dependencies"], files) == [edited_row_id]
+
+    # 맨홀 작업에 행이 추가되면 맨홀 결과도 다시 분석
+    files = reference_file(ROWS[:2] + [["2-1", "", "", "", "", "", "화재", "가스 폭발 화재", "C3", "가스 측정", "C1"]] + ROWS[2:])
+    assert not app.reference_dependencies_valid(manhole, files)
+
+    # 파일이 없어지면 의존 행 전체가 바뀐 것으로 봄
+    assert len(app.changed_reference_rows(manhole["reference_dependencies"], {})) == 2
+
+
+def test_versions_are_not_written_by_reads(app, reference_file, tmp_path):
+    files = reference_file(ROWS)
+    app.reference_row_versions(files["참조.csv"]["path"])
+    assert app.list_reference_versions("참조.csv") == []
+    assert not (tmp_path / "reference_versions").exists()
+
+    app.record_reference_versions(files)
+    assert len(app.list_reference_versions("참조.csv")) == 1
@@ -0,0 +1,69 @@
+def table_row(number, hazard_type, hazard, measure="대책"):
+    return f"| {number} | 맨홀 밀폐공간 작업 | C3 | {hazard_type} | {hazard} | C3 | {measure} | C1 |"
+
+
+def completion(text, finish_reason="stop"):
+    return {"response": {"text": text, "finish_reason": finish_reason, "usage": {}}, "model": "test"}
+
+
+MAIN_RESPONSE = "\n".join([
+    "## 작업 내용 분석",
+    "맨홀 내부 작업",
+    "## 위험요인과 감소대책",
+    "| 순번 | 작업 내용 | 작업등급 | 재해유형 | 세부 위험요인 | 위험등급-개선전 | 위험성 감소대책 | 위험등급-개선후 |",
+    "|------|-----------|----------|----------|---------------|----------------|----------------|----------------|",
+    # 참조자료와 표현만 다른 행
+    table_row(1, "질식", "밀폐공간 내부의 산소 결핍으로 인한 질식 위험"),
+    table_row(2, "떨어짐", "맨홀 출입 시 사다리에서 추락 위험"),
+    "| 3 | 맨홀 밀폐공간 작업 | C3 | 부딪",
+])
+
+
+def test_truncated_response_requests_only_missing_hazards(app, reference_rows):
+    requests = []
+
+    def run_request(messages):
+        requests.append(messages)
+        if len(requests) == 1:
+            return completion(MAIN_RESPONSE, "length")
+        # 다시 요청한 응답이 이미 작성한 행을 반복하고, 빠진 위험요인 중 베임은 작성하지 않음
+        return completion("\n".join([
+            table_row(2, "질식", "밀폐공간 내부의 산소 결핍으로 인한 질식 위험"),
+            table_row(3, "떨어짐", "맨홀 출입 시 사다리에서 추락 위험"),
+            table_row(4, "부딪힘", "도로 작업 중 통행 차량과 충돌 위험"),
+        ]))
+
+    messages = [{"role": "user", "content": "작업: 맨홀 밀폐공간 작업"}]
+    result = app.generate_risk_report(run_request, messages, "맨홀 밀폐공간 작업", reference_rows, ["맨홀 밀폐공간 작업"])
+
+    # 표현만 바뀐 질식 행은 빠진 것으로 보지 않음
+    retry_listing = requests[1][-1]["content"]
+    assert "질식" not in retry_listing.split("**분할 작성 요청**")[1]
+    assert all(hazard_type in retry_listing for hazard_type in ("떨어짐", "부딪힘", "베임"))
+
+    rows = app.extract_risk_table_rows(result["text"])
+    hazards = [row[4] for row in rows]
+    assert len(hazards) == len(set(hazards)) == 4
+    assert sum("질식" in hazard for hazard in hazards) == 1
+    assert hazards[-1] == "케이블 절단 공구 사용 중 손 베임"
+    assert result["truncated"] is True
+    assert result["recovered_rows"] == 3
+    assert result["requests"] == 2
+
+
+def test_complete_response_is_used_as_is(app, reference_rows):
+    text = MAIN_RESPONSE.rsplit("\n", 1)[0]
+    result = app.generate_risk_report(lambda messages: completion(text), [{"role": "user", "content": "x"}],
+                                      "맨홀 밀폐공간 작업", reference_rows, ["맨홀 밀폐공간 작업"])
+    assert result["text"] == text
+    assert result["requests"] == 1
+    assert result["recovered_rows"] == 0
+
+
+def test_dedupe_table_rows_ignores_whitespace(app):
+    rows = [
+        ["1", "작업", "C3", "떨어짐", "사다리 추락 위험", "C3", "대책", "C1"],
+        ["2", "작업", "C3", "떨어짐", "사다리  추락위험", "C2", "다른 대책", "C1"],
+        ["3", "다른 작업", "C3", "떨어짐", "사다리 추락 위험", "C3", "대책", "C1"],
+    ]
+    assert [row[0] for row in app.dedupe_table_rows(rows)] == ["1", "3"]
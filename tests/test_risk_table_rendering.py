@@ -0,0 +1,32 @@
+import pandas as pd
+
+
+def risk_table(app, grades):
+    return pd.DataFrame(
+        [[str(number), "맨홀 작업", "C3", "질식", f"위험 {number}", grade, "대책", "C1"]
+         for number, grade in enumerate(grades, start=1)],
+        columns=app.RISK_TABLE_COLUMNS,
+    )
+
+
+def test_grade_styles_are_computed_per_column(app):
+    risk_df = risk_table(app, ["C4", " C3", "C2", "C1", "S"])
+    styles = app.risk_grade_styles(risk_df)
+
+    assert styles.shape == risk_df.shape
+    assert list(styles["위험등급-개선전"]) == [
+        app.RISK_GRADE_STYLES["C4"], app.RISK_GRADE_STYLES["C3"], app.RISK_GRADE_STYLES["C2"], "", "",
+    ]
+    # 등급 컬럼 외에는 스타일을 지정하지 않음
+    assert (styles.drop(columns=["위험등급-개선전"]) == "").all().all()
+
+
+def test_grade_styles_without_grade_column(app):
+    risk_df = risk_table(app, ["C4"]).drop(columns=["위험등급-개선전"])
+    assert (app.risk_grade_styles(risk_df) == "").all().all()
+
+
+def test_page_bounds_limit_rows_to_one_page(app):
+    assert app.page_bounds(30, "small", page_size=50) == (0, 30)
+    # 한 페이지를 넘으면 첫 페이지(기본값)만 표시
+    assert app.page_bounds(120, "large", page_size=50) == (0, 50)
@@ -0,0 +1,67 @@
+import pandas as pd
+
+
+def risk_table(app, work_item, hazards):
+    return pd.DataFrame(
+        [[str(number), work_item, "C3", hazard_type, hazard, "C3", "대책", "C1"]
+         for number, (hazard_type, hazard) in enumerate(hazards, start=1)],
+        columns=app.RISK_TABLE_COLUMNS,
+    )
+
+
+def report(app, work_item, hazards):
+    lines = app.risk_table_markdown(risk_table(app, work_item, hazards).values.tolist())
+    return "\n".join(["## 작업 내용 분석", "맨홀 작업", "", "## 위험요인과 감소대책", *lines, "", "## 추가 안전 조치", "- 감시인 배치"])
+
+
+def test_reworded_hazards_count_as_covered(app, reference_rows):
+    table = risk_table(app, "맨홀 밀폐공간 작업", [
+        ("질식", "밀폐공간 내부의 산소 결핍으로 인한 질식 위험"),
+        ("떨어짐", "맨홀 출입 시 사다리에서 추락"),
+        ("부딪힘", "도로 작업 중 통행차량과 충돌 위험"),
+        ("베임", "케이블 절단 공구 사용 중 손 베임"),
+    ])
+    summary = app.verify_risk_table(table, reference_rows)
+    assert summary["work_items"] == ["맨홀 밀폐공간 작업"]
+    assert (summary["expected"], summary["matched"], summary["coverage"]) == (4, 4, 100.0)
+    assert summary["missing"].empty
+
+
+def test_missing_hazards_are_reported(app, reference_rows):
+    table = risk_table(app, "철탑 안테나 점검 작업", [("떨어짐", "철탑 승강 중 추락 위험")])
+    summary = app.verify_risk_table(table, reference_rows)
+    assert (summary["expected"], summary["matched"], summary["coverage"]) == (4, 1, 25.0)
+    assert set(summary["missing"]["재해유형"].astype(str)) == {"맞음", "감전", "온열질환"}
+
+
+def test_unrelated_hazard_is_not_counted(app, reference_rows):
+    table = risk_table(app, "맨홀 밀폐공간 작업", [("화재", "용접 불티로 인한 화재")])
+    summary = app.verify_risk_table(table, reference_rows)
+    assert summary["matched"] == 0
+    assert summary["coverage"] == 0.0
+
+
+def test_work_item_is_mapped_by_similarity_or_candidates(app, reference_rows):
+    # 표기가 다른 작업 내용은 가장 유사한 참조 작업에 대응
+    table = risk_table(app, "철탑 안테나 점검", [("떨어짐", "철탑 승강 중 추락 위험")])
+    assert app.verify_risk_table(table, reference_rows)["work_items"] == ["철탑 안테나 점검 작업"]
+    # 대응되는 작업이 없으면 분석 시 선정한 첫 번째 후보 사용
+    empty = risk_table(app, "", [])
+    summary = app.verify_risk_table(empty, reference_rows, ["맨홀 밀폐공간 작업"])
+    assert summary["work_items"] == ["맨홀 밀폐공간 작업"]
+    assert summary["coverage"] == 0.0
+
+
+def test_verify_and_complete_report_inserts_missing_rows(app, reference_rows):
+    text = report(app, "철탑 안테나 점검 작업", [("떨어짐", "철탑 승강 중 추락 위험")])
+    completed, summary = app.verify_and_complete_report(text, reference_rows, auto_insert=True)
+    assert summary["coverage"] == 25.0
+    assert summary["inserted"] == 3
+    rows = app.extract_risk_table_rows(completed)
+    assert [row[0] for row in rows] == ["1", "2", "3", "4"]
+    assert "추가 안전 조치" in completed
+
+    unchanged, summary = app.verify_and_complete_report(text, reference_rows, auto_insert=False)
+    assert unchanged == text
+    assert summary["inserted"] == 0
+    assert len(summary["missing"]) == 3
@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import REFERENCE_CSV_ROWS as ROWS
+
+
+@pytest.fixture
+def shared_store(app, tmp_path, monkeypatch):
+    folder = str(tmp_path / "shared")
+    monkeypatch.setattr(app, "SHARED_STORE_FOLDER", folder)
+    return folder
+
+
+def test_arrow_frame_round_trip_keeps_compact_dtypes(app, reference_rows, tmp_path):
+    path = str(tmp_path / "rows.arrow")
+    app.write_arrow_frame(reference_rows, path)
+    loaded = app.read_arrow_frame(path)
+
+    pd.testing.assert_frame_equal(loaded, reference_rows)
+    assert loaded["위험등급-개선전"].dtype == app.RISK_GRADE_DTYPE
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_shared_reference_rows_are_written_once(app, reference_file, shared_store, monkeypatch):
+    path = reference_file(ROWS)["참조.csv"]["path"]
+    rows = app.load_reference_rows(path)
+    assert [name.endswith(".arrow") for name in os.listdir(shared_store)] == [True]
+
+    # 다른 프로세스처럼 메모리 캐시 없이 읽어도 저장된 파일을 매핑하고 다시 변환하지 않음
+    app._load_shared_reference_rows.clear()
+    monkeypatch.setattr(app, "parse_reference_rows", lambda file_path: pytest.fail("다시 변환함"))
+    pd.testing.assert_frame_equal(app.load_reference_rows(path), rows)
+
+
+def test_shared_search_index_is_published_once(app, reference_rows, shared_store, monkeypatch):
+    signature = (("참조.xlsx", 1.0), len(reference_rows))
+    built = app.load_shared_reference_search_index(signature, reference_rows)
+    assert [name for name in os.listdir(shared_store) if name.endswith(".tmp")] == []
+
+    monkeypatch.setattr(app.ReferenceSearchIndex, "save", lambda self, folder: pytest.fail("다시 저장함"))
+    loaded = app.load_shared_reference_search_index(signature, reference_rows)
+    assert loaded.match_work_items("타워 안테나 점검") == built.match_work_items("타워 안테나 점검") == ["철탑 안테나 점검 작업"]
+
+
+def test_shared_result_cache_is_shared_and_bounded(app, tmp_path):
+    path = str(tmp_path / "analysis_cache.sqlite")
+    writer = app.SharedAnalysisResultCache(path, max_entries=2)
+    reader = app.SharedAnalysisResultCache(path, max_entries=2)
+
+    writer.put("a", {"full_report": "맨홀"})
+    writer.put("b", {"full_report": "철탑"})
+    assert reader.get("a") == {"full_report": "맨홀"}
+    # 최근에 읽은 a는 남고 가장 오래 쓰지 않은 b가 밀려남
+    writer.put("c", {"full_report": "옥상"})
+    assert reader.get("b") is None
+    assert reader.get("a") is not None and reader.get("c") == {"full_report": "옥상"}
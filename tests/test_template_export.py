@@ -0,0 +1,62 @@
+import io
+import os
+import zipfile
+
+import openpyxl
+import pytest
+
+from conftest import make_assessment
+
+
+@pytest.fixture
+def template_path(app):
+    path = os.path.join(os.path.dirname(app.__file__), app.REFERENCE_FILES_FOLDER, app.DEFAULT_REFERENCE_FILE)
+    if not os.path.exists(path):
+        pytest.skip("기본 참조 양식 파일 없음")
+    return path
+
+
+def filled_rows(app, worksheet, template):
+    columns = {name: position + 1 for position, name in template["columns"].items()}
+    return [
+        (worksheet.cell(row, columns["No"]).value, worksheet.cell(row, columns["위험등급-개선전"]).value)
+        for row in range(template["prototype_row"], worksheet.max_row + 1)
+        if worksheet.cell(row, columns["세부 위험요인"]).value
+    ]
+
+
+def test_small_batch_is_one_workbook(app, template_path):
+    sheet = str(app.load_reference_rows(template_path)["시트"].iloc[0])
+    template = app.load_report_template(template_path, sheet, os.path.getmtime(template_path))
+    output = io.BytesIO()
+    results = [make_assessment(app, f"a{number}") for number in range(3)]
+
+    count, zipped = app.write_template_bundle(results, output, template_path, sheet, max_sheets=5)
+
+    workbook = openpyxl.load_workbook(io.BytesIO(output.getvalue()))
+    assert (count, zipped) == (3, False)
+    assert workbook.sheetnames == ["1_2025-08-25", "2_2025-08-25", "3_2025-08-25"]
+    # 양식의 서식 원본 행 자리부터 생성된 행을 채우고 등급은 등급 기호만 기록
+    assert filled_rows(app, workbook.worksheets[0], template) == [(1, "C4"), (2, "C3"), (3, "C2")]
+
+
+def test_large_batch_is_split_into_zipped_workbooks(app, template_path):
+    sheet = str(app.load_reference_rows(template_path)["시트"].iloc[0])
+    output = io.BytesIO()
+    results = (make_assessment(app, f"a{number}") for number in range(5))
+
+    count, zipped = app.write_template_bundle(results, output, template_path, sheet, max_sheets=2)
+
+    assert (count, zipped) == (5, True)
+    with zipfile.ZipFile(io.BytesIO(output.getvalue())) as bundle:
+        names = bundle.namelist()
+        sheet_names = [openpyxl.load_workbook(io.BytesIO(bundle.read(name))).sheetnames for name in names]
+    assert [name.rsplit("_", 1)[1] for name in names] == ["001.xlsx", "002.xlsx", "003.xlsx"]
+    # 시트 번호는 통합문서를 나눠도 이어짐
+    assert sheet_names == [["1_2025-08-25", "2_2025-08-25"], ["3_2025-08-25", "4_2025-08-25"], ["5_2025-08-25"]]
+
+
+def test_empty_batch_is_rejected(app, template_path):
+    sheet = str(app.load_reference_rows(template_path)["시트"].iloc[0])
+    with pytest.raises(ValueError):
+        app.write_template_bundle([], io.BytesIO(), template_path, sheet)
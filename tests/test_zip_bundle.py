@@ -0,0 +1,52 @@
+import io
+import zipfile
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+from conftest import make_assessment
+
+BUNDLE_TIME = datetime(2025, 8, 25, 9, 30, 0)
+
+
+def bundle(app, results, **options):
+    output = io.BytesIO()
+    count = app.write_zip_bundle(results, output, BUNDLE_TIME, **options)
+    return count, zipfile.ZipFile(io.BytesIO(output.getvalue()))
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_entries_are_written_in_order_with_one_timestamp(app, workers):
+    results = (make_assessment(app, f"a{number}", work_description=f"작업 {number}") for number in range(4))
+    count, zip_file = bundle(app, results, folders=True, workers=workers)
+
+    names = zip_file.namelist()
+    assert count == 4
+    assert [name.split("/")[0] for name in names[::6]] == ["001_2025-08-25", "002_2025-08-25", "003_2025-08-25", "004_2025-08-25"]
+    assert names[:6] == [
+        "001_2025-08-25/0.전체보고서_20250825_093000.md",
+        "001_2025-08-25/1.작업분석_20250825_093000.md",
+        "001_2025-08-25/2.위험성평가표_20250825_093000.md",
+        "001_2025-08-25/3.추가안전조치_20250825_093000.md",
+        "001_2025-08-25/4.작업전체크리트_20250825_093000.md",
+        "001_2025-08-25/위험성평가표_20250825_093000.xlsx",
+    ]
+    assert {info.date_time for info in zip_file.infolist()} == {(2025, 8, 25, 9, 30, 0)}
+    # 분석별 항목은 해당 분석 내용으로 생성 (병렬 생성해도 섞이지 않음)
+    assert "작업 2 분석" in zip_file.read("003_2025-08-25/1.작업분석_20250825_093000.md").decode("utf-8-sig")
+
+
+def test_single_report_bundle_contains_excel(app):
+    count, zip_file = bundle(app, [make_assessment(app)])
+    assert count == 1
+    workbook = openpyxl.load_workbook(io.BytesIO(zip_file.read("위험성평가표_20250825_093000.xlsx")))
+    assert workbook["위험성평가표"].max_row == 4
+
+
+def test_report_without_table_has_no_excel_entry(app):
+    result = make_assessment(app, rows=[])
+    result["full_report"] = "## 작업 내용 분석\n분석만 있음"
+    result["sections"] = app.parse_analysis_sections(result["full_report"])
+    _, zip_file = bundle(app, [result])
+    assert not any(name.endswith(".xlsx") for name in zip_file.namelist())
@@ -1,5 +1,5 @@
 import streamlit as st
-from openai import OpenAI
+import openai
 import pandas as pd
 import json
 import os
@@ -10,6 +10,43 @@ from dotenv import load_dotenv
 import locale
 import zipfile
 import glob
+import re
+import uuid
+import threading
+import tempfile
+import xlsxwriter
+import openpyxl
+import time
+import random
+import math
+import hashlib
+import hmac
+import itertools
+import unicodedata
+from collections import OrderedDict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import sys
+import numpy as np
+from pandas.api.types import union_categoricals
+import zlib
+import codecs
+import gzip
+from urllib.parse import unquote
+import sqlite3
+import shutil
+import pyarrow as pa
+import pyarrow.ipc
+import risk_report_pdf
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# 임베딩 색인은 sentence-transformers가 설치된 경우 로컬 모델, 없으면 해시 n-gram TF-IDF 사용
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
 
 # 한국 로케일 설정 (선택사항)
 try:
@@ -24,6 +61,236 @@ load_dotenv()
 REFERENCE_FILES_FOLDER = "reference_files"
 # 기본 참조 파일명
 DEFAULT_REFERENCE_FILE = "참조-SKONS-access위험성평가양식.xlsx"
+# 위험성 평가 이력이 저장되는 폴더 경로
+ASSESSMENT_HISTORY_FOLDER = "assessment_history"
+# 위험성 평가표 행 이력 파일 (커버리지 분석용)
+RISK_HISTORY_FILE = os.path.join(ASSESSMENT_HISTORY_FOLDER, "risk_rows.csv")
+# 위험성 평가 결과 이력 파일 (보고서 전체)
+ASSESSMENT_HISTORY_FILE = os.path.join(ASSESSMENT_HISTORY_FOLDER, "assessments.jsonl")
+# 참조자료 행 단위 버전 기록 폴더 (파일별 버전 스냅샷과 버전 목록, 변경 비교용)
+REFERENCE_VERSION_FOLDER = os.path.join(ASSESSMENT_HISTORY_FOLDER, "reference_versions")
+
+# 모델 호출 동시 실행 수 제한
+MODEL_MAX_CONCURRENCY = int(os.environ.get("MODEL_MAX_CONCURRENCY", "4"))
+# 모델 호출 분당 토큰 한도 (TPM)
+MODEL_TOKENS_PER_MINUTE = int(os.environ.get("MODEL_TOKENS_PER_MINUTE", "200000"))
+# 대기열 최대 길이 (초과 시 요청 거절)
+MODEL_MAX_QUEUE_SIZE = int(os.environ.get("MODEL_MAX_QUEUE_SIZE", "50"))
+# 대기열 최대 대기 시간 (초)
+MODEL_QUEUE_TIMEOUT = float(os.environ.get("MODEL_QUEUE_TIMEOUT", "180"))
+# 429/5xx 오류 시 재시도 횟수
+MODEL_MAX_RETRIES = int(os.environ.get("MODEL_MAX_RETRIES", "4"))
+# 모델 백엔드 (openai: OpenAI API / local: OpenAI 호환 로컬 서버 / template: 오프라인 참조자료 템플릿)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "openai").lower()
+# 분석에 사용하는 기본 모델
+MODEL_NAME = os.environ.get("MODEL_NAME", "gpt-4o-mini")
+# OpenAI 호환 로컬 추론 서버 주소 (예: http://localhost:8000/v1)
+LOCAL_MODEL_BASE_URL = os.environ.get("LOCAL_MODEL_BASE_URL", "")
+# 로컬 추론 서버의 모델명
+LOCAL_MODEL_NAME = os.environ.get("LOCAL_MODEL_NAME", "local-model")
+# 로컬 추론 서버 API 키 (인증이 없는 서버는 임의의 값 사용)
+LOCAL_MODEL_API_KEY = os.environ.get("LOCAL_MODEL_API_KEY", "not-needed")
+# 로컬 추론 서버 동시 실행 수 제한 (CPU 서버는 1 권장)
+LOCAL_MODEL_MAX_CONCURRENCY = int(os.environ.get("LOCAL_MODEL_MAX_CONCURRENCY", "1"))
+# 로컬 추론 서버 분당 토큰 한도 (0이면 제한 없음)
+LOCAL_MODEL_TOKENS_PER_MINUTE = int(os.environ.get("LOCAL_MODEL_TOKENS_PER_MINUTE", "0"))
+# 분석 결과 최대 토큰 수
+MODEL_MAX_TOKENS = 3000
+# 위험요인이 이보다 많은 작업은 표를 나눠 동시에 생성 (행당 약 100토큰, 응답 한도 내 다른 섹션 포함)
+MODEL_CHUNK_ROWS = int(os.environ.get("MODEL_CHUNK_ROWS", "20"))
+# 헤지 요청 사용 여부 (응답 지연 시 동일 요청을 한 번 더 전송)
+MODEL_HEDGE_ENABLED = os.environ.get("MODEL_HEDGE_ENABLED", "true").lower() == "true"
+# 헤지 요청 전송 기준 응답시간 백분위수
+MODEL_HEDGE_PERCENTILE = float(os.environ.get("MODEL_HEDGE_PERCENTILE", "95"))
+# 응답시간 표본이 부족할 때 사용하는 헤지 지연 시간 (초)
+MODEL_HEDGE_DEFAULT_DELAY = float(os.environ.get("MODEL_HEDGE_DEFAULT_DELAY", "15"))
+# 헤지 지연 시간 최솟값 (초)
+MODEL_HEDGE_MIN_DELAY = float(os.environ.get("MODEL_HEDGE_MIN_DELAY", "3"))
+# 모델 응답 마감 시간 (초, 요청 실행 시작 기준)
+MODEL_REQUEST_DEADLINE = float(os.environ.get("MODEL_REQUEST_DEADLINE", "45"))
+# 마감 초과 시 사용할 보조 모델 (비어 있으면 참조자료 기반 표로 바로 대체)
+MODEL_FALLBACK_NAME = os.environ.get("MODEL_FALLBACK_NAME", "")
+# 보조 모델 응답 마감 시간 (초)
+MODEL_FALLBACK_TIMEOUT = float(os.environ.get("MODEL_FALLBACK_TIMEOUT", "30"))
+
+# 오프라인 평가 (auto: 모델을 쓸 수 없으면 참조자료만으로 평가 / on: 항상 오프라인 / off: 사용 안 함)
+OFFLINE_MODE = os.environ.get("OFFLINE_MODE", "auto").lower()
+# 모델 서버 연결 실패 후 이 시간(초) 동안은 모델을 호출하지 않고 바로 오프라인 평가
+OFFLINE_RETRY_SECONDS = float(os.environ.get("OFFLINE_RETRY_SECONDS", "60"))
+
+# 위험성 평가표 컬럼
+RISK_TABLE_COLUMNS = ["순번", "작업 내용", "작업등급", "재해유형", "세부 위험요인", "위험등급-개선전", "위험성 감소대책", "위험등급-개선후"]
+# 위험등급/작업등급 (낮음 → 높음 순서, S는 특별관리)
+RISK_GRADES = ["C1", "C2", "C3", "C4", "S"]
+# 등급 컬럼 공통 자료형 (순서가 있는 범주형이므로 비교/정렬은 정수 코드로 처리)
+RISK_GRADE_DTYPE = pd.CategoricalDtype(RISK_GRADES, ordered=True)
+# 등급 값을 담는 컬럼
+GRADE_COLUMNS = ["작업등급", "위험등급-개선전", "위험등급-개선후"]
+# 정수로 저장하는 번호 컬럼
+NUMBER_COLUMNS = ["순번", "No"]
+# 위험등급별 표시 스타일 (위험등급-개선전 컬럼)
+RISK_GRADE_STYLES = {
+    "C4": "background-color: #e53935;color: #fff;",  # 빨간색
+    "C3": "background-color: #ff9800;color: #000;",  # 주황색
+    "C2": "background-color: #fff176;color: #000;",  # 노랑색
+}
+# 엑셀 내보내기 등급 서식 (위험등급-개선전 컬럼)
+EXCEL_GRADE_FORMATS = {
+    "C4": {"bg_color": "#e53935", "font_color": "#ffffff"},
+    "C3": {"bg_color": "#ff9800", "font_color": "#000000"},
+    "C2": {"bg_color": "#fff176", "font_color": "#000000"},
+}
+# 엑셀 내보내기 섹션 시트 (섹션 키, 시트명)
+EXCEL_SECTION_SHEETS = [
+    ("work_analysis", "작업분석"),
+    ("additional_safety", "추가안전조치"),
+    ("safety_checklist", "작업전체크리스트"),
+]
+# 위험성 평가표 한 페이지에 표시할 행 수
+RISK_TABLE_PAGE_SIZE = 50
+# 참조자료 검색 필드와 가중치
+REFERENCE_SEARCH_FIELDS = {"작업 내용": 1.0, "재해유형": 1.5, "세부 위험요인": 2.0}
+# 참조자료 검색 결과 최대 표시 건수
+REFERENCE_SEARCH_LIMIT = 30
+# 프롬프트에 넣을 유사 작업 후보 수
+PROMPT_CANDIDATE_COUNT = 3
+# 분석 결과 캐시 최대 건수 (0이면 사용 안 함)
+ANALYSIS_CACHE_SIZE = int(os.environ.get("ANALYSIS_CACHE_SIZE", "128"))
+# 여러 작업 프로세스가 함께 쓰는 로컬 저장 폴더 (참조자료 행/검색 색인은 메모리 매핑 파일, 분석 결과 캐시는 SQLite)
+# 비어 있으면 프로세스마다 메모리에 따로 보관
+SHARED_STORE_FOLDER = os.environ.get("SHARED_STORE_FOLDER", "")
+SHARED_STORE_VERSION = 1         # 저장 형식이 바뀌면 올려서 이전 파일을 쓰지 않도록 함
+# 백그라운드 분석 작업 동시 실행 수와 끝난 작업 결과 보관 시간 (초)
+ANALYSIS_JOB_WORKERS = int(os.environ.get("ANALYSIS_JOB_WORKERS", "8"))
+ANALYSIS_JOB_RETENTION = float(os.environ.get("ANALYSIS_JOB_RETENTION", "3600"))
+ANALYSIS_JOB_POLL_SECONDS = 1.0  # 화면에서 작업 상태를 확인하는 간격
+# 작업 내용에 맞는 참조 파일만 자동 선택 (기본 사용)
+REFERENCE_AUTO_ROUTING = os.environ.get("REFERENCE_AUTO_ROUTING", "on").lower() in ("1", "true", "on")
+ROUTER_MIN_SCORE = 0.15          # 이보다 낮으면 분류 실패로 보고 선택한 파일 전체 사용
+ROUTER_RELATIVE_SCORE = 0.8      # 최고 점수 대비 이 비율 이상인 작업을 담은 파일을 함께 선택
+# 생성된 표에 빠진 C2~C4 참조 위험요인을 자동으로 추가 (기본 사용)
+VERIFY_AUTO_INSERT = os.environ.get("VERIFY_AUTO_INSERT", "on").lower() in ("1", "true", "on")
+VERIFY_MIN_SIMILARITY = 0.6      # 세부 위험요인 문자 2-gram 유사도가 이 이상이면 같은 위험요인으로 인정
+VERIFY_ITEM_MIN_SCORE = 0.5      # 표의 작업 내용을 참조자료 작업으로 대응시킬 최소 유사도 (색인 기준)
+# 서버 준비 상태(헬스/레디니스)와 모바일 간편 응답 API(/api)용 HTTP 포트 (기본 0: 사용 안 함)
+# 로드밸런서 확인이나 모바일 API가 필요하면 HEALTH_PORT=8502 처럼 비어 있는 포트를 지정하고,
+# 서버 프로세스마다 다른 포트를 사용 (외부 접근은 HEALTH_HOST, API 접근 제한은 COMPACT_API_TOKEN 참고)
+HEALTH_PORT = int(os.environ.get("HEALTH_PORT", "0"))
+# 헬스 서버 주소 (기본은 같은 서버에서만 접근, 로드밸런서/모바일 클라이언트가 접근하려면 0.0.0.0)
+HEALTH_HOST = os.environ.get("HEALTH_HOST", "127.0.0.1")
+# 모바일 간편 응답 API(/api) 토큰 (Authorization: Bearer <토큰>, 미설정 시 같은 서버에서 온 요청만 허용)
+COMPACT_API_TOKEN = os.environ.get("COMPACT_API_TOKEN", "")
+# 모바일 간편 응답 형식 버전 (형식이 바뀌면 올려서 클라이언트 캐시를 무효화)
+COMPACT_FORMAT_VERSION = 2
+# 서버 시작 시 이력에서 분석 결과 캐시에 미리 올릴 자주 요청된 작업 수
+WARMUP_HISTORY_TOP_N = int(os.environ.get("WARMUP_HISTORY_TOP_N", "20"))
+# 여러 작업이 섞인 입력을 작업별로 나눠 병렬 분석 (기본 사용)
+WORK_SPLIT_ENABLED = os.environ.get("WORK_SPLIT_ENABLED", "on").lower() in ("1", "true", "on")
+WORK_SPLIT_MAX_TASKS = int(os.environ.get("WORK_SPLIT_MAX_TASKS", "4"))
+WORK_SPLIT_MIN_SCORE = 0.35      # 나눈 조각이 참조자료 작업과 이 점수 이상 유사해야 별도 작업으로 인정
+# 작업 구분 표현 (구두점, 접속어, "~하고/~한 후" 등 연결 어미)
+WORK_TASK_SEPARATOR = re.compile(
+    r"[,;/\n·、]+"
+    r"|\s+(?:및|그리고|이어서|후에?|다음에?|뒤에?|이후에?)\s+"
+    r"|(?<=[가-힣])(?:하고|한\s*후에?|한\s*다음에?|한\s*뒤에?)\s+"
+)
+# 임베딩 색인 저장 폴더
+EMBEDDING_INDEX_FOLDER = os.environ.get("EMBEDDING_INDEX_FOLDER", "embedding_index")
+# 임베딩 모델 (sentence-transformers 모델명, 비우거나 미설치면 해시 n-gram TF-IDF)
+EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL_NAME", "")
+# 분석 시 임베딩 색인으로 유사 작업 후보 선정 여부 (기본: 문자 매칭)
+EMBEDDING_RETRIEVAL = os.environ.get("EMBEDDING_RETRIEVAL", "off").lower() in ("1", "true", "on")
+# 해시 n-gram 벡터 차원
+EMBEDDING_HASH_DIM = 1024
+# 근사 검색(IVF: k-means 군집 후 가까운 군집만 탐색) 설정
+EMBEDDING_IVF_PROBE_RATIO = 0.4      # 탐색할 군집 비율
+EMBEDDING_ANN_MIN_ITEMS = 2000       # 작업 수가 이보다 적으면 전체 탐색이 더 빠르고 정확
+# 조사 (긴 것부터 확인, 떼어낸 나머지가 2글자 이상일 때만 제거)
+KOREAN_PARTICLES = sorted([
+    "에서는", "에서도", "에서", "으로는", "으로", "에게", "까지", "부터", "처럼", "에는", "에도",
+    "하고", "이랑", "와", "과", "을", "를", "은", "는", "이", "가", "에", "의",
+], key=len, reverse=True)
+# 매칭에 쓰지 않는 일반어 (요청 문구, 접속어)
+KOREAN_STOPWORDS = {
+    "오늘", "내일", "금일", "작업", "위험성", "평가", "안내", "안내해줘", "알려줘", "해줘", "부탁해",
+    "있어", "있음", "있습니다", "예정", "관련", "진행", "및", "등", "위한", "대한",
+}
+# 동의어 (첫 단어가 대표어, 나머지는 대표어로 치환, 조사를 뗀 토큰 전체가 같을 때만)
+KOREAN_SYNONYM_GROUPS = [
+    ["맨홀", "지하", "멘홀"],
+    ["철탑", "타워", "송신탑"],
+    ["안테나", "ant"],
+    ["고소차", "고소작업차", "스카이차", "버킷차"],
+    ["전주", "전신주", "전봇대"],
+    ["설치", "재설치", "재시설", "신설", "구축"],
+    ["철거", "해체"],
+    ["광케이블", "광선로"],
+    ["국사", "통신국사", "전화국"],
+    ["축전지", "배터리"],
+    ["와이파이", "wifi"],
+    ["혹서기", "여름철", "폭염"],
+    ["혹한기", "겨울철", "한파"],
+]
+# 붙여 쓴 복합어에서 떼어 내는 뒷말 ("타워점검" → "타워" + "점검", 떼어낸 앞부분이 2글자 이상일 때만)
+KOREAN_COMPOUND_SUFFIXES = ["작업", "공사", "점검"]
+# 참조자료 기반 체크리스트 문구 (재해유형에 포함된 핵심어 → 작업 전 확인 사항)
+REFERENCE_CHECKLIST_TEMPLATES = [
+    (("떨어짐", "추락"), "안전대 착용·체결 위치와 작업발판/사다리 상태 확인"),
+    (("맞음", "낙하", "흩날림"), "작업 반경 하부 출입 통제 및 공구·자재 낙하 방지 조치 확인"),
+    (("감전",), "전원 차단·검전 실시 및 절연 보호구 착용 확인"),
+    (("산소결핍", "질식", "호흡기"), "산소·유해가스 농도 측정 및 환기 설비 가동 확인"),
+    (("끼임", "깔림"), "구동부 정지·방호장치와 중량물 고정 상태 확인"),
+    (("부딪힘", "충돌", "넘어짐", "미끄러짐", "걸림", "전도"), "작업 통로 정리 및 안전모·안전화 착용 확인"),
+    (("교통",), "작업 구역 교통 통제(라바콘·신호수) 및 차량 유도 확인"),
+    (("화재", "폭발", "발화", "화상"), "소화기 비치 및 화기 작업 허가 확인"),
+    (("절단", "베임", "배임", "찔림", "긁힘"), "절단 공구 상태 점검 및 보호장갑 착용 확인"),
+    (("이상온도", "한랭", "온열"), "고온·저온 작업 대비(휴식, 보온/음료) 및 접촉 부위 보호 확인"),
+    (("무리한 동작", "작업자세", "근골격"), "중량물 취급 인원·보조장비 및 작업 자세 확인"),
+    (("화학물질", "위험물질"), "물질안전보건자료(MSDS) 확인 및 보호구 착용 확인"),
+    (("해충",), "해충 기피제·보호복 착용 및 응급 연락체계 확인"),
+]
+
+# ZIP 묶음 섹션 파일명
+ZIP_SECTION_FILE_NAMES = {
+    "work_analysis": "1.작업분석",
+    "risk_table": "2.위험성평가표",
+    "additional_safety": "3.추가안전조치",
+    "safety_checklist": "4.작업전체크리트",
+}
+# ZIP 묶음 항목 병렬 생성 스레드 수 (1이면 순차 생성)
+ZIP_RENDER_WORKERS = int(os.environ.get("ZIP_RENDER_WORKERS", "4"))
+# PDF 한글 글꼴 경로 (미지정 시 시스템 글꼴 탐색)
+PDF_FONT_PATH = os.environ.get("PDF_FONT_PATH", "")
+# PDF 일괄 렌더링 작업 프로세스 수 (1이면 순차 렌더링, 기본값은 CPU 수 최대 4)
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDF 일괄 렌더링 시 한 파일에 묶을 분석 건수
+PDF_BATCH_CHUNK_SIZE = int(os.environ.get("PDF_BATCH_CHUNK_SIZE", "25"))
+# SKONS 양식 통합문서 하나에 담을 최대 분석 건수 (넘으면 여러 통합문서로 나눠 ZIP으로 묶음)
+TEMPLATE_WORKBOOK_MAX_SHEETS = int(os.environ.get("TEMPLATE_WORKBOOK_MAX_SHEETS", "50"))
+# 정규화된 참조자료 행 컬럼
+REFERENCE_ROW_COLUMNS = ["참조파일", "시트", "No", "구분", "대분류", "중분류", "작업 내용", "작업등급", "재해유형", "세부 위험요인", "위험등급-개선전", "위험성 감소대책", "위험등급-개선후"]
+# 참조 양식 헤더명(공백 제거) → 정규화된 컬럼명 ('위험등급'은 순서대로 개선전/개선후)
+REFERENCE_HEADER_MAP = {
+    "No": "No",
+    "구분": "구분",
+    "대분류": "대분류",
+    "중분류": "중분류",
+    "소분류(작업기준)": "작업 내용",
+    "작업등급": "작업등급",
+    "재해유형": "재해유형",
+    "세부위험요인": "세부 위험요인",
+    "위험성감소대책": "위험성 감소대책",
+}
+# 병합 셀로 비어 있으면 위 행의 값으로 채우는 작업 정보 컬럼
+REFERENCE_WORK_COLUMNS = ["구분", "대분류", "중분류", "작업 내용", "작업등급"]
+# CSV/TXT 참조 파일 인코딩 후보 (앞부분만 읽어 판별, BOM이 있으면 BOM 기준)
+REFERENCE_TEXT_ENCODINGS = ["utf-8", "cp949"]
+# 인코딩 판별에 읽는 파일 앞부분 크기 (바이트)
+REFERENCE_ENCODING_SNIFF_BYTES = int(os.environ.get("REFERENCE_ENCODING_SNIFF_BYTES", "65536"))
+# 대용량 CSV 참조 파일을 나눠 읽는 행 수 (한 번에 메모리에 올리는 원본 행 수)
+REFERENCE_CSV_CHUNK_ROWS = int(os.environ.get("REFERENCE_CSV_CHUNK_ROWS", "50000"))
+# CSV/TXT 참조 파일을 프롬프트용 텍스트로 만들 때 최대 글자 수 (넘는 부분은 행 단위 검색으로만 사용)
+REFERENCE_TEXT_MAX_CHARS = int(os.environ.get("REFERENCE_TEXT_MAX_CHARS", "2000000"))
 
 # OpenAI API 키 읽기 함수 (기존 코드 재사용)
 def load_openai_api_key() -> str:
@@ -33,13 +300,58 @@ def load_openai_api_key() -> str:
         raise ValueError("OPENAI_API_KEY 환경변수가 설정되어 있지 않습니다.")
     return api_key
 
-# OpenAI 클라이언트 초기화 (기존 코드 재사용)
-try:
-    api_key = load_openai_api_key()
-    client = OpenAI(api_key=api_key)
-except Exception as e:
-    st.error(str(e))
-    client = None
+@st.cache_resource(show_spinner=False)
+def create_openai_client(api_key: str, base_url: str = None) -> openai.OpenAI:
+    """
+    OpenAI(호환) 클라이언트 생성 (프로세스 전체에서 재사용하여 연결 유지)
+    """
+    # 재시도는 모델 요청 스케줄러에서 일괄 처리
+    return openai.OpenAI(api_key=api_key, base_url=base_url or None, max_retries=0)
+
+def sniff_text_encoding(file_path: str) -> str:
+    """
+    CSV/TXT 파일 앞부분만 읽어 인코딩 판별 (BOM 우선, 없으면 후보 인코딩 중 오류 없이 읽히는 것)
+    앞부분 끝에서 잘린 멀티바이트 문자는 오류로 보지 않음
+    """
+    with open(file_path, 'rb') as f:
+        prefix = f.read(REFERENCE_ENCODING_SNIFF_BYTES)
+    if prefix.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for encoding in REFERENCE_TEXT_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return REFERENCE_TEXT_ENCODINGS[0]
+
+def text_encoding_candidates(file_path: str) -> list:
+    """
+    파일을 읽어 볼 인코딩 순서 (앞부분으로 판별한 인코딩부터, BOM이 있으면 BOM 기준 하나만)
+    """
+    sniffed = sniff_text_encoding(file_path)
+    if sniffed not in REFERENCE_TEXT_ENCODINGS:
+        return [sniffed]
+    return REFERENCE_TEXT_ENCODINGS[REFERENCE_TEXT_ENCODINGS.index(sniffed):]
+
+def read_with_encoding_fallback(file_path: str, read):
+    """
+    read(encoding)을 판별한 인코딩부터 차례로 실행
+    앞부분에는 없던 디코딩 오류가 뒷부분에서 나면(예: 앞부분이 영문뿐인 cp949 파일) 다음 후보 인코딩으로 다시 읽음
+    """
+    candidates = text_encoding_candidates(file_path)
+    for encoding in candidates[:-1]:
+        try:
+            return read(encoding)
+        except UnicodeDecodeError:
+            continue
+    return read(candidates[-1])
+
+def read_csv_chunks(file_path: str, encoding: str, **options):
+    """
+    CSV 파일을 REFERENCE_CSV_CHUNK_ROWS행씩 읽는 반복자 (디코딩 오류는 그대로 발생)
+    """
+    return pd.read_csv(file_path, encoding=encoding, chunksize=REFERENCE_CSV_CHUNK_ROWS, **options)
 
 def load_file_content(file_path: str) -> str:
     """
@@ -56,32 +368,21 @@ def load_file_content(file_path: str) -> str:
             return df.to_string(index=False)
                 
         elif file_extension == '.csv':
-            # CSV 파일 처리
-            try:
-                df = pd.read_csv(file_path, encoding='utf-8')
-                if df.empty:
-                    return None
-                return df.to_string(index=False)
-            except UnicodeDecodeError:
-                df = pd.read_csv(file_path, encoding='cp949')
-                if df.empty:
-                    return None
-                return df.to_string(index=False)
+            # CSV 파일 처리 (참조 행 변환과 같은 한 번의 파싱 결과 사용)
+            return parse_reference_csv(file_path)[1]
                 
         elif file_extension == '.txt':
             # 텍스트 파일 처리
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if not content.strip():
-                        return None
-                    return content
-            except UnicodeDecodeError:
-                with open(file_path, 'r', encoding='cp949') as f:
-                    content = f.read()
-                    if not content.strip():
-                        return None
-                    return content
+            def read_text(encoding):
+                with open(file_path, 'r', encoding=encoding) as f:
+                    return f.read(REFERENCE_TEXT_MAX_CHARS + 1)
+
+            content = read_with_encoding_fallback(file_path, read_text)
+            if not content.strip():
+                return None
+            if len(content) > REFERENCE_TEXT_MAX_CHARS:
+                content = content[:REFERENCE_TEXT_MAX_CHARS] + f"\n... (이하 생략: {REFERENCE_TEXT_MAX_CHARS:,}자 초과)"
+            return content
         else:
             return None
             
@@ -89,6 +390,16 @@ def load_file_content(file_path: str) -> str:
         st.error(f"파일 '{file_path}' 읽기 중 오류: {str(e)}")
         return None
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def _load_file_content_cached(file_path: str, modified: float) -> str:
+    return load_file_content(file_path)
+
+def load_reference_file_content(file_path: str) -> str:
+    """
+    참조 파일 내용 (파일별 수정 시각 기준으로 캐시하여 세션마다 다시 읽지 않음)
+    """
+    return _load_file_content_cached(file_path, os.path.getmtime(file_path))
+
 def load_default_reference_file() -> dict:
     """
     기본 지정된 참조 파일을 자동으로 로드하는 함수
@@ -104,10 +415,8 @@ def load_default_reference_file() -> dict:
     
     if os.path.exists(file_path):
         try:
-            content = load_file_content(file_path)
-            if content:
+            if load_reference_file_content(file_path):
                 reference_file[DEFAULT_REFERENCE_FILE] = {
-                    'content': content,
                     'path': file_path,
                     'size': os.path.getsize(file_path),
                     'modified': datetime.fromtimestamp(os.path.getmtime(file_path)).strftime("%Y-%m-%d %H:%M:%S")
@@ -156,6 +465,8 @@ def load_default_reference_file() -> dict:
 def load_reference_files_from_folder() -> dict:
     """
     지정된 폴더에서 참조 파일들을 자동으로 로드하는 함수 (기본 파일 우선)
+    목록에는 파일 정보만 두고 내용은 reference_file_content로 읽음 (수정 시각 기준 캐시)
+    참조 파일 자동 선택을 사용하면 기본 파일 외의 파일은 분석에 선택될 때 처음 읽음
     """
     reference_files = {}
     
@@ -163,7 +474,8 @@ def load_reference_files_from_folder() -> dict:
     default_file = load_default_reference_file()
     if default_file:
         reference_files.update(default_file)
-        return reference_files  # 기본 파일만 사용
+        if not REFERENCE_AUTO_ROUTING:
+            return reference_files  # 기본 파일만 사용
     
     # 기본 파일이 없으면 폴더의 다른 파일들을 스캔
     if not os.path.exists(REFERENCE_FILES_FOLDER):
@@ -179,10 +491,10 @@ def load_reference_files_from_folder() -> dict:
         for file_path in files:
             try:
                 file_name = os.path.basename(file_path)
-                content = load_file_content(file_path)
-                if content:
+                if file_name in reference_files:
+                    continue
+                if default_file or load_reference_file_content(file_path):
                     reference_files[file_name] = {
-                        'content': content,
                         'path': file_path,
                         'size': os.path.getsize(file_path),
                         'modified': datetime.fromtimestamp(os.path.getmtime(file_path)).strftime("%Y-%m-%d %H:%M:%S")
@@ -193,6 +505,514 @@ def load_reference_files_from_folder() -> dict:
     
     return reference_files
 
+def normalize_grade_label(value: str) -> str:
+    """
+    'S등급', 'C3(높음)' 같은 표기에서 등급(C1~C4, S)만 추출 (해석할 수 없으면 None)
+    """
+    match = re.search(r"S|C[1-4]", str(value).upper())
+    return match.group(0) if match else None
+
+def normalize_grade(values: pd.Series) -> pd.Series:
+    """
+    등급 표기를 등급 범주형(C1~C4, S)으로 변환 (고유값 단위로 한 번만 해석)
+    """
+    if values.dtype == RISK_GRADE_DTYPE:
+        return values
+    values = values.astype(str)
+    mapping = {value: normalize_grade_label(value) for value in pd.unique(values)}
+    return values.map(mapping).astype(RISK_GRADE_DTYPE)
+
+def to_compact_risk_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    위험성 평가표/참조자료 행을 메모리 효율적인 형태로 변환
+    - 등급 컬럼: 순서가 있는 범주형 (C1 < C2 < C3 < C4 < S)
+    - 번호 컬럼: 정수형
+    - 반복되는 문자열 컬럼: 범주형 (같은 작업 내용/위험요인 문자열을 한 번만 저장)
+    """
+    compact = pd.DataFrame(index=df.index)
+    for column in df.columns:
+        if column in GRADE_COLUMNS:
+            compact[column] = normalize_grade(df[column])
+        elif column in NUMBER_COLUMNS:
+            compact[column] = pd.to_numeric(df[column], errors="coerce").astype("Int32")
+        elif isinstance(df[column].dtype, pd.CategoricalDtype):
+            compact[column] = df[column].cat.remove_unused_categories()
+        else:
+            compact[column] = df[column].astype("category")
+    return compact
+
+def reference_header_mapping(header_values) -> dict:
+    """
+    참조 양식 헤더 행의 컬럼 위치 → 정규화된 컬럼명 매핑
+    """
+    mapping = {}
+    grade_count = 0
+    for pos, header in enumerate(header_values):
+        header = re.sub(r"\s+", "", str(header))
+        if header == "위험등급":
+            mapping[pos] = "위험등급-개선전" if grade_count == 0 else "위험등급-개선후"
+            grade_count += 1
+        elif header in REFERENCE_HEADER_MAP and REFERENCE_HEADER_MAP[header] not in mapping.values():
+            mapping[pos] = REFERENCE_HEADER_MAP[header]
+    return mapping
+
+def find_reference_header(raw_df: pd.DataFrame):
+    """
+    헤더 없이 읽은 참조 양식 시트에서 헤더 행 위치 (앞 10행 안에 없으면 None)
+    """
+    for idx in range(min(len(raw_df), 10)):
+        if any("세부 위험요인" in str(value) for value in raw_df.iloc[idx].values):
+            return idx
+    return None
+
+def _normalize_reference_body(raw_body: pd.DataFrame, mapping: dict, previous: pd.Series = None) -> tuple:
+    """
+    헤더 아래 원본 행을 정규화된 행으로 변환
+    previous: 앞 묶음의 마지막 작업 정보 (나눠 읽을 때 묶음 첫 행의 병합 셀을 채우는 데 사용)
+    반환: (정규화된 행, 다음 묶음에 넘길 마지막 작업 정보)
+    """
+    body = raw_body.iloc[:, list(mapping.keys())].copy()
+    body.columns = list(mapping.values())
+    body = body.reindex(columns=REFERENCE_ROW_COLUMNS[2:])
+
+    # 병합 셀로 비어 있는 작업 정보는 위 행의 값으로 채움
+    work = body[REFERENCE_WORK_COLUMNS].ffill()
+    if previous is not None:
+        work = work.fillna(previous)
+    body[REFERENCE_WORK_COLUMNS] = work
+    last_work = work.iloc[-1] if len(work) else previous
+    body = body.fillna("").astype(str)
+    for column in body.columns:
+        body[column] = body[column].str.strip()
+    body = body[body["세부 위험요인"] != ""]
+    return to_compact_risk_frame(body.reset_index(drop=True)), last_work
+
+def _parse_reference_sheet(raw_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    헤더 없이 읽은 참조 양식 시트에서 헤더 행을 찾아 정규화된 행으로 변환
+    """
+    header_idx = find_reference_header(raw_df)
+    if header_idx is None:
+        return pd.DataFrame(columns=REFERENCE_ROW_COLUMNS)
+    mapping = reference_header_mapping(raw_df.iloc[header_idx].values)
+    return _normalize_reference_body(raw_df.iloc[header_idx + 1:], mapping)[0]
+
+def concat_compact_frames(frames: list) -> pd.DataFrame:
+    """
+    to_compact_risk_frame 결과들을 범주형을 유지한 채 이어 붙임
+    (범주가 다른 범주형을 pd.concat하면 문자열로 풀리므로 범주를 합쳐서 연결)
+    """
+    if not frames:
+        return pd.DataFrame(columns=REFERENCE_ROW_COLUMNS)
+    # 빈 묶음/시트는 범주형이 아니므로 제외
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    combined = {}
+    for column in frames[0].columns:
+        parts = [frame[column] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) and not part.cat.ordered for part in parts):
+            combined[column] = pd.Series(union_categoricals([part.values for part in parts]))
+        else:
+            combined[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(combined)
+
+def _constant_category(value: str, length: int) -> pd.Categorical:
+    # 모든 행이 같은 값인 범주형 컬럼 (참조파일/시트명)
+    return pd.Categorical.from_codes(np.zeros(length, dtype=np.int8), categories=[value])
+
+def _merge_leading_chunks(chunks, min_rows: int):
+    """
+    앞쪽 묶음을 min_rows행 이상이 될 때까지 합쳐서 반환 (헤더 탐색 범위가 첫 묶음 안에 들도록)
+    """
+    head = []
+    for chunk in chunks:
+        if head is None:
+            yield chunk
+            continue
+        head.append(chunk)
+        if sum(len(part) for part in head) >= min_rows:
+            yield pd.concat(head)
+            head = None
+    if head:
+        yield pd.concat(head)
+
+def _parse_reference_csv_chunks(file_path: str, encoding: str) -> tuple:
+    frames = []
+    text_parts = []
+    text_length = 0
+    text_done = False
+    columns = None
+    mapping = None
+    previous = None
+    with read_csv_chunks(file_path, encoding, header=None, dtype=str) as reader:
+        for chunk in _merge_leading_chunks(reader, 10):
+            # 프롬프트용 표 텍스트 (첫 줄을 머리글로, 한도까지의 완전한 행만)
+            if not text_done:
+                table = chunk.fillna("")
+                if columns is None:
+                    columns = list(table.iloc[0]) if len(table) else list(table.columns)
+                    table = table.iloc[1:]
+                table.columns = columns
+                text = table.to_string(index=False, header=not text_parts) if len(table) else ""
+                if text_length + len(text) > REFERENCE_TEXT_MAX_CHARS:
+                    text_parts.append(text[:max(REFERENCE_TEXT_MAX_CHARS - text_length, 0)].rpartition("\n")[0])
+                    text_parts.append(f"... (이하 생략: {REFERENCE_TEXT_MAX_CHARS:,}자 초과, 전체 행은 참조자료 검색에 사용)")
+                    text_done = True
+                elif text:
+                    text_parts.append(text)
+                    text_length += len(text) + 1
+
+            # 정규화된 참조 행 (헤더 행은 첫 묶음의 앞 10행에서 찾음, 참조 양식이 아니면 텍스트만 만듦)
+            if mapping is None:
+                header_idx = find_reference_header(chunk)
+                mapping = reference_header_mapping(chunk.iloc[header_idx].values) if header_idx is not None else {}
+                chunk = chunk.iloc[header_idx + 1:] if header_idx is not None else chunk
+            if mapping:
+                rows, previous = _normalize_reference_body(chunk, mapping, previous)
+                if len(rows):
+                    frames.append(rows)
+            elif text_done:
+                break
+    return concat_compact_frames(frames), "\n".join(text_parts) if text_parts else None
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _parse_reference_csv_cached(file_path: str, modified: float) -> tuple:
+    return read_with_encoding_fallback(file_path, lambda encoding: _parse_reference_csv_chunks(file_path, encoding))
+
+def parse_reference_csv(file_path: str) -> tuple:
+    """
+    CSV 참조 파일을 묶음 단위로 한 번만 읽어 (정규화된 행, 프롬프트용 표 텍스트) 반환
+    - 행: 병합 셀 채움은 묶음 경계를 넘어 이어짐 (원본은 한 묶음만 메모리에 유지)
+    - 텍스트: REFERENCE_TEXT_MAX_CHARS까지만 만듦 (데이터 행이 없으면 None)
+    파일 수정 시각 기준 캐시로 load_file_content와 parse_reference_rows가 같은 파싱 결과를 사용 (읽기 전용)
+    """
+    return _parse_reference_csv_cached(file_path, os.path.getmtime(file_path))
+
+def parse_reference_rows(file_path: str) -> pd.DataFrame:
+    """
+    참조 파일을 정규화된 행 단위 DataFrame으로 읽기
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension == '.xlsx':
+        sheets = {
+            sheet_name: _parse_reference_sheet(raw_df)
+            for sheet_name, raw_df in pd.read_excel(file_path, sheet_name=None, header=None).items()
+        }
+    elif file_extension == '.csv':
+        # 대용량 CSV도 묶음 단위로 한 번만 파싱하여 범주형 행으로 모음
+        sheets = {"csv": parse_reference_csv(file_path)[0]}
+    else:
+        # 텍스트 파일은 행 구조가 없으므로 제외
+        return pd.DataFrame(columns=REFERENCE_ROW_COLUMNS)
+
+    frames = []
+    for sheet_name, rows in sheets.items():
+        rows = rows.reindex(columns=REFERENCE_ROW_COLUMNS[2:])
+        rows.insert(0, "시트", _constant_category(str(sheet_name), len(rows)))
+        rows.insert(0, "참조파일", _constant_category(os.path.basename(file_path), len(rows)))
+        frames.append(rows)
+    if not frames:
+        return pd.DataFrame(columns=REFERENCE_ROW_COLUMNS)
+    return to_compact_risk_frame(concat_compact_frames(frames))
+
+@st.cache_data(show_spinner=False)
+def _load_reference_rows_cached(file_path: str, modified: float) -> pd.DataFrame:
+    """
+    참조 파일 행 (파일 수정 시각 기준 캐시)
+    """
+    return parse_reference_rows(file_path)
+
+def shared_store_path(kind: str, *key_parts) -> str:
+    """
+    공유 저장 폴더 안의 파일/폴더 경로 (kind-키 해시, 키가 바뀌면 새 경로)
+    """
+    key_source = json.dumps([SHARED_STORE_VERSION, *key_parts], ensure_ascii=False, default=str)
+    os.makedirs(SHARED_STORE_FOLDER, exist_ok=True)
+    return os.path.join(SHARED_STORE_FOLDER, f"{kind}-{hashlib.sha1(key_source.encode('utf-8')).hexdigest()[:16]}")
+
+def write_arrow_frame(df: pd.DataFrame, path: str) -> None:
+    """
+    DataFrame을 Arrow IPC 파일로 저장 (임시 파일에 쓴 뒤 교체하여 읽는 프로세스가 쓰다 만 파일을 보지 않도록 함)
+    """
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temp_path, path)
+
+def read_arrow_frame(path: str) -> pd.DataFrame:
+    """
+    Arrow IPC 파일을 메모리 매핑으로 읽기 (문자열 컬럼은 복사 없이 매핑된 버퍼를 그대로 사용)
+    """
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _load_shared_reference_rows(file_path: str, modified: float) -> pd.DataFrame:
+    """
+    공유 저장 폴더의 참조 파일 행 (처음 요청한 프로세스가 한 번 변환해 저장하고, 다른 프로세스는 매핑만 함)
+    """
+    path = shared_store_path("rows", os.path.abspath(file_path), modified) + ".arrow"
+    if not os.path.exists(path):
+        write_arrow_frame(parse_reference_rows(file_path), path)
+    return read_arrow_frame(path)
+
+def load_reference_rows(file_path: str) -> pd.DataFrame:
+    """
+    참조 파일의 위험요인을 정규화된 행 단위 DataFrame으로 반환
+    """
+    try:
+        if SHARED_STORE_FOLDER:
+            return _load_shared_reference_rows(file_path, os.path.getmtime(file_path))
+        return _load_reference_rows_cached(file_path, os.path.getmtime(file_path))
+    except Exception as e:
+        st.warning(f"참조 파일 '{file_path}' 행 변환 중 오류: {str(e)}")
+        return pd.DataFrame(columns=REFERENCE_ROW_COLUMNS)
+
+def load_all_reference_rows() -> pd.DataFrame:
+    """
+    참조 폴더의 모든 파일을 정규화된 행으로 읽어 중복 위험요인을 제거하여 반환
+    """
+    frames = []
+    for extension in ['*.xlsx', '*.csv']:
+        for file_path in sorted(glob.glob(os.path.join(REFERENCE_FILES_FOLDER, extension))):
+            frames.append(load_reference_rows(file_path))
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=REFERENCE_ROW_COLUMNS)
+    all_rows = pd.concat(frames, ignore_index=True)
+    return to_compact_risk_frame(all_rows.drop_duplicates(subset=REFERENCE_ROW_COLUMNS[3:]).reset_index(drop=True))
+
+# 행 버전 비교 대상 컬럼 (참조파일/시트는 식별, No는 행 삽입 시 밀리므로 제외)
+REFERENCE_VERSION_COLUMNS = REFERENCE_ROW_COLUMNS[3:]
+
+def _reference_row_text(rows: pd.DataFrame) -> pd.DataFrame:
+    # 버전 비교용 문자열 값 (빈 등급은 빈 문자열)
+    return rows.reindex(columns=REFERENCE_VERSION_COLUMNS).astype(object).fillna("").astype(str)
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _reference_row_versions_cached(file_path: str, modified: float) -> pd.DataFrame:
+    rows = load_reference_rows(file_path)
+    identity = (
+        rows["시트"].astype(str) + "|" + _normalize_match_key(rows["작업 내용"]) + "|"
+        + _normalize_match_key(rows["재해유형"]) + "|" + _normalize_match_key(rows["세부 위험요인"])
+    )
+    # 같은 작업에 같은 위험요인이 두 번 나오면 나온 순서로 구분
+    identity = identity + "#" + identity.groupby(identity).cumcount().astype(str)
+    content = _reference_row_text(rows).agg("|".join, axis=1)
+    versions = pd.DataFrame({
+        "row_id": [hashlib.sha1(value.encode("utf-8")).hexdigest()[:12] for value in identity],
+        "row_hash": [hashlib.sha1(value.encode("utf-8")).hexdigest()[:12] for value in content],
+        "작업키": _normalize_match_key(rows["작업 내용"]).values,
+    })
+    version_source = "\n".join(sorted(versions["row_id"] + ":" + versions["row_hash"]))
+    versions.attrs["version"] = hashlib.sha1(version_source.encode("utf-8")).hexdigest()[:12]
+    return versions
+
+def reference_row_versions(file_path: str) -> pd.DataFrame:
+    """
+    참조 파일 행별 버전 (load_reference_rows와 같은 순서, 파일 수정 시각 기준 캐시, 읽기 전용)
+    - row_id: 시트/작업 내용/재해유형/세부 위험요인으로 정한 행 번호 (다른 행을 고쳐도 바뀌지 않음)
+    - row_hash: 행 내용(No 제외) 해시, 작업키: 작업 내용 비교 키
+    attrs["version"]: 파일 전체 버전 ID (행 번호/해시 목록 기준)
+    """
+    return _reference_row_versions_cached(file_path, os.path.getmtime(file_path))
+
+def reference_version_folder(file_name: str) -> str:
+    return os.path.join(REFERENCE_VERSION_FOLDER, os.path.splitext(file_name)[0])
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _record_reference_version_cached(file_path: str, modified: float) -> str:
+    versions = reference_row_versions(file_path)
+    version = versions.attrs["version"]
+    folder = reference_version_folder(os.path.basename(file_path))
+    snapshot_path = os.path.join(folder, f"{version}.csv")
+    if os.path.exists(snapshot_path):
+        return version
+    with _history_lock:
+        if not os.path.exists(snapshot_path):
+            os.makedirs(folder, exist_ok=True)
+            snapshot = _reference_row_text(load_reference_rows(file_path))
+            snapshot.insert(0, "row_hash", versions["row_hash"].values)
+            snapshot.insert(0, "row_id", versions["row_id"].values)
+            temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+            snapshot.to_csv(temp_path, index=False, encoding="utf-8")
+            os.replace(temp_path, snapshot_path)
+            with open(os.path.join(folder, "versions.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "version": version,
+                    "modified": datetime.fromtimestamp(os.path.getmtime(file_path)).strftime("%Y-%m-%d %H:%M:%S"),
+                    "recorded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "rows": len(snapshot),
+                }, ensure_ascii=False) + "\n")
+    return version
+
+def record_reference_version(file_path: str) -> str:
+    """
+    참조 파일의 현재 버전을 스냅샷(CSV)과 버전 목록(versions.jsonl)에 기록하고 버전 ID 반환
+    (파일 수정 시각별로 한 번만 확인, 같은 버전의 스냅샷이 이미 있으면 기록 생략)
+    """
+    return _record_reference_version_cached(file_path, os.path.getmtime(file_path))
+
+def record_reference_versions(reference_files: dict) -> None:
+    """
+    참조 파일을 불러오거나 새로고침할 때 행 구조가 있는 파일(xlsx/csv)의 버전 기록
+    """
+    for file_name, file_info in reference_files.items():
+        if os.path.splitext(file_name)[1].lower() not in ('.xlsx', '.csv'):
+            continue
+        try:
+            record_reference_version(file_info['path'])
+        except Exception as e:
+            st.warning(f"참조 파일 '{file_name}' 버전 기록 중 오류: {str(e)}")
+
+def list_reference_versions(file_name: str) -> list:
+    """
+    기록된 참조 파일 버전 목록 (기록된 순서)
+    """
+    index_path = os.path.join(reference_version_folder(file_name), "versions.jsonl")
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def load_reference_version(file_name: str, version: str) -> pd.DataFrame:
+    """
+    기록된 버전의 참조 행 스냅샷 (row_id, row_hash + 비교 컬럼, 모두 문자열)
+    """
+    return pd.read_csv(
+        os.path.join(reference_version_folder(file_name), f"{version}.csv"),
+        dtype=str, keep_default_na=False, encoding="utf-8"
+    )
+
+def diff_reference_versions(old_rows: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    두 버전의 참조 행 비교 (row_id 기준, 내용이 같은 행은 제외)
+    변경 유형: 추가/삭제/변경, 변경 내용은 바뀐 컬럼별 '이전 → 이후'
+    """
+    columns = ["변경", "row_id", "작업 내용", "재해유형", "세부 위험요인", "변경 내용"]
+    merged = old_rows.set_index("row_id").join(new_rows.set_index("row_id"), how="outer", lsuffix="_old", rsuffix="_new")
+    records = []
+    for row_id, row in merged.iterrows():
+        old_hash, new_hash = row["row_hash_old"], row["row_hash_new"]
+        if old_hash == new_hash:
+            continue
+        if pd.isna(old_hash):
+            change, suffix, details = "추가", "_new", []
+        elif pd.isna(new_hash):
+            change, suffix, details = "삭제", "_old", []
+        else:
+            change, suffix = "변경", "_new"
+            details = [
+                f"{column}: {row[column + '_old']} → {row[column + '_new']}"
+                for column in REFERENCE_VERSION_COLUMNS
+                if row[column + "_old"] != row[column + "_new"]
+            ]
+        records.append({
+            "변경": change,
+            "row_id": row_id,
+            "작업 내용": row["작업 내용" + suffix],
+            "재해유형": row["재해유형" + suffix],
+            "세부 위험요인": row["세부 위험요인" + suffix],
+            "변경 내용": "; ".join(details),
+        })
+    return pd.DataFrame(records, columns=columns)
+
+def reference_dependencies(result: dict, reference_files: dict) -> dict:
+    """
+    분석 결과가 의존하는 참조 행 (참조 파일 행 버전 기준)
+    의존 작업 = 유사 작업 후보 + 평가표를 대응시킨 참조 작업, 의존 행 = 사용한 파일에서 그 작업의 모든 행
+    반환: {"versions": {파일: 버전 ID}, "work_items": [작업키], "rows": {파일: {row_id: row_hash}}}
+    """
+    work_keys = set(_normalize_match_key(pd.Series(
+        list(result.get('candidate_items') or []) + list((result.get('verification') or {}).get('work_items') or []),
+        dtype=object
+    )))
+    dependencies = {"versions": {}, "work_items": sorted(work_keys), "rows": {}}
+    for ref_name in result.get('used_references') or []:
+        file_info = reference_files.get(ref_name)
+        if not file_info or not os.path.exists(file_info['path']):
+            continue
+        versions = reference_row_versions(file_info['path'])
+        used = versions[versions["작업키"].isin(work_keys)]
+        dependencies["versions"][ref_name] = versions.attrs["version"]
+        dependencies["rows"][ref_name] = dict(zip(used["row_id"], used["row_hash"]))
+    return dependencies
+
+def merge_reference_dependencies(dependency_list: list) -> dict:
+    """
+    작업별 분석 결과의 의존 참조 행을 합침
+    """
+    merged = {"versions": {}, "work_items": set(), "rows": {}}
+    for dependencies in dependency_list:
+        merged["versions"].update(dependencies.get("versions", {}))
+        merged["work_items"].update(dependencies.get("work_items", []))
+        for ref_name, rows in dependencies.get("rows", {}).items():
+            merged["rows"].setdefault(ref_name, {}).update(rows)
+    merged["work_items"] = sorted(merged["work_items"])
+    return merged
+
+def changed_reference_rows(dependencies: dict, reference_files: dict) -> list:
+    """
+    의존 참조 행 중 현재 파일과 달라진 행 번호 (내용 변경/삭제된 행, 의존 작업에 새로 추가된 행)
+    파일이 없어졌으면 그 파일의 의존 행 전체
+    """
+    work_keys = set(dependencies.get("work_items", []))
+    changed = []
+    for ref_name, rows in dependencies.get("rows", {}).items():
+        file_info = reference_files.get(ref_name)
+        if not file_info or not os.path.exists(file_info['path']):
+            changed.extend(rows)
+            continue
+        versions = reference_row_versions(file_info['path'])
+        # 파일 버전이 같으면 행 비교 생략
+        if dependencies.get("versions", {}).get(ref_name) == versions.attrs["version"]:
+            continue
+        current = dict(zip(versions["row_id"], versions["row_hash"]))
+        changed.extend(row_id for row_id, row_hash in rows.items() if current.get(row_id) != row_hash)
+        added = versions[versions["작업키"].isin(work_keys) & ~versions["row_id"].isin(list(rows))]
+        changed.extend(added["row_id"])
+    return changed
+
+def reference_dependencies_valid(result: dict, reference_files: dict) -> bool:
+    """
+    분석 결과가 의존하는 참조 행이 그대로인지 (다른 행만 바뀌었으면 유효)
+    행 단위 기록이 없는 이전 결과는 사용한 참조 파일이 결과 생성 뒤 수정되지 않았을 때만 유효
+    """
+    dependencies = result.get('reference_dependencies')
+    if not dependencies:
+        return all(
+            name in reference_files and reference_files[name]['modified'] <= result.get('timestamp', '')
+            for name in result.get('used_references') or []
+        )
+    return not changed_reference_rows(dependencies, reference_files)
+
+def assessments_affected_by_changes(file_name: str, changes: pd.DataFrame, new_version: str = "") -> pd.DataFrame:
+    """
+    참조 행 변경(diff_reference_versions 결과)의 영향을 받는 저장된 분석 결과
+    (변경된 행에 의존하거나, 의존 작업에 행이 추가/삭제/변경된 결과)
+    new_version으로 이미 분석한 결과는 제외
+    """
+    changed_ids = set(changes["row_id"])
+    changed_work_keys = set(_normalize_match_key(changes["작업 내용"]))
+    records = []
+    for result in iter_history_assessments():
+        dependencies = result.get('reference_dependencies') or {}
+        rows = (dependencies.get("rows") or {}).get(file_name)
+        if rows is None or (new_version and dependencies.get("versions", {}).get(file_name) == new_version):
+            continue
+        hits = changed_ids & set(rows)
+        if hits or changed_work_keys & set(dependencies.get("work_items", [])):
+            records.append({
+                "assessment_id": result.get('assessment_id'),
+                "생성 시간": result.get('timestamp'),
+                "작업 내용": result.get('work_description'),
+                "영향 행 수": len(hits),
+                "참조 버전": dependencies.get("versions", {}).get(file_name),
+            })
+    return pd.DataFrame(records, columns=["assessment_id", "생성 시간", "작업 내용", "영향 행 수", "참조 버전"])
+
 def parse_analysis_sections(analysis_text: str) -> dict:
     """
     GPT 분석 결과를 섹션으로 구분하여 파싱하는 함수 (기존 코드 수정)
@@ -303,9 +1123,9 @@ def create_section_files(sections: dict, timestamp: str, work_description: str)
 
     return files
 
-def parse_risk_table_from_markdown(markdown_text: str) -> pd.DataFrame:
+def extract_risk_table_rows(markdown_text: str) -> list:
     """
-    마크다운 텍스트에서 위험성 평가 표를 추출하여 DataFrame으로 변환
+    마크다운 텍스트에서 위험성 평가 표의 데이터 행(최대 8개 컬럼)을 추출
     """
     lines = markdown_text.split('\n')
     risk_data = []
@@ -337,9 +1157,17 @@ def parse_risk_table_from_markdown(markdown_text: str) -> pd.DataFrame:
                     risk_data.append(parts[:8])  # 8개 컬럼까지만
                 except ValueError:
                     continue
-    
+
+    return risk_data
+
+def parse_risk_table_from_markdown(markdown_text: str) -> pd.DataFrame:
+    """
+    마크다운 텍스트에서 위험성 평가 표를 추출하여 DataFrame으로 변환
+    """
+    risk_data = extract_risk_table_rows(markdown_text)
+
     if risk_data:
-        columns = ["순번", "작업 내용", "작업등급", "재해유형", "세부 위험요인", "위험등급-개선전", "위험성 감소대책", "위험등급-개선후"]
+        columns = list(RISK_TABLE_COLUMNS)
         # 데이터 길이에 맞춰 컬럼 조정
         max_cols = max(len(row) for row in risk_data) if risk_data else 8
         if max_cols < 8:
@@ -354,142 +1182,3460 @@ def parse_risk_table_from_markdown(markdown_text: str) -> pd.DataFrame:
                 row = row[:len(columns)]
             normalized_data.append(row)
         
-        return pd.DataFrame(normalized_data, columns=columns)
+        return to_compact_risk_frame(pd.DataFrame(normalized_data, columns=columns))
     else:
         # 기본 빈 DataFrame 반환
-        columns = ["순번", "작업 내용", "작업등급", "재해유형", "세부 위험요인", "위험등급-개선전", "위험성 감소대책", "위험등급-개선후"]
-        return pd.DataFrame(columns=columns)
+        return to_compact_risk_frame(pd.DataFrame(columns=RISK_TABLE_COLUMNS))
 
-def analyze_work_risk(work_description: str, selected_references: list) -> dict:
+class ModelRequestRejected(Exception):
     """
-    작업 내용을 기반으로 위험성 분석을 수행하는 함수
+    대기열이 가득 찼거나 대기 시간이 초과되어 모델 요청을 받지 않을 때 발생
     """
-    if client is None:
-        raise Exception("OpenAI 클라이언트가 초기화되지 않았습니다.")
-    
-    # 선택된 참조 파일들의 내용 결합
-    combined_reference_content = ""
-    for ref_name in selected_references:
-        if ref_name in st.session_state['reference_files']:
-            combined_reference_content += f"\n\n=== {ref_name} ===\n"
-            combined_reference_content += st.session_state['reference_files'][ref_name]['content']
-    
-    # 위험성 평가를 위한 프롬프트
-    prompt = f"""
-너는 안전보건 담당자야. 현장의 작업자에게 작업전 위험성 평가를 가이드하는 업무를 담당하고 있어.
-첨부의 참조자료는 각 작업에서 발생할 수 있는 유해, 위험요인들과 그에 대한 개선방안이 정리되어 있어.
-내가 특정 작업에 대해서 말하면, 위험요인은 참조자료를 참고해서 최대한 자세히 답변해줘.
-1. 작압자가 말한 작업 내용을 분석하고 이 내용을 참조자료와 비교해서 가장 유사한 작업 내용을 찾아.
-2. 참조자료에 있는 위험요인들을 모두 빠짐없이 나열해줘.
-3. 각 위험요인에 대해 참조자료의 '작업 내용', '재해유형', '세부 위험요인', '위험등급', '감소대책' 정보를 그대로 반영해줘.
-4. 위험등급은 C1(낮음), C2(보통), C3(높음), C4(매우높음)으로 표시해줘.
-5. 작업등급은 S(특별관리), C4, C3, C2, C1로 구분해줘.
 
-**작업 내용**: {work_description}
+def estimate_token_count(text: str) -> int:
+    """
+    문자 수 기반 토큰 수 추정 (한글은 약 1.5자당 1토큰)
+    """
+    return math.ceil(len(text) / 1.5)
 
-**참조자료**:
-{combined_reference_content}
+def is_retryable_model_error(error: Exception) -> bool:
+    """
+    재시도 대상 오류(429 요청 한도 초과, 5xx 서버 오류, 연결 오류) 여부
+    """
+    # 마감 시간으로 지정한 타임아웃은 재시도하지 않음
+    if isinstance(error, openai.APITimeoutError):
+        return False
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code == 429 or (status_code is not None and status_code >= 500)
 
-**답변 형식**:
+class QueueTicket:
+    """
+    모델 요청 대기 티켓 (같은 토큰 수의 요청도 서로 다른 티켓으로 구분되도록 객체 자체로 비교)
+    """
+    __slots__ = ("tokens", "granted")
 
-## 작업 내용 분석
-[작업의 특성, 주요 위험 포인트, 작업 환경 등을 분석]
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.granted = False
 
-## 오늘 작업에서 예상되는 위험요인과 감소대책은 아래와 같습니다. 확인해주세요.
+class ModelRequestScheduler:
+    """
+    프로세스 전체의 모델 호출을 관리하는 스케줄러
+    - 동시 실행 수 제한 및 분당 토큰(TPM) 예산 관리
+    - 사용자별 대기열을 라운드 로빈으로 처리하여 공정하게 순서 배분
+    - 429/5xx 오류 시 지터가 적용된 지수 백오프로 재시도
+    """
 
-| 순번 | 작업 내용 | 작업등급 | 재해유형 | 세부 위험요인 | 위험등급-개선전 | 위험성 감소대책 | 위험등급-개선후 |
-|------|-----------|----------|----------|---------------|----------------|----------------|----------------|
-| 1 | [구체적 작업] | [S등급~C1] | [재해유형] | [세부 위험요인] | [C1-C4] | [구체적 대책] | [C1-C4] |
-**참조자료를 바탕으로 해당 작업과 관련된 모든 위험요인을 빠짐없이 나열**
+    def __init__(self, max_concurrency: int, tokens_per_minute: int,
+                 max_queue_size: int = MODEL_MAX_QUEUE_SIZE, queue_timeout: float = MODEL_QUEUE_TIMEOUT,
+                 max_retries: int = MODEL_MAX_RETRIES):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._queues = {}              # 사용자별 대기 티켓
+        self._user_order = deque()     # 라운드 로빈 순서
+        self._active = 0
+        self._token_log = deque()      # (시각, 토큰 수) - 최근 1분 사용량
 
-## 추가 안전 조치
-[작업 특성에 맞는 추가적인 안전 조치사항]
+    def _tokens_in_window(self, now: float) -> int:
+        while self._token_log and now - self._token_log[0][0] >= 60:
+            self._token_log.popleft()
+        return sum(tokens for _, tokens in self._token_log)
 
-## 작업 전 체크리스트
-[작업 시작 전 반드시 확인해야 할 사항들]
+    def _waiting_order(self) -> list:
+        """
+        라운드 로빈 순서로 나열한 대기 티켓 목록
+        """
+        order = []
+        depth = 0
+        while True:
+            added = False
+            for user_id in self._user_order:
+                queue = self._queues.get(user_id)
+                if queue and depth < len(queue):
+                    order.append(queue[depth])
+                    added = True
+            if not added:
+                return order
+            depth += 1
 
-**중요사항**:
-- 반드시 참조자료에 있는 모든 위험요인을 빠짐없이 나열해줘.반드시 참조자료의 모든 위험요인이 포함되었는지 다시 한 번 점검해줘.
-- 특히 C2~C4등급의 위험요인은 누락되지 않도록 해줘
-- "작업 내용"은 작업자가 입력한 내용을 분석하고 확인한 내용 중 참조문서에 있는 작업 내용과 가장 유사한 작업 내용을 넣고 모는 순번의 위험성에 동일하게 넣어줘
-- 위험등급은 C1(낮음), C2(보통), C3(높음), C4(매우높음)으로 표시
-- 작업등급은 S(특별관리), C4, C3, C2, C1로 구분
-- 실무에서 바로 활용 가능한 구체적이고 실용적인 대책 제시
-- 모든 내용은 한국어로 작성
-"""
-    
-    # OpenAI API 호출
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        max_tokens=3000
-    )
-    
-    # GPT의 분석 결과를 가져오기
-    analysis_result = response.choices[0].message.content
-    
-    # 결과를 구조화된 형태로 파싱
-    return {
-        "work_description": work_description,
-        "full_report": analysis_result,
-        "sections": parse_analysis_sections(analysis_result),
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "used_references": selected_references
-    }
+    def _dispatch(self) -> None:
+        """
+        실행 슬롯과 토큰 예산이 허용하는 만큼 대기 티켓에 실행 권한 부여 (잠금 상태에서 호출)
+        """
+        now = time.monotonic()
+        while self._active < self.max_concurrency and self._user_order:
+            user_id = self._user_order[0]
+            ticket = self._queues[user_id][0]
+            used_tokens = self._tokens_in_window(now)
+            # 예산을 초과하더라도 실행 중인 요청이 없으면 단독 실행 허용 (한도 0은 제한 없음)
+            if (self.tokens_per_minute > 0 and used_tokens + ticket.tokens > self.tokens_per_minute
+                    and (self._active > 0 or self._token_log)):
+                break
 
-# Streamlit App UI
-st.title("🛠️ 작업 위험성 평가 가이드")
+            self._queues[user_id].popleft()
+            self._user_order.popleft()
+            if self._queues[user_id]:
+                self._user_order.append(user_id)
+            else:
+                del self._queues[user_id]
 
-# 세션 상태 초기화
-if 'reference_files' not in st.session_state:
-    st.session_state['reference_files'] = {}
-if 'reference_loaded' not in st.session_state:
-    st.session_state['reference_loaded'] = False
-if 'analysis_result' not in st.session_state:
-    st.session_state['analysis_result'] = None
+            ticket.granted = True
+            self._active += 1
+            self._token_log.append((now, ticket.tokens))
+        self._cond.notify_all()
 
-# # OpenAI API 키 상태 확인
-# if client is None:
-#     st.warning("⚠️ OpenAI API 키가 설정되지 않았습니다. 설정을 확인해주세요.")
-# else:
-#     st.success("✅ OpenAI API 연결 완료")
+    def queue_length(self) -> int:
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
 
-# 1. 기본 참조 파일 자동 로드 섹션
-st.header("📁 위험성분석 참조 파일 관리")
+    def has_capacity(self) -> bool:
+        """
+        대기 없이 즉시 실행 가능한지 여부
+        """
+        with self._cond:
+            return not self._queues and self._active < self.max_concurrency
 
-# 기본 참조 파일 정보 표시
-st.info(f"📂 기본 참조 파일: `{DEFAULT_REFERENCE_FILE}`")
+    def _acquire(self, user_id: str, estimated_tokens: int, on_wait=None) -> None:
+        with self._cond:
+            if sum(len(queue) for queue in self._queues.values()) >= self.max_queue_size:
+                raise ModelRequestRejected("요청이 많아 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요.")
 
-# 참조 파일 로드 버튼
-col1, col2 = st.columns([3, 1])
-with col1:
-    st.caption(f"파일 위치: `{REFERENCE_FILES_FOLDER}/{DEFAULT_REFERENCE_FILE}`")
-with col2:
-    if st.button("🔄 파일 새로고침", type="secondary"):
-        st.session_state['reference_files'] = load_reference_files_from_folder()
-        st.session_state['reference_loaded'] = True
-        st.rerun()
+            ticket = QueueTicket(estimated_tokens)
+            if user_id not in self._queues:
+                self._queues[user_id] = deque()
+                self._user_order.append(user_id)
+            self._queues[user_id].append(ticket)
+            self._dispatch()
 
-# 앱 시작 시 자동으로 참조 파일 로드
-if not st.session_state['reference_loaded']:
-    with st.spinner("참조 파일들을 로딩하고 있습니다..."):
-        st.session_state['reference_files'] = load_reference_files_from_folder()
-        st.session_state['reference_loaded'] = True
+            deadline = time.monotonic() + self.queue_timeout
+            last_position = None
+            while not ticket.granted:
+                if time.monotonic() >= deadline:
+                    queue = self._queues[user_id]
+                    del queue[next(pos for pos, waiting in enumerate(queue) if waiting is ticket)]
+                    if not queue:
+                        del self._queues[user_id]
+                        self._user_order.remove(user_id)
+                    raise ModelRequestRejected("대기 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
 
-# 로드된 참조 파일 목록 표시
-if st.session_state['reference_files']:
-    st.success(f"✅ {len(st.session_state['reference_files'])}개의 참조 파일이 로드되었습니다!")
-    
-    # 참조 파일 선택
-    st.subheader("📋 사용할 참조 파일 선택")
-    
-    # 모든 파일을 기본으로 선택
+                position = next(pos for pos, waiting in enumerate(self._waiting_order(), 1) if waiting is ticket)
+                if on_wait and position != last_position:
+                    on_wait(position)
+                    last_position = position
+                self._cond.wait(timeout=0.5)
+                # 토큰 예산은 시간이 지나면 회복되므로 주기적으로 재배분
+                self._dispatch()
+
+    def _release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._dispatch()
+
+    def run(self, request_fn, user_id: str = "default", estimated_tokens: int = 0,
+            on_wait=None, on_start=None, cancelled: threading.Event = None):
+        """
+        대기열 순서에 따라 모델 요청을 실행하고, 재시도 대상 오류는 백오프 후 재시도
+        (on_start는 실행 권한을 받은 시점에 호출, cancelled가 설정되면 재시도 중단)
+        """
+        for attempt in range(self.max_retries + 1):
+            if cancelled is not None and cancelled.is_set():
+                raise ModelRequestRejected("취소된 요청입니다.")
+            self._acquire(user_id, estimated_tokens, on_wait)
+            try:
+                if on_start:
+                    on_start()
+                return request_fn()
+            except Exception as e:
+                if not is_retryable_model_error(e) or attempt == self.max_retries:
+                    raise
+                retry_after = None
+                response = getattr(e, "response", None)
+                if response is not None:
+                    try:
+                        retry_after = float(response.headers.get("retry-after"))
+                    except (TypeError, ValueError):
+                        retry_after = None
+            finally:
+                self._release()
+
+            # 지터가 적용된 지수 백오프 (Retry-After 헤더가 있으면 우선 적용)
+            backoff = random.uniform(0, min(30.0, 1.0 * (2 ** attempt)))
+            time.sleep(max(backoff, retry_after or 0))
+
+@st.cache_resource(show_spinner=False)
+def get_model_scheduler(backend_name: str = "openai") -> ModelRequestScheduler:
+    """
+    프로세스 전체에서 공유하는 모델 요청 스케줄러 (백엔드별로 한도를 따로 관리)
+    """
+    if backend_name == "local":
+        return ModelRequestScheduler(LOCAL_MODEL_MAX_CONCURRENCY, LOCAL_MODEL_TOKENS_PER_MINUTE)
+    return ModelRequestScheduler(MODEL_MAX_CONCURRENCY, MODEL_TOKENS_PER_MINUTE)
+
+class HedgedRequestPolicy:
+    """
+    모델 응답 지연(꼬리 지연) 대응 정책
+    - 최근 응답시간의 백분위수(p95)만큼 지나도 응답이 없으면 동일 요청을 한 번 더 전송
+    - 먼저 도착한 정상 응답을 사용하고 나머지 요청은 취소
+    - 마감 시간 초과 또는 재시도 대상 오류 시 보조 모델 또는 참조자료 기반 표로 대체
+      (인증·잘못된 요청·컨텍스트 길이 초과 등 재시도해도 같은 오류는 대체하지 않고 그대로 발생)
+    """
+
+    def __init__(self, enabled: bool = MODEL_HEDGE_ENABLED, percentile: float = MODEL_HEDGE_PERCENTILE,
+                 default_delay: float = MODEL_HEDGE_DEFAULT_DELAY, min_delay: float = MODEL_HEDGE_MIN_DELAY,
+                 deadline: float = MODEL_REQUEST_DEADLINE, fallback_model: str = MODEL_FALLBACK_NAME,
+                 fallback_timeout: float = MODEL_FALLBACK_TIMEOUT):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.deadline = deadline
+        self.fallback_model = fallback_model
+        self.fallback_timeout = fallback_timeout
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(4, MODEL_MAX_CONCURRENCY * 2), thread_name_prefix="model-request")
+        self.metrics = {
+            "requests": 0,           # 전체 요청 수
+            "hedges_fired": 0,       # 헤지 요청 전송 횟수
+            "hedges_skipped": 0,     # 대기열 혼잡으로 헤지를 생략한 횟수
+            "hedge_wins": 0,         # 헤지 요청이 먼저 응답한 횟수
+            "deadline_exceeded": 0,  # 마감 시간 초과 횟수
+            "fallback_model": 0,     # 보조 모델로 대체한 횟수
+            "fallback_reference": 0, # 참조자료 기반 표로 대체한 횟수
+        }
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.metrics[key] += 1
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> float:
+        """
+        헤지 요청 전송까지 기다릴 시간 (표본이 20개 미만이면 기본값 사용)
+        """
+        with self._lock:
+            samples = list(self._latencies)
+        if len(samples) < 20:
+            return self.default_delay
+        return max(self.min_delay, float(np.percentile(samples, self.percentile)))
+
+    def snapshot(self) -> dict:
+        """
+        응답시간 통계와 헤지/대체 발생 횟수
+        """
+        with self._lock:
+            samples = list(self._latencies)
+            metrics = dict(self.metrics)
+        metrics["p50"] = float(np.percentile(samples, 50)) if samples else None
+        metrics["p95"] = float(np.percentile(samples, 95)) if samples else None
+        metrics["hedge_delay"] = self.hedge_delay()
+        return metrics
+
+    @staticmethod
+    def _can_fall_back(error: Exception) -> bool:
+        """
+        대체 응답으로 넘어갈 오류 여부 (응답 마감 시간 초과 또는 재시도 대상 오류)
+        """
+        return isinstance(error, openai.APITimeoutError) or is_retryable_model_error(error)
+
+    def complete(self, request_fn, model: str, on_wait=None, scheduler: ModelRequestScheduler = None) -> dict:
+        """
+        헤지/대체 정책을 적용하여 모델 요청 실행
+        request_fn(model, timeout, on_wait, on_start, cancelled)는 모델 응답을 반환해야 함
+        반환값의 response가 None이면 호출 측에서 참조자료 기반 표로 대체
+        """
+        self._count("requests")
+        cancelled = threading.Event()
+        state = {"position": None, "started": {}}
+
+        def launch(label: str, timeout: float):
+            def on_position(position):
+                state["position"] = position
+
+            def on_start():
+                state["started"].setdefault(label, time.monotonic())
+
+            future = self._executor.submit(request_fn, model, timeout, on_position, on_start, cancelled)
+            future.label = label
+            return future
+
+        pending = {launch("primary", self.deadline)}
+        hedge_checked = not self.enabled
+        last_position = None
+        last_error = None
+        hedged = False
+
+        while pending:
+            done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+
+            # 대기 순번은 호출한 스레드에서 화면에 반영
+            if on_wait and state["position"] != last_position and not state["started"]:
+                last_position = state["position"]
+                on_wait(last_position)
+
+            for future in done:
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+                cancelled.set()
+                for other in pending:
+                    other.cancel()
+                latency = time.monotonic() - state["started"].get(future.label, time.monotonic())
+                self.record_latency(latency)
+                if future.label == "hedge":
+                    self._count("hedge_wins")
+                return {"response": future.result(), "model": model, "hedged": hedged,
+                        "winner": future.label, "latency": latency}
+
+            primary_started = state["started"].get("primary")
+            if not pending or primary_started is None:
+                continue
+
+            elapsed = time.monotonic() - primary_started
+            if elapsed >= self.deadline:
+                self._count("deadline_exceeded")
+                break
+            if not hedge_checked and elapsed >= self.hedge_delay():
+                hedge_checked = True
+                # 대기열이 밀려 있으면 헤지 요청이 혼잡을 키우므로 생략
+                if scheduler is None or scheduler.has_capacity():
+                    pending.add(launch("hedge", self.deadline - elapsed))
+                    hedged = True
+                    self._count("hedges_fired")
+                else:
+                    self._count("hedges_skipped")
+
+        # 진행 중인 요청은 결과를 사용하지 않으며 재시도도 중단
+        cancelled.set()
+        for future in pending:
+            future.cancel()
+
+        if last_error is not None and (not state["started"] or not self._can_fall_back(last_error)):
+            # 실행 전 거절(대기열 초과 등)과 대체해도 해결되지 않는 오류(인증, 잘못된 요청 등)는 그대로 전달
+            raise last_error
+
+        if self.fallback_model:
+            try:
+                start = time.monotonic()
+                response = request_fn(self.fallback_model, self.fallback_timeout, on_wait, None, None)
+                self._count("fallback_model")
+                return {"response": response, "model": self.fallback_model, "hedged": hedged,
+                        "winner": "fallback", "latency": time.monotonic() - start}
+            except Exception as e:
+                if not self._can_fall_back(e):
+                    raise
+                last_error = e
+
+        self._count("fallback_reference")
+        return {"response": None, "model": None, "hedged": hedged, "winner": "reference", "latency": None,
+                "error": str(last_error) if last_error else "응답 마감 시간 초과"}
+
+@st.cache_resource(show_spinner=False)
+def get_hedge_policy() -> HedgedRequestPolicy:
+    """
+    프로세스 전체에서 공유하는 헤지 요청 정책
+    """
+    return HedgedRequestPolicy()
+
+class ModelConnectivity:
+    """
+    모델 서버 연결 상태 (연결 실패 후 retry_seconds 동안은 오프라인으로 보고 모델 호출을 건너뜀)
+    재시도 대기 없이 바로 오프라인 평가를 하기 위한 차단기 역할
+    """
+
+    def __init__(self, retry_seconds: float = OFFLINE_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self._offline_until = 0.0
+        self._last_error = None
+        self._lock = threading.Lock()
+
+    def offline(self) -> bool:
+        with self._lock:
+            return time.monotonic() < self._offline_until
+
+    def record_failure(self, error: Exception) -> None:
+        with self._lock:
+            self._offline_until = time.monotonic() + self.retry_seconds
+            self._last_error = str(error)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._offline_until = 0.0
+            self._last_error = None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = max(0.0, self._offline_until - time.monotonic())
+            return {"offline": retry_in > 0, "retry_in": retry_in, "last_error": self._last_error}
+
+@st.cache_resource(show_spinner=False)
+def get_model_connectivity(backend_name: str) -> ModelConnectivity:
+    """
+    백엔드별로 프로세스 전체에서 공유하는 연결 상태
+    """
+    return ModelConnectivity()
+
+def is_connection_error(error: Exception) -> bool:
+    """
+    모델 서버에 연결할 수 없는 오류 여부 (응답 마감 시간 초과는 제외)
+    """
+    return isinstance(error, openai.APIConnectionError) and not isinstance(error, openai.APITimeoutError)
+
+def _char_bigrams(text: str) -> set:
+    """
+    공백을 제거한 문자 2-gram 집합
+    """
+    text = re.sub(r"\s+", "", str(text))
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+# 변형어 → 대표어
+KOREAN_SYNONYMS = {variant: group[0] for group in KOREAN_SYNONYM_GROUPS for variant in group[1:]}
+
+def normalize_korean_text(text: str) -> str:
+    """
+    매칭용 한국어 정규화 (유니코드 NFKC, 소문자, 기호 → 공백, 공백 정리)
+    """
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    text = re.sub(r"[^\w.]+|_", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def _strip_particle(token: str) -> str:
+    for particle in KOREAN_PARTICLES:
+        if token.endswith(particle) and len(token) - len(particle) >= 2:
+            return token[:-len(particle)]
+    return token
+
+def _split_compound(token: str) -> list:
+    for suffix in KOREAN_COMPOUND_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return [token[:-len(suffix)], suffix]
+    return [token]
+
+def tokenize_korean(text: str, drop_stopwords: bool = True) -> list:
+    """
+    정규화 → 조사 제거 → 복합어 뒷말 분리 → 동의어 대표어 치환(토큰 전체 일치) → 일반어 제거 순서로 토큰 목록 생성
+    예) "오늘 철탑에서 안테나 재설치 작업" → ["철탑", "안테나", "설치"]
+    """
+    tokens = []
+    for token in normalize_korean_text(text).split():
+        for part in _split_compound(_strip_particle(token.strip("."))):
+            part = KOREAN_SYNONYMS.get(part, part)
+            # 띄어 쓴 조사("철탑 에서")는 토큰에서 제외
+            if part and part not in KOREAN_PARTICLES and not (drop_stopwords and part in KOREAN_STOPWORDS):
+                tokens.append(part)
+    return tokens
+
+def canonical_korean_text(text: str) -> str:
+    """
+    정규화된 토큰을 공백으로 이은 문자열 (띄어쓰기/조사/동의어 차이를 없앤 비교·캐시 키용)
+    """
+    return " ".join(tokenize_korean(text, drop_stopwords=False))
+
+def korean_token_features(text: str) -> frozenset:
+    """
+    매칭용 특징 집합: 토큰 + 토큰 내부 문자 2-gram
+    (띄어쓰기가 달라도 2-gram이 겹치고, 토큰 경계를 넘는 2-gram은 만들지 않음)
+    """
+    features = set()
+    for token in tokenize_korean(text):
+        features.add(token)
+        features.update(token[i:i + 2] for i in range(len(token) - 1))
+    return frozenset(features)
+
+def _char_ngrams(text: str) -> set:
+    """
+    검색용 문자 n-gram 집합 (정규화/동의어 치환 후 2-gram, 한 글자면 그 글자)
+    """
+    text = canonical_korean_text(text).replace(" ", "")
+    return {text} if len(text) == 1 else _char_bigrams(text)
+
+class MappedPostings:
+    """
+    파일에 저장된 역색인 (키 → 번호 배열, CSR 형식: 키별 시작 위치 offsets + 번호 ids)
+    offsets/ids는 메모리 매핑되어 여러 프로세스가 같은 페이지를 공유하며, dict와 같이 get()으로 조회
+    """
+
+    def __init__(self, keys: list, offsets: np.ndarray, ids: np.ndarray):
+        self._positions = {key: pos for pos, key in enumerate(keys)}
+        self.offsets = offsets
+        self.ids = ids
+
+    @staticmethod
+    def save(folder: str, name: str, postings: dict) -> list:
+        """
+        역색인을 name_offsets.npy/name_ids.npy로 저장하고 키 목록(저장 순서)을 반환
+        """
+        keys = list(postings)
+        lengths = np.array([len(postings[key]) for key in keys], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        ids = np.concatenate([postings[key] for key in keys]).astype(np.int32) if keys else np.zeros(0, dtype=np.int32)
+        np.save(os.path.join(folder, f"{name}_offsets.npy"), offsets)
+        np.save(os.path.join(folder, f"{name}_ids.npy"), ids)
+        return keys
+
+    @classmethod
+    def load(cls, folder: str, name: str, keys: list) -> "MappedPostings":
+        return cls(
+            keys,
+            np.load(os.path.join(folder, f"{name}_offsets.npy"), mmap_mode="r"),
+            np.load(os.path.join(folder, f"{name}_ids.npy"), mmap_mode="r"),
+        )
+
+    def get(self, key, default=None):
+        pos = self._positions.get(key)
+        if pos is None:
+            return default
+        return self.ids[self.offsets[pos]:self.offsets[pos + 1]]
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+class ReferenceSearchIndex:
+    """
+    참조자료 행에 대한 문자 n-gram 역색인
+    - 필드(작업 내용/재해유형/세부 위험요인)별 n-gram → 행 번호 배열
+    - 작업 내용(소분류)별 특징 집합(토큰 + 토큰 내부 2-gram)을 미리 계산하고, 특징 → 작업 번호 배열 (유사 작업 매칭용)
+    검색창과 프롬프트 전 유사 작업 매칭이 같은 색인을 사용
+    """
+
+    def __init__(self, reference_df: pd.DataFrame):
+        self.rows = reference_df.reset_index(drop=True)
+        self.row_count = len(self.rows)
+
+        # 필드별 역색인 (같은 값은 한 번만 n-gram 분해)
+        self.postings = {}
+        for field in REFERENCE_SEARCH_FIELDS:
+            codes, values = pd.factorize(self.rows[field].astype(str))
+            value_rows = pd.Series(np.arange(self.row_count, dtype=np.int32)).groupby(codes).agg(list)
+            postings = {}
+            for code, value in enumerate(values):
+                for gram in _char_ngrams(value):
+                    postings.setdefault(gram, []).extend(value_rows.get(code, []))
+            self.postings[field] = {
+                gram: np.unique(np.asarray(ids, dtype=np.int32)) for gram, ids in postings.items()
+            }
+
+        # 작업 내용 단위 색인 (unique() 순서 유지)
+        self.work_items = list(pd.unique(self.rows["작업 내용"].astype(str))) if self.row_count else []
+        self.item_features = [korean_token_features(work_item) for work_item in self.work_items]
+        self.item_sizes = np.array([len(features) for features in self.item_features], dtype=float)
+        item_postings = {}
+        for item_id, features in enumerate(self.item_features):
+            for feature in features:
+                item_postings.setdefault(feature, []).append(item_id)
+        self.item_postings = {feature: np.asarray(ids, dtype=np.int32) for feature, ids in item_postings.items()}
+
+    def save(self, folder: str) -> None:
+        """
+        색인을 폴더에 저장 (행은 Arrow IPC, 역색인은 CSR 배열, 키와 작업 목록은 meta.json)
+        """
+        os.makedirs(folder, exist_ok=True)
+        write_arrow_frame(self.rows, os.path.join(folder, "rows.arrow"))
+        np.save(os.path.join(folder, "item_sizes.npy"), self.item_sizes)
+        meta = {
+            "version": SHARED_STORE_VERSION,
+            "row_count": self.row_count,
+            "work_items": self.work_items,
+            "fields": {
+                field: MappedPostings.save(folder, f"field{pos}", self.postings[field])
+                for pos, field in enumerate(REFERENCE_SEARCH_FIELDS)
+            },
+            "item_features": MappedPostings.save(folder, "items", self.item_postings),
+        }
+        with open(os.path.join(folder, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, folder: str) -> "ReferenceSearchIndex":
+        """
+        저장된 색인을 메모리 매핑으로 열기 (n-gram 분해 없이 바로 검색 가능)
+        """
+        with open(os.path.join(folder, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls.__new__(cls)
+        index.rows = read_arrow_frame(os.path.join(folder, "rows.arrow"))
+        index.row_count = meta["row_count"]
+        index.postings = {
+            field: MappedPostings.load(folder, f"field{pos}", meta["fields"][field])
+            for pos, field in enumerate(REFERENCE_SEARCH_FIELDS)
+        }
+        index.work_items = meta["work_items"]
+        index.item_features = None  # 생성 시에만 사용
+        index.item_sizes = np.load(os.path.join(folder, "item_sizes.npy"), mmap_mode="r")
+        index.item_postings = MappedPostings.load(folder, "items", meta["item_features"])
+        return index
+
+    def search(self, query: str, limit: int = 50, min_coverage: float = 0.6) -> pd.DataFrame:
+        """
+        검색어 n-gram이 min_coverage 이상 포함된 행을 점수순으로 반환 ('점수' 컬럼 추가)
+        점수는 필드 가중치 × 희소도(idf)의 합
+        """
+        grams = _char_ngrams(query)
+        if not grams or self.row_count == 0:
+            return self.rows.head(0).assign(점수=pd.Series(dtype=float))
+        scores = np.zeros(self.row_count)
+        hits = np.zeros(self.row_count, dtype=np.int32)
+        for gram in grams:
+            matched = np.zeros(self.row_count, dtype=bool)
+            for field, weight in REFERENCE_SEARCH_FIELDS.items():
+                ids = self.postings[field].get(gram)
+                if ids is not None:
+                    scores[ids] += weight * math.log(1 + self.row_count / len(ids))
+                    matched[ids] = True
+            hits += matched
+        candidates = np.flatnonzero(hits >= math.ceil(len(grams) * min_coverage))
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:limit]
+        results = self.rows.iloc[order].copy()
+        results.insert(0, "점수", scores[order].round(2))
+        return results
+
+    def work_item_scores(self, work_description: str) -> np.ndarray:
+        """
+        작업 내용별 유사도 (특징 겹침 |q∩i| / sqrt(|q||i|), work_items 순서)
+        """
+        query = korean_token_features(work_description)
+        overlap = np.zeros(len(self.work_items))
+        for feature in query:
+            ids = self.item_postings.get(feature)
+            if ids is not None:
+                overlap[ids] += 1
+        return overlap / np.sqrt(np.maximum(len(query) * self.item_sizes, 1))
+
+    def match_work_items(self, work_description: str, top_n: int = 1) -> list:
+        """
+        작업 설명과 특징이 가장 많이 겹치는 작업 내용 목록
+        """
+        if not self.work_items:
+            return []
+        scores = self.work_item_scores(work_description)
+        order = np.argsort(-scores, kind="stable")[:top_n]
+        return [self.work_items[item_id] for item_id in order if scores[item_id] > 0]
+
+def load_shared_reference_search_index(signature: tuple, reference_df: pd.DataFrame) -> ReferenceSearchIndex:
+    """
+    공유 저장 폴더의 검색 색인 (없으면 만들어 임시 폴더에 저장한 뒤 이름을 바꿔 공개)
+    여러 프로세스가 동시에 만들면 먼저 공개된 색인을 쓰고 나머지는 버림
+    """
+    folder = shared_store_path("index", signature)
+    if not os.path.exists(os.path.join(folder, "meta.json")):
+        temp_folder = f"{folder}.{os.getpid()}.{threading.get_ident()}.tmp"
+        ReferenceSearchIndex(reference_df).save(temp_folder)
+        try:
+            os.replace(temp_folder, folder)
+        except OSError:
+            shutil.rmtree(temp_folder, ignore_errors=True)
+    return ReferenceSearchIndex.load(folder)
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _load_reference_search_index(signature: tuple, _reference_df: pd.DataFrame) -> ReferenceSearchIndex:
+    if SHARED_STORE_FOLDER:
+        return load_shared_reference_search_index(signature, _reference_df)
+    return ReferenceSearchIndex(_reference_df)
+
+def get_reference_search_index(reference_df: pd.DataFrame) -> ReferenceSearchIndex:
+    """
+    참조자료 행 묶음별 검색 색인 (같은 행 묶음이면 한 번만 생성)
+    DataFrame 전체를 해시하지 않고 (참조 파일, 수정 시각, 행 수)로 묶음을 구분
+    """
+    files = tuple(
+        (name, os.path.getmtime(os.path.join(REFERENCE_FILES_FOLDER, name)) if os.path.exists(os.path.join(REFERENCE_FILES_FOLDER, name)) else None)
+        for name in map(str, reference_df["참조파일"].unique())
+    ) if "참조파일" in reference_df else ()
+    return _load_reference_search_index((files, len(reference_df)), reference_df)
+
+def highlight_matches(text: str, query: str) -> str:
+    """
+    검색어 n-gram과 겹치는 부분을 마크다운 굵게 표시 (NFKC 정규화로 글자 수가 바뀌는 문자는 표시되지 않을 수 있음)
+    """
+    text = str(text)
+    lowered = text.lower()
+    grams = set(_char_ngrams(query))
+    # 동의어로 치환되어 검색된 원문 표현(예: 타워 → 철탑)도 표시
+    query_tokens = set(tokenize_korean(query, drop_stopwords=False))
+    for variant, canonical in KOREAN_SYNONYMS.items():
+        if canonical in query_tokens:
+            grams.update(_char_ngrams(variant) | _char_bigrams(variant))
+    marked = [False] * len(text)
+    for gram in grams:
+        start = lowered.find(gram)
+        while start >= 0:
+            for pos in range(start, start + len(gram)):
+                marked[pos] = True
+            start = lowered.find(gram, start + 1)
+    parts = []
+    for pos, char in enumerate(text):
+        if marked[pos] and (pos == 0 or not marked[pos - 1]):
+            parts.append("**")
+        parts.append(char)
+        if marked[pos] and (pos == len(text) - 1 or not marked[pos + 1]):
+            parts.append("**")
+    return "".join(parts)
+
+def match_reference_work_items(work_description: str, reference_df: pd.DataFrame, top_n: int = 1) -> list:
+    """
+    작업 설명과 가장 유사한 참조자료 작업 내용(소분류) 목록 반환 (문자 2-gram 겹침 기준)
+    """
+    if reference_df.empty:
+        return []
+    return get_reference_search_index(reference_df).match_work_items(work_description, top_n)
+
+class HashedNgramEncoder:
+    """
+    외부 모델 없이 쓰는 임베딩: 토큰/2-gram 특징을 해시하여 TF-IDF 가중 후 L2 정규화
+    """
+    name = "hashed-ngram-tfidf"
+
+    def __init__(self, dim: int = EMBEDDING_HASH_DIM, idf: np.ndarray = None):
+        self.dim = dim
+        self.idf = idf if idf is not None else np.ones(dim, dtype=np.float32)
+
+    def _counts(self, texts: list) -> np.ndarray:
+        counts = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in korean_token_features(text):
+                counts[row, zlib.crc32(feature.encode("utf-8")) % self.dim] += 1
+        return counts
+
+    def fit(self, texts: list) -> None:
+        document_freq = (self._counts(texts) > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_freq)) + 1).astype(np.float32)
+
+    def encode(self, texts: list) -> np.ndarray:
+        vectors = self._counts(texts) * self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+class SentenceEmbeddingEncoder:
+    """
+    CPU에서 실행하는 sentence-transformers 로컬 임베딩 모델
+    """
+
+    def __init__(self, model_name: str):
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def fit(self, texts: list) -> None:
+        pass
+
+    def encode(self, texts: list) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+def create_embedding_encoder(model_name: str = EMBEDDING_MODEL_NAME, idf: np.ndarray = None):
+    """
+    설정된 임베딩 모델 생성 (모델 미지정 또는 sentence-transformers 미설치 시 해시 n-gram TF-IDF)
+    """
+    if model_name and model_name != HashedNgramEncoder.name and SentenceTransformer is not None:
+        return SentenceEmbeddingEncoder(model_name)
+    return HashedNgramEncoder(idf=idf)
+
+def reference_folder_signature() -> list:
+    """
+    참조 폴더 파일 구성 (파일명, 수정 시각, 크기) - 색인이 최신인지 확인하는 용도
+    """
+    return [
+        [os.path.basename(path), os.path.getmtime(path), os.path.getsize(path)]
+        for extension in ['*.xlsx', '*.csv']
+        for path in sorted(glob.glob(os.path.join(REFERENCE_FILES_FOLDER, extension)))
+    ]
+
+def embedding_item_texts(reference_df: pd.DataFrame) -> tuple:
+    """
+    작업 내용별 임베딩 입력 문장 (작업 내용 + 대/중분류 + 재해유형)
+    """
+    rows = reference_df.astype({column: str for column in ["작업 내용", "대분류", "중분류", "재해유형"]})
+    grouped = rows.groupby("작업 내용", sort=False)
+    work_items = list(grouped.groups.keys())
+    texts = [
+        " ".join([work_item, group["대분류"].iloc[0], group["중분류"].iloc[0], " ".join(pd.unique(group["재해유형"]))])
+        for work_item, group in grouped
+    ]
+    return work_items, texts
+
+def _spherical_kmeans(vectors: np.ndarray, cluster_count: int, iterations: int = 20) -> tuple:
+    """
+    정규화 벡터용 k-means (코사인 유사도 기준) - (군집 중심, 벡터별 군집 번호) 반환
+    벡터가 없으면 빈 군집 중심/배정 반환 (작업이 없는 참조자료)
+    """
+    if len(vectors) == 0:
+        return np.zeros((0, vectors.shape[1]), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    cluster_count = min(cluster_count, len(vectors))
+    rng = np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), cluster_count, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(cluster_count):
+            members = vectors[assignments == cluster]
+            if len(members):
+                center = members.sum(axis=0)
+                centroids[cluster] = center / max(np.linalg.norm(center), 1e-12)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+def build_embedding_index(reference_df: pd.DataFrame, folder: str = EMBEDDING_INDEX_FOLDER,
+                          model_name: str = EMBEDDING_MODEL_NAME) -> dict:
+    """
+    참조자료 작업 내용의 임베딩 색인을 만들어 폴더에 저장 (오프라인 실행용)
+    vectors.npy(메모리 매핑으로 읽음), 근사 검색용 군집 중심/배정, 메타 정보를 저장하고 생성 통계를 반환
+    """
+    start = time.perf_counter()
+    work_items, texts = embedding_item_texts(reference_df)
+    encoder = create_embedding_encoder(model_name)
+    encoder.fit(texts)
+    vectors = encoder.encode(texts).astype(np.float32)
+    encode_seconds = time.perf_counter() - start
+
+    centroids, assignments = _spherical_kmeans(vectors, max(1, math.ceil(math.sqrt(len(vectors)))))
+
+    os.makedirs(folder, exist_ok=True)
+    np.save(os.path.join(folder, "vectors.npy"), vectors)
+    np.save(os.path.join(folder, "ivf_centroids.npy"), centroids)
+    np.save(os.path.join(folder, "ivf_assignments.npy"), assignments)
+    if isinstance(encoder, HashedNgramEncoder):
+        np.save(os.path.join(folder, "idf.npy"), encoder.idf)
+    meta = {
+        "encoder": encoder.name,
+        "dim": int(vectors.shape[1]),
+        "work_items": work_items,
+        "signature": reference_folder_signature(),
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(folder, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return {
+        "encoder": encoder.name,
+        "items": len(work_items),
+        "dim": int(vectors.shape[1]),
+        "encode_seconds": round(encode_seconds, 3),
+        "build_seconds": round(time.perf_counter() - start, 3),
+    }
+
+class EmbeddingIndex:
+    """
+    저장된 임베딩 색인 (벡터는 메모리 매핑)
+    작업 수가 많으면 질의와 가까운 군집의 작업만 코사인 유사도로 비교 (IVF 근사 검색)
+    """
+
+    def __init__(self, folder: str = EMBEDDING_INDEX_FOLDER):
+        with open(os.path.join(folder, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.work_items = self.meta["work_items"]
+        self.vectors = np.load(os.path.join(folder, "vectors.npy"), mmap_mode="r")
+        self.centroids = np.load(os.path.join(folder, "ivf_centroids.npy"))
+        assignments = np.load(os.path.join(folder, "ivf_assignments.npy"))
+        self.clusters = [np.flatnonzero(assignments == cluster) for cluster in range(len(self.centroids))]
+        idf_path = os.path.join(folder, "idf.npy")
+        self.encoder = create_embedding_encoder(
+            self.meta["encoder"],
+            idf=np.load(idf_path) if os.path.exists(idf_path) else None
+        )
+
+    @property
+    def stale(self) -> bool:
+        return self.meta.get("signature") != reference_folder_signature()
+
+    def query(self, text: str, top_n: int = 3, allowed_items: set = None, mode: str = "auto") -> list:
+        """
+        작업 설명과 가까운 작업 내용 [(작업 내용, 유사도)] (allowed_items로 선택된 참조자료 작업만 허용)
+        mode: "auto"(작업 수에 따라 선택), "ann"(군집 근사 검색), "exact"(전체 탐색)
+        """
+        if not self.work_items:
+            return []
+        query_vector = self.encoder.encode([text])[0]
+        if mode == "auto":
+            mode = "ann" if len(self.work_items) >= EMBEDDING_ANN_MIN_ITEMS else "exact"
+        if mode == "ann":
+            probe_count = max(1, math.ceil(len(self.centroids) * EMBEDDING_IVF_PROBE_RATIO))
+            probes = np.argsort(-(self.centroids @ query_vector))[:probe_count]
+            candidates = np.sort(np.concatenate([self.clusters[cluster] for cluster in probes]))
+        else:
+            candidates = np.arange(len(self.work_items))
+        if allowed_items is not None:
+            candidates = np.array([item_id for item_id in candidates if self.work_items[item_id] in allowed_items], dtype=np.int64)
+        if len(candidates) == 0:
+            return []
+        scores = np.asarray(self.vectors[candidates]) @ query_vector
+        order = np.argsort(-scores, kind="stable")[:top_n]
+        return [(self.work_items[candidates[pos]], float(scores[pos])) for pos in order if scores[pos] > 0]
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_embedding_index(folder: str, modified: float) -> EmbeddingIndex:
+    return EmbeddingIndex(folder)
+
+def get_embedding_index(folder: str = EMBEDDING_INDEX_FOLDER):
+    """
+    저장된 임베딩 색인 (없거나 참조 파일이 바뀌어 오래된 색인이면 None)
+    """
+    meta_path = os.path.join(folder, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    index = load_embedding_index(folder, os.path.getmtime(meta_path))
+    return None if index.stale else index
+
+def benchmark_embedding_index(reference_df: pd.DataFrame, queries: list, top_n: int = 3,
+                              folder: str = EMBEDDING_INDEX_FOLDER) -> dict:
+    """
+    임베딩 색인 생성 시간, 질의 지연(근사/전체 탐색), 근사 검색 재현율, 문자 매칭과의 일치율 측정
+    """
+    build_stats = build_embedding_index(reference_df, folder)
+    index = EmbeddingIndex(folder)
+    records = []
+    for query in queries:
+        start = time.perf_counter()
+        approximate = [item for item, _ in index.query(query, top_n, mode="ann")]
+        ann_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        exact = [item for item, _ in index.query(query, top_n, mode="exact")]
+        exact_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        lexical = match_reference_work_items(query, reference_df, top_n)
+        lexical_ms = (time.perf_counter() - start) * 1000
+        records.append({
+            "작업 내용": query,
+            "임베딩 후보": ", ".join(exact),
+            "문자 매칭 후보": ", ".join(lexical),
+            "근사 검색(ms)": round(ann_ms, 2),
+            "전체 탐색(ms)": round(exact_ms, 2),
+            "문자 매칭(ms)": round(lexical_ms, 3),
+            "근사 재현율(%)": round(len(set(approximate) & set(exact)) / max(len(exact), 1) * 100, 1),
+            "문자 매칭 일치(%)": round(len(set(approximate) & set(lexical)) / max(len(lexical), 1) * 100, 1),
+        })
+    return {"build": build_stats, "queries": pd.DataFrame(records)}
+
+def _markdown_cell(value) -> str:
+    """
+    마크다운 표 셀에 넣을 수 있도록 줄바꿈과 구분자 제거
+    """
+    if pd.isna(value):
+        return ""
+    return str(value).replace("|", "/").replace("\n", " ").strip()
+
+def reference_table_rows(rows: pd.DataFrame, start: int = 1) -> list:
+    """
+    참조자료 행을 위험성 평가표 행(RISK_TABLE_COLUMNS 순서의 문자열 목록)으로 변환
+    """
+    return [
+        [str(number)] + [_markdown_cell(values[column]) for column in RISK_TABLE_COLUMNS[1:]]
+        for number, values in enumerate(rows.to_dict("records"), start=start)
+    ]
+
+def risk_table_markdown(table_rows: list) -> list:
+    """
+    위험성 평가표 행 목록을 마크다운 표 줄 목록으로 변환 (머리글 포함)
+    """
+    lines = [
+        "| 순번 | 작업 내용 | 작업등급 | 재해유형 | 세부 위험요인 | 위험등급-개선전 | 위험성 감소대책 | 위험등급-개선후 |",
+        "|------|-----------|----------|----------|---------------|----------------|----------------|----------------|",
+    ]
+    lines += ["| " + " | ".join(str(cell) for cell in row) + " |" for row in table_rows]
+    return lines
+
+def build_reference_only_report(work_description: str, reference_df: pd.DataFrame,
+                                notice: str = "※ 모델 응답을 받지 못해 참조자료만으로 생성한 결과입니다.") -> str:
+    """
+    모델 응답 없이 참조자료에서 가장 유사한 작업의 위험요인으로 보고서 생성
+    (모델 보고서와 같은 형식이므로 동일한 파싱 함수를 사용할 수 있음)
+    """
+    matched = match_reference_work_items(work_description, reference_df, top_n=1)
+    rows = reference_df[reference_df["작업 내용"].isin(matched)]
+
+    lines = [
+        "## 작업 내용 분석",
+        notice,
+    ]
+    if matched:
+        first = rows.iloc[0]
+        lines.append(f"- 가장 유사한 참조 작업: {matched[0]} ({first['대분류']} / {first['중분류']})")
+        lines.append(f"- 작업등급: {first['작업등급']} · 위험등급별 위험요인: {grade_summary_text(rows)}")
+    else:
+        lines.append("- 참조자료에서 유사한 작업을 찾지 못했습니다.")
+
+    lines += [
+        "",
+        "## 오늘 작업에서 예상되는 위험요인과 감소대책은 아래와 같습니다. 확인해주세요.",
+        "",
+    ]
+    lines += risk_table_markdown(reference_table_rows(rows))
+
+    high_risk = rows[rows["위험등급-개선전"] >= "C3"]
+    lines += ["", "## 추가 안전 조치"]
+    lines += [f"- {_markdown_cell(measure)}" for measure in high_risk["위험성 감소대책"].unique()] or ["- 참조자료의 감소대책을 준수하세요."]
+    lines += ["", "## 작업 전 체크리스트"]
+    lines += [f"- [ ] {item}" for item in reference_checklist_items(rows)]
+    lines.append("- [ ] 작업 전 안전교육(TBM) 실시 및 보호구 착용 확인")
+    return "\n".join(lines)
+
+def grade_summary_text(rows: pd.DataFrame) -> str:
+    """
+    위험등급(개선전)별 위험요인 수 요약 (높은 등급부터, 예: "C4 2건 · C3 5건")
+    """
+    counts = rows["위험등급-개선전"].value_counts()
+    return " · ".join(f"{grade} {counts[grade]}건" for grade in reversed(RISK_GRADES) if counts.get(grade, 0))
+
+def reference_checklist_items(rows: pd.DataFrame) -> list:
+    """
+    참조 행의 재해유형으로 작업 전 체크리스트 문구 선택 (등급이 높은 재해유형부터, 같은 문구는 한 번만)
+    템플릿에 없는 재해유형은 감소대책 이행 확인 문구 사용
+    """
+    ordered = rows.sort_values("위험등급-개선전", ascending=False, kind="stable")
+    items = []
+    for disaster in ordered["재해유형"].astype(str).unique():
+        templates = [text for keywords, text in REFERENCE_CHECKLIST_TEMPLATES if any(keyword in disaster for keyword in keywords)]
+        for text in templates or [f"{_markdown_cell(disaster)} 위험에 대한 감소대책 이행 확인"]:
+            if text not in items:
+                items.append(text)
+    return items
+
+# 프롬프트 고정 지시문
+PROMPT_INSTRUCTIONS = """
+너는 안전보건 담당자야. 현장의 작업자에게 작업전 위험성 평가를 가이드하는 업무를 담당하고 있어.
+첨부의 참조자료는 각 작업에서 발생할 수 있는 유해, 위험요인들과 그에 대한 개선방안이 정리되어 있어.
+내가 특정 작업에 대해서 말하면, 위험요인은 참조자료를 참고해서 최대한 자세히 답변해줘.
+1. 작압자가 말한 작업 내용을 분석하고 이 내용을 참조자료와 비교해서 가장 유사한 작업 내용을 찾아.
+2. 참조자료에 있는 위험요인들을 모두 빠짐없이 나열해줘.
+3. 각 위험요인에 대해 참조자료의 '작업 내용', '재해유형', '세부 위험요인', '위험등급', '감소대책' 정보를 그대로 반영해줘.
+4. 위험등급은 C1(낮음), C2(보통), C3(높음), C4(매우높음)으로 표시해줘.
+5. 작업등급은 S(특별관리), C4, C3, C2, C1로 구분해줘.
+"""
+
+# 프롬프트 답변 형식 및 중요사항
+PROMPT_ANSWER_FORMAT = """
+**답변 형식**:
+
+## 작업 내용 분석
+[작업의 특성, 주요 위험 포인트, 작업 환경 등을 분석]
+
+## 오늘 작업에서 예상되는 위험요인과 감소대책은 아래와 같습니다. 확인해주세요.
+
+| 순번 | 작업 내용 | 작업등급 | 재해유형 | 세부 위험요인 | 위험등급-개선전 | 위험성 감소대책 | 위험등급-개선후 |
+|------|-----------|----------|----------|---------------|----------------|----------------|----------------|
+| 1 | [구체적 작업] | [S등급~C1] | [재해유형] | [세부 위험요인] | [C1-C4] | [구체적 대책] | [C1-C4] |
+**참조자료를 바탕으로 해당 작업과 관련된 모든 위험요인을 빠짐없이 나열**
+
+## 추가 안전 조치
+[작업 특성에 맞는 추가적인 안전 조치사항]
+
+## 작업 전 체크리스트
+[작업 시작 전 반드시 확인해야 할 사항들]
+
+**중요사항**:
+- 반드시 참조자료에 있는 모든 위험요인을 빠짐없이 나열해줘.반드시 참조자료의 모든 위험요인이 포함되었는지 다시 한 번 점검해줘.
+- 특히 C2~C4등급의 위험요인은 누락되지 않도록 해줘
+- "작업 내용"은 작업자가 입력한 내용을 분석하고 확인한 내용 중 참조문서에 있는 작업 내용과 가장 유사한 작업 내용을 넣고 모는 순번의 위험성에 동일하게 넣어줘
+- 위험등급은 C1(낮음), C2(보통), C3(높음), C4(매우높음)으로 표시
+- 작업등급은 S(특별관리), C4, C3, C2, C1로 구분
+- 실무에서 바로 활용 가능한 구체적이고 실용적인 대책 제시
+- 모든 내용은 한국어로 작성
+"""
+
+# 백그라운드 분석 작업 스레드의 참조 파일 목록 (세션 밖에서 실행되므로 제출 시점의 목록을 사용)
+_job_context = threading.local()
+
+def current_reference_files() -> dict:
+    """
+    현재 분석에 쓰는 참조 파일 목록 (백그라운드 작업이면 제출 시점의 목록, 아니면 세션의 목록)
+    """
+    reference_files = getattr(_job_context, "reference_files", None)
+    return st.session_state.get('reference_files', {}) if reference_files is None else reference_files
+
+def reference_file_content(ref_name: str) -> str:
+    """
+    참조 파일 내용 (파일 경로와 수정 시각 기준 캐시에서 읽음)
+    참조 파일 목록은 세션과 백그라운드 작업 스레드가 함께 보므로 목록에 내용을 써 넣지 않음
+    """
+    return load_reference_file_content(current_reference_files()[ref_name]['path']) or ""
+
+def build_reference_block(selected_references: list) -> str:
+    """
+    선택된 참조 파일들의 내용 결합
+    """
+    combined_reference_content = ""
+    for ref_name in selected_references:
+        if ref_name in current_reference_files():
+            combined_reference_content += f"\n\n=== {ref_name} ===\n"
+            combined_reference_content += reference_file_content(ref_name)
+    return combined_reference_content
+
+def reference_signature(selected_references: list, reference_files: dict = None) -> tuple:
+    """
+    선택된 참조 파일 구성을 나타내는 키 (파일명, 수정 시각, 크기)
+    reference_files를 주지 않으면 세션의 참조 파일 목록 사용
+    """
+    reference_files = current_reference_files() if reference_files is None else reference_files
+    return tuple(
+        (ref_name, reference_files[ref_name]['modified'], reference_files[ref_name]['size'])
+        for ref_name in selected_references
+        if ref_name in reference_files
+    )
+
+class PromptTemplate:
+    """
+    버전이 지정된 위험성 평가 프롬프트 템플릿
+    static_prefix가 True이면 고정 지시문 + 참조자료 + 답변 형식을 system 메시지(고정 접두부)로,
+    작업 내용은 마지막 user 메시지로 보내 모델 제공자의 프롬프트 캐시가 적중하도록 구성
+    """
+
+    def __init__(self, version: str, static_prefix: bool, request_format: str, max_cached_prefixes: int = 8):
+        self.version = version
+        self.static_prefix = static_prefix
+        self.request_format = request_format
+        self.max_cached_prefixes = max_cached_prefixes
+        self._prefixes = {}
+        self._lock = threading.Lock()
+
+    def prefix(self, selected_references: list) -> str:
+        """
+        참조 파일 구성별로 한 번만 만들어 재사용하는 고정 접두부
+        """
+        key = reference_signature(selected_references)
+        with self._lock:
+            if key in self._prefixes:
+                return self._prefixes[key]
+        prefix = f"{PROMPT_INSTRUCTIONS}\n**참조자료**:\n{build_reference_block(selected_references)}\n{PROMPT_ANSWER_FORMAT}"
+        with self._lock:
+            if len(self._prefixes) >= self.max_cached_prefixes:
+                self._prefixes.pop(next(iter(self._prefixes)))
+            self._prefixes[key] = prefix
+        return prefix
+
+    def build_messages(self, work_description: str, selected_references: list, candidate_items: list = None) -> list:
+        """
+        모델에 보낼 메시지 목록 생성
+        candidate_items: 로컬 매칭으로 찾은 유사 작업 후보 (request_format에 {candidate_items}가 있을 때만 사용)
+        """
+        if self.static_prefix:
+            request = self.request_format.format(
+                work_description=work_description,
+                candidate_items=", ".join(candidate_items) if candidate_items else "없음"
+            )
+            return [
+                {"role": "system", "content": self.prefix(selected_references)},
+                {"role": "user", "content": request},
+            ]
+        # 기존 배치 (작업 내용이 참조자료 앞에 위치하여 프롬프트 캐시가 적중하지 않음)
+        prompt = (
+            f"{PROMPT_INSTRUCTIONS}\n**작업 내용**: {work_description}\n\n"
+            f"**참조자료**:\n{build_reference_block(selected_references)}\n{PROMPT_ANSWER_FORMAT}"
+        )
+        return [{"role": "user", "content": prompt}]
+
+# 프롬프트 템플릿 목록 (버전별)
+PROMPT_TEMPLATES = {
+    "v1": PromptTemplate("v1", static_prefix=False, request_format=""),
+    "v2": PromptTemplate(
+        "v2",
+        static_prefix=True,
+        request_format="**작업 내용**: {work_description}\n\n위 작업에 대해 답변 형식에 맞춰 위험성 평가를 작성해줘."
+    ),
+    "v3": PromptTemplate(
+        "v3",
+        static_prefix=True,
+        request_format=(
+            "**작업 내용**: {work_description}\n\n"
+            "**참조자료의 유사 작업 후보**: {candidate_items}\n\n"
+            "위 작업에 대해 답변 형식에 맞춰 위험성 평가를 작성해줘. "
+            "후보는 참고용이며, 작업 내용과 맞지 않으면 참조자료에서 가장 유사한 작업을 직접 찾아줘."
+        )
+    ),
+}
+DEFAULT_PROMPT_TEMPLATE_VERSION = "v3"
+# 사용할 프롬프트 템플릿 버전
+PROMPT_TEMPLATE_VERSION = os.environ.get("PROMPT_TEMPLATE_VERSION", DEFAULT_PROMPT_TEMPLATE_VERSION)
+
+def summarize_prompt_usage(usage: dict) -> dict:
+    """
+    토큰 사용량에 프롬프트 캐시 적중률(cached_ratio, %) 추가
+    """
+    usage = dict(usage or {})
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    usage["cached_ratio"] = round(usage.get("cached_tokens", 0) / prompt_tokens * 100, 1) if prompt_tokens else None
+    return usage
+
+def analysis_cache_version(template) -> str:
+    """
+    분석 결과 캐시 키에 넣는 프롬프트/후보 선정 방식 버전
+    """
+    return f"{template.version}/{'embedding' if EMBEDDING_RETRIEVAL else 'lexical'}"
+
+def analysis_cache_key(work_description: str, selected_references: list, backend_name: str, model: str, prompt_version: str) -> str:
+    """
+    분석 결과 캐시 키 (작업 설명은 띄어쓰기/조사/동의어를 정규화하여 같은 작업이면 같은 키)
+    참조 파일 버전은 키에 넣지 않고, 캐시된 결과가 의존하는 참조 행이 바뀌었는지 꺼낼 때 확인
+    """
+    key_source = json.dumps([
+        canonical_korean_text(work_description).replace(" ", ""),
+        list(selected_references),
+        backend_name,
+        model,
+        prompt_version,
+    ], ensure_ascii=False)
+    return hashlib.sha1(key_source.encode("utf-8")).hexdigest()
+
+class AnalysisResultCache:
+    """
+    프로세스 내 분석 결과 LRU 캐시 (같은 작업을 다시 요청하면 모델 호출 없이 재사용)
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: str, result: dict) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class SharedAnalysisResultCache:
+    """
+    여러 작업 프로세스가 함께 쓰는 분석 결과 LRU 캐시 (SQLite WAL, 최근 사용 순으로 max_entries 유지)
+    AnalysisResultCache와 같은 get/put 인터페이스
+    """
+
+    def __init__(self, path: str, max_entries: int = 128):
+        self.path = path
+        self.max_entries = max_entries
+        self._execute(lambda conn: conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache (key TEXT PRIMARY KEY, result TEXT NOT NULL, last_used REAL NOT NULL)"
+        ))
+
+    def _execute(self, action):
+        # 스레드/프로세스마다 짧게 연결 (잠금 대기는 timeout까지)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                return action(conn)
+        finally:
+            conn.close()
+
+    def get(self, key: str):
+        def read(conn):
+            row = conn.execute("SELECT result FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE analysis_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+        return self._execute(read)
+
+    def put(self, key: str, result: dict) -> None:
+        def write(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, result, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False, default=str), time.time())
+            )
+            conn.execute(
+                "DELETE FROM analysis_cache WHERE key NOT IN "
+                "(SELECT key FROM analysis_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+        self._execute(write)
+
+@st.cache_resource(show_spinner=False)
+def get_analysis_result_cache():
+    """
+    프로세스 전체에서 공유하는 분석 결과 캐시 (SHARED_STORE_FOLDER가 있으면 작업 프로세스 간 공유)
+    """
+    if SHARED_STORE_FOLDER:
+        os.makedirs(SHARED_STORE_FOLDER, exist_ok=True)
+        return SharedAnalysisResultCache(os.path.join(SHARED_STORE_FOLDER, "analysis_cache.sqlite"), ANALYSIS_CACHE_SIZE)
+    return AnalysisResultCache(ANALYSIS_CACHE_SIZE)
+
+def load_selected_reference_rows(selected_references: list, reference_files: dict = None) -> pd.DataFrame:
+    """
+    선택된 참조 파일들의 정규화된 행을 합쳐서 반환 (reference_files를 주지 않으면 세션의 참조 파일 목록 사용)
+    """
+    reference_files = current_reference_files() if reference_files is None else reference_files
+    frames = [
+        load_reference_rows(reference_files[ref_name]['path'])
+        for ref_name in selected_references
+        if ref_name in reference_files
+    ]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=REFERENCE_ROW_COLUMNS)
+    return to_compact_risk_frame(pd.concat(frames, ignore_index=True))
+
+def route_reference_files(work_description: str, reference_names: list) -> dict:
+    """
+    작업 내용과 관련된 참조 파일만 고르는 분류기 (파일별 검색 색인의 작업 내용 유사도 기준)
+    최고 점수 작업을 담은 파일부터 크기가 작은 순으로 고르고, 이미 고른 파일에 없는
+    유사 작업(최고 점수의 ROUTER_RELATIVE_SCORE 이상)을 담은 파일만 추가
+    분류할 수 없으면(최고 점수 < ROUTER_MIN_SCORE) 주어진 파일을 모두 사용
+    반환: {"selected": 선택된 파일 목록, "scores": 파일별 최고 점수, "routed": 자동 선택 여부}
+    """
+    reference_files = current_reference_files()
+    file_items = {}
+    scores = {}
+    for ref_name in reference_names:
+        if ref_name not in reference_files:
+            continue
+        rows = load_reference_rows(reference_files[ref_name]['path'])
+        if rows.empty:
+            continue
+        index = get_reference_search_index(rows)
+        item_scores = index.work_item_scores(work_description)
+        scores[ref_name] = round(float(item_scores.max()), 3) if len(item_scores) else 0.0
+        file_items[ref_name] = (index.work_items, item_scores)
+
+    top_score = max(scores.values(), default=0.0)
+    if top_score < ROUTER_MIN_SCORE:
+        return {"selected": list(reference_names), "scores": scores, "routed": False}
+
+    threshold = top_score * ROUTER_RELATIVE_SCORE
+    selected = []
+    covered = set()
+    for ref_name in sorted(scores, key=lambda name: (-scores[name], reference_files[name].get('size', 0))):
+        work_items, item_scores = file_items[ref_name]
+        matched = {item for item, score in zip(work_items, item_scores) if score >= threshold}
+        if matched - covered:
+            selected.append(ref_name)
+            covered |= matched
+    # 선택 순서는 사용자가 지정한 순서를 따름 (프롬프트 접두부 재사용)
+    selected = [name for name in reference_names if name in selected]
+    return {"selected": selected, "scores": scores, "routed": True}
+
+class ModelBackend:
+    """
+    모델 백엔드 공통 인터페이스
+    complete()는 Chat Completions 형식의 메시지 목록을 받아
+    {"text", "finish_reason", "model", "usage"} 형태의 결과를 반환
+    """
+    name = ""
+    remote = True          # 원격 호출 여부 (스케줄러/헤지 정책 적용 대상)
+    default_model = ""
+
+    def complete(self, messages: list, model: str = None, max_tokens: int = MODEL_MAX_TOKENS,
+                 timeout: float = None, context: dict = None) -> dict:
+        raise NotImplementedError
+
+    def warm_up(self) -> None:
+        """
+        첫 요청 전에 연결 등을 미리 준비 (기본 동작 없음)
+        """
+
+class OpenAIBackend(ModelBackend):
+    """
+    OpenAI Chat Completions API 백엔드
+    """
+    name = "openai"
+
+    def __init__(self, openai_client: openai.OpenAI, default_model: str = MODEL_NAME):
+        self.client = openai_client
+        self.default_model = default_model
+
+    def warm_up(self) -> None:
+        """
+        가벼운 API 호출로 클라이언트 연결 풀에 TLS 연결을 미리 열어 둠
+        """
+        self.client.models.list(timeout=10)
+
+    def complete(self, messages: list, model: str = None, max_tokens: int = MODEL_MAX_TOKENS,
+                 timeout: float = None, context: dict = None) -> dict:
+        response = self.client.chat.completions.create(
+            model=model or self.default_model,
+            messages=messages,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+        choice = response.choices[0]
+        usage = response.usage
+        prompt_details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "text": choice.message.content or "",
+            "finish_reason": choice.finish_reason,
+            "model": response.model or model or self.default_model,
+            "usage": {
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "completion_tokens": getattr(usage, "completion_tokens", None),
+                "cached_tokens": getattr(prompt_details, "cached_tokens", None) or 0,
+            }
+        }
+
+class OpenAICompatibleBackend(OpenAIBackend):
+    """
+    OpenAI 호환 API를 제공하는 로컬 추론 서버 백엔드 (vLLM, llama.cpp server, Ollama 등)
+    """
+    name = "local"
+
+    def __init__(self, base_url: str, default_model: str = LOCAL_MODEL_NAME, api_key: str = LOCAL_MODEL_API_KEY):
+        super().__init__(create_openai_client(api_key, base_url), default_model)
+
+class TemplateBackend(ModelBackend):
+    """
+    모델 없이 참조자료에서 매칭한 위험요인으로 보고서를 만드는 오프라인 백엔드
+    """
+    name = "template"
+    remote = False
+    default_model = "참조자료 템플릿"
+    # 보고서 머리에 붙는 안내 문구
+    notice = "※ 오프라인 템플릿 백엔드가 참조자료만으로 생성한 결과입니다."
+
+    def complete(self, messages: list, model: str = None, max_tokens: int = MODEL_MAX_TOKENS,
+                 timeout: float = None, context: dict = None) -> dict:
+        context = context or {}
+        text = build_reference_only_report(
+            context.get("work_description", ""),
+            context.get("reference_df", pd.DataFrame(columns=REFERENCE_ROW_COLUMNS)),
+            notice=self.notice
+        )
+        return {"text": text, "finish_reason": "stop", "model": self.default_model, "usage": {}}
+
+class OfflineBackend(TemplateBackend):
+    """
+    모델을 쓸 수 없을 때(백엔드 미설정, 서버 연결 불가) 사용하는 오프라인 평가 백엔드
+    """
+    name = "offline"
+    default_model = "오프라인 참조자료 평가"
+    notice = "※ 📴 오프라인 평가: 모델 서버에 연결할 수 없어 참조자료만으로 작성했습니다. 현장 관리감독자가 내용을 확인하세요."
+
+def offline_assessment_reason(backend) -> str:
+    """
+    모델 대신 오프라인 평가를 해야 하는 사유 (모델을 호출할 수 있으면 빈 문자열)
+    """
+    if OFFLINE_MODE == "off":
+        return ""
+    if OFFLINE_MODE == "on":
+        return "오프라인 모드로 설정됨"
+    if backend is None:
+        return "모델 백엔드가 설정되지 않음 (API 키 또는 서버 주소 확인)"
+    if backend.remote:
+        connectivity = get_model_connectivity(backend.name)
+        if connectivity.offline():
+            return f"모델 서버 연결 실패 ({connectivity.snapshot()['last_error']})"
+    return ""
+
+# 지원하는 모델 백엔드 이름
+MODEL_BACKEND_NAMES = ["openai", "local", "template"]
+
+def create_model_backend(backend_name: str = MODEL_BACKEND) -> ModelBackend:
+    """
+    백엔드 이름에 해당하는 모델 백엔드 생성 (설정이 없어 사용할 수 없으면 None)
+    """
+    if backend_name == "openai":
+        try:
+            return OpenAIBackend(create_openai_client(load_openai_api_key()))
+        except ValueError:
+            return None
+    if backend_name == "local":
+        return OpenAICompatibleBackend(LOCAL_MODEL_BASE_URL) if LOCAL_MODEL_BASE_URL else None
+    if backend_name == "template":
+        return TemplateBackend()
+    return None
+
+def available_model_backends() -> dict:
+    """
+    현재 설정으로 사용 가능한 모델 백엔드 목록
+    """
+    backends = {}
+    for backend_name in MODEL_BACKEND_NAMES:
+        backend = create_model_backend(backend_name)
+        if backend is not None:
+            backends[backend_name] = backend
+    return backends
+
+def hazards_covered(expected_hazards, generated_hazards) -> np.ndarray:
+    """
+    참조 세부 위험요인별 포함 여부 (생성된 세부 위험요인 중 문자 2-gram Dice 유사도가
+    VERIFY_MIN_SIMILARITY 이상인 것이 있으면 표현이 달라도 포함으로 인정)
+    """
+    generated = [_char_bigrams(normalize_korean_text(value)) for value in generated_hazards]
+    found = []
+    for value in expected_hazards:
+        grams = _char_bigrams(normalize_korean_text(value))
+        best = max((2 * len(grams & other) / (len(grams) + len(other)) for other in generated if grams or other), default=0.0)
+        found.append(best >= VERIFY_MIN_SIMILARITY)
+    return np.array(found, dtype=bool)
+
+def hazard_bigram_keys(values) -> pd.DataFrame:
+    """
+    문구별 문자 2-gram을 정수 키로 한 번에 계산 (hazards_covered와 같은 정규화, 문구 번호 순서)
+    문구를 구분 문자(\x1f)로 이어 정규화를 한 번만 하고, 2-gram은 코드 배열에서 같은 문구 안의 인접 문자로 만듦
+    반환: {"id": 문구 번호, "key": 두 문자 코드를 합친 정수} (문구 안에서 중복 없음)
+    """
+    values = [str(value) for value in values]
+    joined = "\x1f".join(values)
+    if joined.count("\x1f") != max(len(values) - 1, 0):
+        joined = "\x1f".join(value.replace("\x1f", "") for value in values)
+    # 가장 많은 공백은 먼저 지워 정규식 일치 횟수를 줄임
+    joined = re.sub(r"[^\w.\x1f]|_", "", unicodedata.normalize("NFKC", joined).lower().replace(" ", ""))
+    chars = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    separators = chars == 0x1f
+    ids = np.cumsum(separators)[~separators]
+    chars = chars[~separators]
+    same = ids[:-1] == ids[1:]
+    ids, keys = ids[:-1][same], (chars[:-1][same] << 21) | chars[1:][same]
+    order = np.lexsort((keys, ids))
+    ids, keys = ids[order], keys[order]
+    unique = np.concatenate([[True], (ids[1:] != ids[:-1]) | (keys[1:] != keys[:-1])]) if len(ids) else np.zeros(0, dtype=bool)
+    return pd.DataFrame({"id": ids[unique], "key": keys[unique]})
+
+def map_table_work_items(names, reference_df: pd.DataFrame) -> dict:
+    """
+    위험성 평가표의 작업 내용 → 대응되는 참조 작업명
+    (이름이 같으면 그대로, 다르면 검색 색인으로 가장 유사한 작업, 유사도가 VERIFY_ITEM_MIN_SCORE 미만이면 제외)
+    """
+    index = get_reference_search_index(reference_df)
+    reference_items = dict(zip(_normalize_match_key(pd.Series(index.work_items, dtype=object)), index.work_items))
+    matched = {}
+    for name in names:
+        item = reference_items.get(re.sub(r"\s+", "", name))
+        if item is None and index.work_items:
+            scores = index.work_item_scores(name)
+            item = index.work_items[int(scores.argmax())] if scores.max() >= VERIFY_ITEM_MIN_SCORE else None
+        if item is not None:
+            matched[name] = item
+    return matched
+
+def verify_risk_table(risk_df: pd.DataFrame, reference_df: pd.DataFrame, candidate_items: list = None) -> dict:
+    """
+    생성된 위험성 평가표가 대응되는 참조 작업의 C2~C4 위험요인을 모두 포함하는지 점검
+    - 표의 작업 내용은 참조 작업명과 같으면 그대로, 다르면 검색 색인으로 가장 유사한 작업에 대응
+      (대응되는 작업이 없으면 분석 시 선정한 첫 번째 유사 작업 후보 사용)
+    - 세부 위험요인은 문자 2-gram Dice 유사도가 VERIFY_MIN_SIMILARITY 이상이면 포함으로 인정
+    반환: {"work_items", "expected", "matched", "coverage"(%, 기대 위험요인이 없으면 None), "missing"(누락된 참조 행)}
+    """
+    summary = {"work_items": [], "expected": 0, "matched": 0, "coverage": None, "missing": reference_df.iloc[0:0]}
+    if reference_df.empty:
+        return summary
+
+    names = risk_df["작업 내용"].astype(str).unique() if not risk_df.empty else []
+    matched = map_table_work_items(names, reference_df)
+    work_items = list(dict.fromkeys(matched[name] for name in names if name in matched))
+    if not work_items and candidate_items:
+        work_items = [candidate_items[0]]
+    summary["work_items"] = work_items
+
+    expected = reference_df[
+        reference_df["작업 내용"].isin(work_items) & reference_df["위험등급-개선전"].isin(["C2", "C3", "C4"])
+    ].drop_duplicates(subset=["작업 내용", "재해유형", "세부 위험요인"])
+    if expected.empty:
+        return summary
+
+    found = hazards_covered(expected["세부 위험요인"], risk_df["세부 위험요인"] if not risk_df.empty else [])
+    summary.update({
+        "expected": len(expected),
+        "matched": int(found.sum()),
+        "coverage": round(float(found.mean()) * 100, 1),
+        "missing": expected[~found],
+    })
+    return summary
+
+def insert_missing_hazards(markdown_text: str, missing: pd.DataFrame) -> str:
+    """
+    누락된 참조 위험요인을 보고서의 위험성 평가표 끝에 추가 (순번은 다시 매김)
+    """
+    if missing.empty:
+        return markdown_text
+    return replace_risk_table(markdown_text, extract_risk_table_rows(markdown_text) + reference_table_rows(missing))
+
+def verify_and_complete_report(markdown_text: str, reference_df: pd.DataFrame, candidate_items: list = None,
+                               auto_insert: bool = VERIFY_AUTO_INSERT) -> tuple:
+    """
+    보고서의 위험성 평가표를 참조자료와 비교하고 (설정 시) 누락된 위험요인을 추가
+    반환: (보고서, 점검 결과 {"work_items", "expected", "matched", "coverage", "missing", "inserted"})
+    coverage는 추가하기 전 모델 답변 기준의 포함률
+    """
+    summary = verify_risk_table(parse_risk_table_from_markdown(markdown_text), reference_df, candidate_items)
+    missing = summary.pop("missing")
+    inserted = 0
+    if auto_insert and not missing.empty:
+        markdown_text = insert_missing_hazards(markdown_text, missing)
+        inserted = len(missing)
+    summary.update({
+        "missing": [f"{row['재해유형']} - {row['세부 위험요인']}" for row in missing.to_dict("records")],
+        "inserted": inserted,
+    })
+    return markdown_text, summary
+
+def compute_reference_coverage(risk_df: pd.DataFrame, reference_df: pd.DataFrame) -> float:
+    """
+    생성된 표에 대응되는 작업의 C2~C4 참조 위험요인이 포함된 비율(%) (대응 작업이 없으면 None)
+    """
+    if risk_df.empty:
+        return None
+    return verify_risk_table(risk_df, reference_df)["coverage"]
+
+def risk_grade_styles(risk_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    위험등급-개선전 컬럼의 등급별 스타일을 컬럼 단위로 한 번에 계산
+    """
+    styles = pd.DataFrame("", index=risk_df.index, columns=risk_df.columns)
+    if "위험등급-개선전" in risk_df.columns:
+        grades = risk_df["위험등급-개선전"].astype(str).str.strip()
+        styles["위험등급-개선전"] = grades.map(RISK_GRADE_STYLES).fillna("")
+    return styles
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_risk_table(assessment_id: str, full_report: str) -> tuple:
+    """
+    분석 결과별 위험성 평가표와 등급 스타일 (결과마다 한 번만 계산)
+    """
+    risk_df = parse_risk_table_from_markdown(full_report)
+    return risk_df, risk_grade_styles(risk_df)
+
+def risk_table_column_config() -> dict:
+    """
+    위험성 평가표 표시용 컬럼 설정
+    """
+    return {
+        "순번": st.column_config.NumberColumn("순번", width="small"),
+        "작업 내용": st.column_config.TextColumn("작업 내용", width="medium"),
+        "작업등급": st.column_config.TextColumn("작업등급", width="small"),
+        "재해유형": st.column_config.TextColumn("재해유형", width="medium"),
+        "세부 위험요인": st.column_config.TextColumn("세부 위험요인", width="large"),
+        "위험등급-개선전": st.column_config.TextColumn("위험등급-개선전", width="small"),
+        "위험성 감소대책": st.column_config.TextColumn("위험성 감소대책", width="large"),
+        "위험등급-개선후": st.column_config.TextColumn("위험등급-개선후", width="small")
+    }
+
+def page_bounds(total_rows: int, key: str, page_size: int = RISK_TABLE_PAGE_SIZE) -> tuple:
+    """
+    행 수가 한 페이지를 넘으면 페이지 선택 입력을 표시하고 (시작, 끝) 행 위치를 반환
+    """
+    if total_rows <= page_size:
+        return 0, total_rows
+    page_count = math.ceil(total_rows / page_size)
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("페이지", min_value=1, max_value=page_count, value=1, step=1, key=f"{key}_page")
+    with col2:
+        st.caption(f"전체 {total_rows:,}행 중 {(page - 1) * page_size + 1:,}~{min(page * page_size, total_rows):,}행 ({page}/{page_count} 페이지)")
+    start = (page - 1) * page_size
+    return start, min(start + page_size, total_rows)
+
+def render_risk_table(risk_df: pd.DataFrame, styles: pd.DataFrame = None, key: str = "risk_table") -> None:
+    """
+    위험성 평가표 표시 (등급 컬러링은 현재 페이지 행에만 적용)
+    """
+    start, end = page_bounds(len(risk_df), key)
+    page_df = risk_df.iloc[start:end]
+    page_styles = (styles if styles is not None else risk_grade_styles(risk_df)).iloc[start:end]
+    st.dataframe(
+        page_df.style.apply(lambda _: page_styles, axis=None),
+        use_container_width=True,
+        hide_index=True,
+        column_config=risk_table_column_config()
+    )
+
+def expected_hazard_rows(reference_df: pd.DataFrame, candidate_items: list) -> pd.DataFrame:
+    """
+    위험성 평가표에 나열되어야 할 참조자료 위험요인 (가장 유사한 작업 기준, 중복 행 제거)
+    """
+    if not candidate_items or reference_df.empty:
+        return reference_df.iloc[0:0]
+    rows = reference_df[reference_df["작업 내용"].astype(str) == candidate_items[0]]
+    return rows.drop_duplicates(subset=["재해유형", "세부 위험요인", "위험성 감소대책"]).reset_index(drop=True)
+
+def with_hazard_subset(messages: list, work_item: str, rows: pd.DataFrame, start: int, total: int, table_only: bool) -> list:
+    """
+    위험요인 일부만 위험성 평가표에 작성하도록 마지막 메시지에 분할 작성 지시 추가
+    (앞부분 메시지는 그대로 두어 고정 접두부 프롬프트 캐시를 재사용)
+    """
+    listing = "\n".join(
+        f"{number}. {_markdown_cell(values['재해유형'])} / {_markdown_cell(values['세부 위험요인'])}"
+        for number, values in enumerate(rows.to_dict("records"), start=start)
+    )
+    if table_only:
+        instruction = (
+            f"**분할 작성 요청**: 참조자료 '{work_item}'의 위험요인 {total}개 중 아래 {len(rows)}개만 위험성 평가표 행으로 작성해줘. "
+            f"순번은 {start}부터 시작하고, 표 머리글과 표 행 외에 다른 내용은 쓰지 마."
+        )
+    else:
+        instruction = (
+            f"**분할 작성 안내**: 위험성 평가표에는 참조자료 '{work_item}'의 위험요인 {total}개 중 아래 {len(rows)}개만 작성해줘. "
+            f"나머지 위험요인은 별도로 작성되어 표 뒤에 이어 붙여지므로, 다른 섹션은 답변 형식대로 모두 작성해줘."
+        )
+    return messages[:-1] + [{**messages[-1], "content": f"{messages[-1]['content']}\n\n{instruction}\n{listing}"}]
+
+def response_table_rows(text: str, truncated: bool = False) -> list:
+    """
+    응답에서 위험성 평가표 행 추출 (길이 제한으로 잘린 응답이면 표 중간에서 끊긴 마지막 행은 제외)
+    """
+    if "위험요인과 감소대책" not in text:
+        text = f"위험요인과 감소대책\n{text}"
+    rows = extract_risk_table_rows(text)
+    if truncated and rows and text.rstrip().splitlines()[-1].lstrip().startswith("|"):
+        rows = rows[:-1]
+    return rows
+
+def dedupe_table_rows(table_rows: list) -> list:
+    """
+    작업 내용/재해유형/세부 위험요인(공백 무시)이 같은 위험성 평가표 행은 처음 것만 남김
+    """
+    seen = set()
+    unique = []
+    for row in table_rows:
+        key = tuple(re.sub(r"\s+", "", str(cell)) for cell in row[1:2] + row[3:5])
+        if key not in seen:
+            seen.add(key)
+            unique.append(row)
+    return unique
+
+def replace_risk_table(markdown_text: str, table_rows: list) -> str:
+    """
+    보고서의 위험성 평가표를 주어진 행으로 교체 (순번은 다시 매김)
+    """
+    table_rows = [[str(number)] + list(row[1:]) for number, row in enumerate(table_rows, start=1)]
+    lines = markdown_text.split("\n")
+    header = next((pos for pos, line in enumerate(lines) if "위험요인과 감소대책" in line), None)
+    if header is None:
+        return "\n".join(lines + ["", "## 오늘 작업에서 예상되는 위험요인과 감소대책은 아래와 같습니다. 확인해주세요.", ""] + risk_table_markdown(table_rows))
+    end = header + 1
+    table_start = None
+    while end < len(lines) and not lines[end].strip().startswith("## "):
+        if lines[end].strip().startswith("|"):
+            table_start = end if table_start is None else table_start
+        elif table_start is not None and lines[end].strip():
+            break
+        end += 1
+    if table_start is None:
+        return "\n".join(lines[:header + 1] + [""] + risk_table_markdown(table_rows) + lines[header + 1:])
+    table_end = table_start
+    while table_end < len(lines) and lines[table_end].strip().startswith("|"):
+        table_end += 1
+    return "\n".join(lines[:table_start] + risk_table_markdown(table_rows) + lines[table_end:])
+
+def generate_risk_report(run_request, messages: list, work_description: str, reference_df: pd.DataFrame, candidate_items: list) -> dict:
+    """
+    위험성 평가 보고서 생성 (응답 길이 한도를 고려한 분할 생성)
+    run_request(messages)는 헤지 정책의 결과({"response", "model", "hedged", "winner", ...})를 반환해야 함
+    - 가장 유사한 작업의 위험요인이 MODEL_CHUNK_ROWS보다 많으면 첫 묶음은 전체 보고서와 함께,
+      나머지 묶음은 표 행만 동시에 요청하여 순서대로 이어 붙임
+    - 응답이 길이 한도로 잘리면(finish_reason == "length") 빠진 위험요인만 다시 나눠 동시에 요청하고,
+      그래도 빠진 위험요인은 참조자료 행으로 채움
+    반환: {"completion": 보고서 요청 결과, "text": 완성된 보고서(응답이 없으면 None), "requests", "chunks", "truncated", "recovered_rows", "usage"}
+    """
+    hazard_rows = expected_hazard_rows(reference_df, candidate_items)
+    work_item = candidate_items[0] if candidate_items else ""
+    chunks = [hazard_rows.iloc[pos:pos + MODEL_CHUNK_ROWS] for pos in range(0, len(hazard_rows), MODEL_CHUNK_ROWS)] \
+        if len(hazard_rows) > MODEL_CHUNK_ROWS else []
+    usage = {}
+    requests = 0
+
+    def add_usage(completion):
+        response = completion["response"]
+        for name in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            if response and response["usage"].get(name) is not None:
+                usage[name] = usage.get(name, 0) + response["usage"][name]
+
+    def run_all(request_list):
+        # 나눈 요청은 동시에 실행 (동시 실행 수/토큰 한도는 스케줄러가 제한)
+        if len(request_list) == 1:
+            return [run_request(request_list[0])]
+        with ThreadPoolExecutor(max_workers=len(request_list), thread_name_prefix="chunk") as executor:
+            return list(executor.map(run_request, request_list))
+
+    def chunk_requests(rows, start):
+        parts = [rows.iloc[pos:pos + MODEL_CHUNK_ROWS] for pos in range(0, len(rows), MODEL_CHUNK_ROWS)]
+        offsets = np.cumsum([start] + [len(part) for part in parts[:-1]])
+        return parts, [with_hazard_subset(messages, work_item, part, int(offset), len(hazard_rows), True) for part, offset in zip(parts, offsets)]
+
+    main_messages = with_hazard_subset(messages, work_item, chunks[0], 1, len(hazard_rows), False) if chunks else messages
+    extra_parts, extra_messages = chunk_requests(hazard_rows.iloc[len(chunks[0]):], len(chunks[0]) + 1) if chunks else ([], [])
+    completions = run_all([main_messages] + extra_messages)
+    requests += len(completions)
+    for completion in completions:
+        add_usage(completion)
+
+    main = completions[0]
+    if main["response"] is None:
+        return {"completion": main, "text": None, "requests": requests, "chunks": len(chunks), "truncated": False, "recovered_rows": 0, "usage": usage}
+
+    text = main["response"]["text"]
+    truncated = main["response"]["finish_reason"] == "length"
+    table_rows = response_table_rows(text, truncated)
+    for part, completion in zip(extra_parts, completions[1:]):
+        response = completion["response"]
+        if response is None:
+            # 묶음 요청이 실패하면 해당 위험요인은 참조자료 행으로 채움
+            table_rows += reference_table_rows(part)
+            continue
+        truncated = truncated or response["finish_reason"] == "length"
+        table_rows += response_table_rows(response["text"], response["finish_reason"] == "length")
+
+    recovered_rows = 0
+    if truncated:
+        if hazard_rows.empty:
+            # 참조 위험요인을 모르면 잘린 지점부터 이어서 작성하도록 한 번 더 요청
+            continuation = run_request(messages + [
+                {"role": "assistant", "content": text},
+                {"role": "user", "content": "답변이 길이 제한으로 끊겼어. 이미 작성한 내용은 반복하지 말고 끊긴 곳부터 답변 형식대로 이어서 작성해줘."}
+            ])
+            requests += 1
+            add_usage(continuation)
+            if continuation["response"] is not None:
+                text = f"{text}\n{continuation['response']['text']}"
+                table_rows = response_table_rows(text)
+        else:
+            # 표에 빠진 위험요인만 다시 나눠 요청 (점검과 같은 유사도 기준이라 표현만 바뀐 행은 빠진 것으로 보지 않음)
+            def written_hazards():
+                return [row[4] for row in table_rows if len(row) > 4]
+
+            table_rows = dedupe_table_rows(table_rows)
+            missing = hazard_rows[~hazards_covered(hazard_rows["세부 위험요인"], written_hazards())]
+            if not missing.empty:
+                written_count = len(table_rows)
+                parts, retry_messages = chunk_requests(missing, len(table_rows) + 1)
+                retries = run_all(retry_messages)
+                requests += len(retries)
+                for part, completion in zip(parts, retries):
+                    add_usage(completion)
+                    response = completion["response"]
+                    table_rows += response_table_rows(response["text"], response["finish_reason"] == "length") if response else []
+                # 다시 요청한 응답이 이미 쓴 행을 반복한 경우를 제거한 뒤 그래도 빠진 위험요인만 참조자료 행으로 채움
+                table_rows = dedupe_table_rows(table_rows)
+                still_missing = missing[~hazards_covered(missing["세부 위험요인"], written_hazards())]
+                table_rows += reference_table_rows(still_missing)
+                recovered_rows = len(table_rows) - written_count
+
+        # 잘린 응답에 빠진 섹션은 참조자료 기반 내용으로 보완
+        sections = parse_analysis_sections(text)
+        reference_sections = parse_analysis_sections(build_reference_only_report(work_description, reference_df))
+        for title, key in (("추가 안전 조치", "additional_safety"), ("작업 전 체크리스트", "safety_checklist")):
+            if not sections[key] and reference_sections[key]:
+                text = f"{text.rstrip()}\n\n## {title}\n{reference_sections[key]}"
+
+    if chunks or truncated:
+        text = replace_risk_table(text, table_rows)
+    return {"completion": main, "text": text, "requests": requests, "chunks": len(chunks),
+            "truncated": truncated, "recovered_rows": recovered_rows, "usage": usage}
+
+def analyze_work_risk(work_description: str, selected_references: list,
+                      user_id: str = "default", on_queue_update=None, backend: ModelBackend = None,
+                      use_cache: bool = True, auto_route: bool = False) -> dict:
+    """
+    작업 내용을 기반으로 위험성 분석을 수행하는 함수
+    (모델 호출은 스케줄러 대기열을 거쳐 실행되며, on_queue_update로 대기 순번을 전달)
+    auto_route: 선택된 참조 파일 중 작업 내용과 관련된 파일만 골라 사용
+    모델을 쓸 수 없으면(OFFLINE_MODE) 이전 분석 결과 캐시를 먼저 찾고, 없으면 참조자료만으로 오프라인 평가
+    """
+    backend = backend or create_model_backend()
+    offline_reason = offline_assessment_reason(backend)
+    if backend is None and not offline_reason:
+        raise Exception("모델 백엔드가 초기화되지 않았습니다.")
+
+    requested_references = list(selected_references)
+    routing = route_reference_files(work_description, selected_references) if auto_route else None
+    if routing is not None:
+        selected_references = routing["selected"]
+
+    template = PROMPT_TEMPLATES.get(PROMPT_TEMPLATE_VERSION, PROMPT_TEMPLATES[DEFAULT_PROMPT_TEMPLATE_VERSION])
+
+    # 같은 작업(정규화 기준)의 이전 결과가 있으면 재사용
+    cache = get_analysis_result_cache() if use_cache and ANALYSIS_CACHE_SIZE > 0 and backend is not None else None
+    cache_key = analysis_cache_key(
+        work_description, selected_references, backend.name, backend.default_model, analysis_cache_version(template)
+    ) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    # 의존하는 참조 행이 바뀐 결과는 사용하지 않음 (새 결과로 덮어씀)
+    if cached is not None and reference_dependencies_valid(cached, current_reference_files()):
+        return {
+            **cached,
+            "assessment_id": uuid.uuid4().hex[:12],
+            "work_description": work_description,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "cached": True
+        }
+
+    # 로컬 매칭으로 유사 작업 후보 선정 (프롬프트에 함께 전달, 설정 시 임베딩 색인 사용)
+    reference_df = load_selected_reference_rows(selected_references)
+    embedding_index = get_embedding_index() if EMBEDDING_RETRIEVAL else None
+    if embedding_index is not None:
+        allowed_items = set(reference_df["작업 내용"].astype(str))
+        candidate_items = [item for item, _ in embedding_index.query(work_description, PROMPT_CANDIDATE_COUNT, allowed_items)]
+        candidate_source = "embedding"
+    else:
+        candidate_items = match_reference_work_items(work_description, reference_df, top_n=PROMPT_CANDIDATE_COUNT)
+        candidate_source = "lexical"
+    context = {"work_description": work_description, "reference_df": reference_df}
+
+    # 오프라인 평가는 모델 호출 없이 참조자료에서 바로 작성 (결과는 캐시하지 않음)
+    if offline_reason:
+        cache = None
+        backend = OfflineBackend()
+
+    # 프롬프트 구성 (고정 지시문 + 참조자료가 앞부분, 작업 내용은 마지막)
+    messages = template.build_messages(work_description, selected_references, candidate_items) if backend.remote else []
+
+    generation = None
+    if backend.remote:
+        # 모델 호출 (스케줄러를 통해 동시 실행 수/토큰 한도 내에서 실행)
+        scheduler = get_model_scheduler(backend.name)
+        hedge_policy = get_hedge_policy()
+        connectivity = get_model_connectivity(backend.name)
+        main_thread = threading.get_ident()
+
+        def run_request(request_messages):
+            def request_completion(model, timeout, on_wait, on_start, cancelled):
+                try:
+                    response = scheduler.run(
+                        lambda: backend.complete(request_messages, model=model, max_tokens=MODEL_MAX_TOKENS, timeout=timeout),
+                        user_id=user_id,
+                        estimated_tokens=sum(estimate_token_count(message["content"]) for message in request_messages) + MODEL_MAX_TOKENS,
+                        on_wait=on_wait,
+                        on_start=on_start,
+                        cancelled=cancelled
+                    )
+                except Exception as e:
+                    # 연결 실패는 기록하여 다음 요청부터 재시도 대기 없이 오프라인 평가
+                    if is_connection_error(e):
+                        connectivity.record_failure(e)
+                    raise
+                connectivity.record_success()
+                return response
+
+            # 응답 지연 시 헤지 요청, 마감 초과 시 보조 모델/참조자료 기반 표로 대체 (대기 순번은 호출 스레드에서만 표시)
+            return hedge_policy.complete(
+                request_completion, backend.default_model, scheduler=scheduler,
+                on_wait=on_queue_update if threading.get_ident() == main_thread else None
+            )
+
+        generation = generate_risk_report(run_request, messages, work_description, reference_df, candidate_items)
+        completion = generation["completion"]
+    else:
+        completion = {
+            "response": backend.complete(messages, context=context),
+            "model": backend.default_model,
+            "hedged": False,
+            "winner": "primary"
+        }
+
+    response = completion["response"]
+    if response is not None:
+        # 모델의 분석 결과를 가져오기 (분할/이어서 생성한 경우 합친 보고서)
+        analysis_result = generation["text"] if generation else response["text"]
+    else:
+        analysis_result = build_reference_only_report(work_description, reference_df)
+
+    # 참조자료 대비 C2~C4 위험요인 누락 점검 (설정 시 누락된 행을 표에 추가)
+    analysis_result, verification = verify_and_complete_report(analysis_result, reference_df, candidate_items)
+    
+    # 결과를 구조화된 형태로 파싱
+    result = {
+        "assessment_id": uuid.uuid4().hex[:12],
+        "work_description": work_description,
+        "full_report": analysis_result,
+        "sections": parse_analysis_sections(analysis_result),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "used_references": selected_references,
+        "backend": backend.name,
+        "model": completion["model"] or "참조자료 기반",
+        "finish_reason": response["finish_reason"] if response else None,
+        "usage": summarize_prompt_usage(generation["usage"] if generation else response["usage"]) if response else {},
+        "prompt_version": template.version,
+        "hedged": completion["hedged"],
+        "fallback": completion["winner"] in ("fallback", "reference"),
+        "fallback_reason": completion.get("error"),
+        "candidate_items": candidate_items,
+        "candidate_source": candidate_source,
+        "generation": {key: generation[key] for key in ("requests", "chunks", "truncated", "recovered_rows")} if generation else {},
+        "verification": verification,
+        "requested_references": requested_references,
+        "routing_scores": routing["scores"] if routing else {},
+        "offline": bool(offline_reason),
+        "offline_reason": offline_reason or None,
+        "cached": False
+    }
+    result["reference_dependencies"] = reference_dependencies(result, current_reference_files())
+    # 대체 결과는 다음 요청에서 모델을 다시 시도하도록 캐시하지 않음
+    if cache is not None and not result["fallback"]:
+        cache.put(cache_key, result)
+    return result
+
+def split_work_description(work_description: str, reference_df: pd.DataFrame) -> list:
+    """
+    여러 작업이 섞인 작업 설명을 작업별 조각으로 나눔
+    (예: "맨홀 케이블 교체 후 철탑 안테나 점검" → ["맨홀 케이블 교체", "철탑 안테나 점검"])
+    참조자료 작업과 충분히 유사하지 않은 조각(WORK_SPLIT_MIN_SCORE 미만)이나 이웃 조각과
+    가장 유사한 작업이 같은 조각은 앞 조각에 붙여 하나의 작업으로 취급
+    """
+    pieces = [piece.strip() for piece in WORK_TASK_SEPARATOR.split(work_description) if piece and piece.strip()]
+    if len(pieces) <= 1 or reference_df.empty:
+        return [work_description.strip()]
+
+    index = get_reference_search_index(reference_df)
+    segments = []  # [조각, 가장 유사한 작업]
+    for piece in pieces:
+        scores = index.work_item_scores(piece)
+        top_item = index.work_items[int(scores.argmax())] if len(scores) and scores.max() >= WORK_SPLIT_MIN_SCORE else None
+        if segments and (top_item is None or top_item == segments[-1][1] or segments[-1][1] is None):
+            segments[-1][0] = f"{segments[-1][0]} {piece}"
+            segments[-1][1] = segments[-1][1] or top_item
+        else:
+            segments.append([piece, top_item])
+
+    # 최대 작업 수를 넘는 조각은 마지막 작업에 붙임
+    if len(segments) > WORK_SPLIT_MAX_TASKS:
+        tail = " ".join(segment[0] for segment in segments[WORK_SPLIT_MAX_TASKS - 1:])
+        segments = segments[:WORK_SPLIT_MAX_TASKS - 1] + [[tail, None]]
+    if len(segments) <= 1:
+        return [work_description.strip()]
+    return [segment[0] for segment in segments]
+
+def _merge_unique_lines(texts: list) -> str:
+    """
+    여러 섹션 본문을 합치면서 같은 내용의 줄(공백/기호 무시)은 한 번만 남김
+    """
+    merged = []
+    seen = set()
+    for text in texts:
+        for line in (text or "").splitlines():
+            key = re.sub(r"\s+", "", re.sub(r"^[\s\-*]*(\[[ xX]?\])?", "", line))
+            if not key:
+                continue
+            if key not in seen:
+                seen.add(key)
+                merged.append(line.rstrip())
+    return "\n".join(merged)
+
+def merge_risk_tables(risk_frames: list) -> pd.DataFrame:
+    """
+    작업별 위험성 평가표를 합치고 공통 위험요인(재해유형 + 세부 위험요인)은 한 번만 남김
+    중복된 위험요인은 개선 전 위험등급이 가장 높은 행을 유지하고 순번을 다시 매김
+    """
+    frames = [frame for frame in risk_frames if frame is not None and not frame.empty]
+    if not frames:
+        return to_compact_risk_frame(pd.DataFrame(columns=RISK_TABLE_COLUMNS))
+    merged = pd.concat(frames, ignore_index=True)
+    for column in RISK_TABLE_COLUMNS:
+        if column not in merged:
+            merged[column] = ""
+    merged = merged[RISK_TABLE_COLUMNS]
+    key = _normalize_match_key(merged["재해유형"]) + "|" + _normalize_match_key(merged["세부 위험요인"])
+    grade_rank = pd.Series(normalize_grade(merged["위험등급-개선전"]).cat.codes, index=merged.index)
+    keep = grade_rank.sort_values(ascending=False, kind="stable").index.to_series().groupby(key).first()
+    merged = merged.loc[sorted(keep)].reset_index(drop=True)
+    merged["순번"] = range(1, len(merged) + 1)
+    return to_compact_risk_frame(merged)
+
+def build_multi_task_report(subtask_results: list) -> str:
+    """
+    작업별 분석 결과를 하나의 보고서(기존 답변 형식)로 합침
+    """
+    lines = ["## 작업 내용 분석"]
+    for number, sub in enumerate(subtask_results, start=1):
+        lines += ["", f"### 작업 {number}: {sub['work_description']}", sub["sections"].get("work_analysis", "")]
+
+    lines += ["", "## 오늘 작업에서 예상되는 위험요인과 감소대책은 아래와 같습니다. 확인해주세요.", ""]
+    merged = merge_risk_tables([parse_risk_table_from_markdown(sub["full_report"]) for sub in subtask_results])
+    lines.append("| " + " | ".join(RISK_TABLE_COLUMNS) + " |")
+    lines.append("|" + "|".join("---" for _ in RISK_TABLE_COLUMNS) + "|")
+    for values in merged.itertuples(index=False):
+        lines.append("| " + " | ".join(_markdown_cell(value) for value in values) + " |")
+
+    lines += ["", "## 추가 안전 조치", _merge_unique_lines([sub["sections"].get("additional_safety") for sub in subtask_results])]
+    lines += ["", "## 작업 전 체크리스트", _merge_unique_lines([sub["sections"].get("safety_checklist") for sub in subtask_results])]
+    return "\n".join(lines)
+
+def merge_verifications(verifications: list) -> dict:
+    """
+    작업별 누락 점검 결과 합계
+    """
+    expected = sum(item.get("expected", 0) for item in verifications)
+    matched = sum(item.get("matched", 0) for item in verifications)
+    return {
+        "work_items": list(dict.fromkeys(name for item in verifications for name in item.get("work_items", []))),
+        "expected": expected,
+        "matched": matched,
+        "coverage": round(matched / expected * 100, 1) if expected else None,
+        "missing": [hazard for item in verifications for hazard in item.get("missing", [])],
+        "inserted": sum(item.get("inserted", 0) for item in verifications),
+    }
+
+def analyze_multi_task_work_risk(work_description: str, selected_references: list,
+                                 user_id: str = "default", on_queue_update=None, backend: ModelBackend = None,
+                                 use_cache: bool = True, auto_route: bool = False) -> dict:
+    """
+    여러 작업이 섞인 작업 설명을 작업별로 나눠 동시에 분석하고 결과를 하나로 합침
+    (작업이 하나면 analyze_work_risk와 동일)
+    작업마다 유사 작업 후보/참조 파일을 따로 고르므로 한 번의 긴 응답 대신 짧은 응답 여러 개로 처리됨
+    """
+    subtasks = split_work_description(work_description, load_selected_reference_rows(selected_references))
+    if len(subtasks) <= 1:
+        return analyze_work_risk(work_description, selected_references, user_id=user_id, on_queue_update=on_queue_update,
+                                 backend=backend, use_cache=use_cache, auto_route=auto_route)
+
+    # 작업 스레드에서도 같은 참조 파일 목록을 읽을 수 있도록 실행 컨텍스트와 목록 전달
+    script_ctx = get_script_run_ctx()
+    reference_files = current_reference_files()
+
+    def init_subtask_thread():
+        add_script_run_ctx(threading.current_thread(), script_ctx)
+        _job_context.reference_files = reference_files
+
+    with ThreadPoolExecutor(
+        max_workers=len(subtasks),
+        thread_name_prefix="subtask",
+        initializer=init_subtask_thread
+    ) as executor:
+        futures = [
+            executor.submit(
+                analyze_work_risk, subtask, selected_references, user_id=user_id, on_queue_update=on_queue_update,
+                backend=backend, use_cache=use_cache, auto_route=auto_route
+            )
+            for subtask in subtasks
+        ]
+        subtask_results = [future.result() for future in futures]
+
+    analysis_result = build_multi_task_report(subtask_results)
+    usage = {}
+    for sub in subtask_results:
+        for name in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            if (sub.get("usage") or {}).get(name) is not None:
+                usage[name] = usage.get(name, 0) + sub["usage"][name]
+    fallback_reasons = [sub["fallback_reason"] for sub in subtask_results if sub.get("fallback_reason")]
+    return {
+        "assessment_id": uuid.uuid4().hex[:12],
+        "work_description": work_description,
+        "full_report": analysis_result,
+        "sections": parse_analysis_sections(analysis_result),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "used_references": list(dict.fromkeys(ref for sub in subtask_results for ref in sub["used_references"])),
+        "backend": subtask_results[0]["backend"],
+        "model": ", ".join(dict.fromkeys(sub["model"] for sub in subtask_results)),
+        "finish_reason": next((sub["finish_reason"] for sub in subtask_results if sub.get("finish_reason") not in (None, "stop")),
+                              subtask_results[0].get("finish_reason")),
+        "usage": summarize_prompt_usage(usage) if usage else {},
+        "prompt_version": subtask_results[0]["prompt_version"],
+        "hedged": any(sub.get("hedged") for sub in subtask_results),
+        "fallback": any(sub.get("fallback") for sub in subtask_results),
+        "fallback_reason": "; ".join(fallback_reasons) or None,
+        "candidate_items": list(dict.fromkeys(item for sub in subtask_results for item in sub.get("candidate_items", []))),
+        "candidate_source": subtask_results[0].get("candidate_source"),
+        "requested_references": list(selected_references),
+        "routing_scores": {},
+        "verification": merge_verifications([sub.get("verification") or {} for sub in subtask_results]),
+        "offline": any(sub.get("offline") for sub in subtask_results),
+        "offline_reason": next((sub["offline_reason"] for sub in subtask_results if sub.get("offline_reason")), None),
+        "reference_dependencies": merge_reference_dependencies([sub.get("reference_dependencies") or {} for sub in subtask_results]),
+        "subtasks": [
+            {
+                "work_description": sub["work_description"],
+                "used_references": sub["used_references"],
+                "candidate_items": sub.get("candidate_items", []),
+                "risk_rows": len(extract_risk_table_rows(sub["full_report"])),
+                "cached": sub.get("cached", False),
+            }
+            for sub in subtask_results
+        ],
+        "cached": all(sub.get("cached") for sub in subtask_results)
+    }
+
+class AnalysisJobManager:
+    """
+    분석을 백그라운드 작업으로 실행하고 결과를 작업 ID별로 보관하는 작업 표
+    화면 재실행이나 연결 끊김과 무관하게 끝까지 실행되고, 화면은 작업 ID로 상태를 조회(폴링)하여 다시 연결
+    같은 사용자가 같은 조건으로 실행 중인 작업이 있으면 새로 만들지 않고 그 작업 ID를 반환
+    """
+
+    def __init__(self, max_workers: int = 8, retention: float = 3600):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, analyze, work_description: str, selected_references: list, reference_files: dict,
+               user_id: str = "default", backend: ModelBackend = None, **options) -> str:
+        """
+        분석 작업을 등록하고 작업 ID를 반환 (analyze: analyze_work_risk 또는 analyze_multi_task_work_risk)
+        """
+        job_key = json.dumps(
+            [user_id, work_description, list(selected_references), analyze.__name__, options],
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        with self._lock:
+            self._prune()
+            for job in self._jobs.values():
+                if job["key"] == job_key and job["status"] in ("queued", "running"):
+                    return job["id"]
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "key": job_key,
+                "user_id": user_id,
+                "work_description": work_description,
+                "status": "queued",
+                "queue_position": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "history_error": None,
+            }
+            self._jobs[job["id"]] = job
+        self._executor.submit(
+            self._run, job, analyze, work_description, list(selected_references), reference_files, user_id, backend, options
+        )
+        return job["id"]
+
+    def _run(self, job, analyze, work_description, selected_references, reference_files, user_id, backend, options) -> None:
+        _job_context.reference_files = reference_files
+        self._update(job, status="running", started_at=time.time())
+        try:
+            result = analyze(
+                work_description, selected_references, user_id=user_id, backend=backend,
+                on_queue_update=lambda position: self._update(job, queue_position=position), **options
+            )
+            # 화면이 닫혀도 결과가 남도록 이력 저장까지 작업에서 수행
+            history_error = None
+            try:
+                save_assessment_to_history(result, parse_risk_table_from_markdown(result['full_report']))
+            except Exception as e:
+                history_error = str(e)
+            self._update(job, status="done", result=result, history_error=history_error, queue_position=None)
+        except Exception as e:
+            self._update(job, status="failed", error=e, queue_position=None)
+        finally:
+            self._update(job, finished_at=time.time())
+            _job_context.reference_files = None
+
+    def _update(self, job: dict, **changes) -> None:
+        with self._lock:
+            job.update(changes)
+
+    def _prune(self) -> None:
+        # 보관 시간이 지난 끝난 작업 삭제 (잠금을 잡은 상태에서 호출)
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.retention
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def status(self, job_id: str):
+        """
+        작업 상태 사본 (없거나 보관 시간이 지나 삭제되었으면 None)
+        status: queued(실행 대기) / running / done / failed
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(job["status"] in ("queued", "running") for job in self._jobs.values())
+
+@st.cache_resource(show_spinner=False)
+def get_analysis_job_manager() -> AnalysisJobManager:
+    """
+    프로세스 전체에서 공유하는 분석 작업 표
+    """
+    return AnalysisJobManager(ANALYSIS_JOB_WORKERS, ANALYSIS_JOB_RETENTION)
+
+def benchmark_model_backends(work_descriptions: list, selected_references: list, backends: dict) -> pd.DataFrame:
+    """
+    동일한 분석 파이프라인으로 백엔드별 응답시간과 결과 품질(위험요인 수, C2~C4 포함률) 비교
+    """
+    reference_df = load_selected_reference_rows(selected_references)
+    records = []
+    for backend_name, backend in backends.items():
+        for work_description in work_descriptions:
+            record = {"백엔드": backend_name, "작업 내용": work_description}
+            start = time.perf_counter()
+            try:
+                result = analyze_work_risk(work_description, selected_references, user_id="benchmark", backend=backend, use_cache=False)
+                risk_df = parse_risk_table_from_markdown(result['full_report'])
+                record.update({
+                    "응답시간(초)": round(time.perf_counter() - start, 2),
+                    "위험요인 수": len(risk_df),
+                    "C2~C4 포함률(%)": (result.get("verification") or {}).get("coverage", compute_reference_coverage(risk_df, reference_df)),
+                    "종료 사유": result.get("finish_reason") or "",
+                    "대체 여부": result.get("fallback", False),
+                    "오류": ""
+                })
+            except Exception as e:
+                record.update({"응답시간(초)": round(time.perf_counter() - start, 2), "오류": str(e)})
+            records.append(record)
+    return pd.DataFrame(records)
+
+def write_assessments_workbook(results, output, include_assessment_columns: bool = False) -> int:
+    """
+    분석 결과들을 하나의 엑셀 통합문서로 작성하고 작성한 분석 건수를 반환
+    - 시트: 위험성평가표(등급 조건부 서식) / 작업분석 / 추가안전조치 / 작업전체크리스트
+    - constant_memory 모드로 행을 순서대로 기록하므로 분석 건수와 관계없이 메모리 사용량이 일정함
+    - results는 리스트 또는 제너레이터 모두 가능 (한 번만 순회)
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True, 'bg_color': '#d9e1f2', 'border': 1, 'text_wrap': True, 'valign': 'vcenter'})
+    text_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+    title_format = workbook.add_format({'bold': True, 'bg_color': '#f2f2f2'})
+
+    prefix_columns = ["평가 ID", "작업 설명", "생성 시간"] if include_assessment_columns else []
+    risk_columns = prefix_columns + RISK_TABLE_COLUMNS
+    risk_widths = [14, 30, 18][:len(prefix_columns)] + [6, 24, 8, 14, 44, 10, 44, 10]
+
+    # 위험성 평가표 시트
+    risk_sheet = workbook.add_worksheet("위험성평가표")
+    for col, (name, width) in enumerate(zip(risk_columns, risk_widths)):
+        risk_sheet.set_column(col, col, width, text_format)
+        risk_sheet.write(0, col, name, header_format)
+    risk_sheet.freeze_panes(1, 0)
+
+    # 섹션 시트 (작업 설명/생성 시간 제목 행 + 본문 한 줄씩)
+    section_sheets = {}
+    for section_key, sheet_name in EXCEL_SECTION_SHEETS:
+        sheet = workbook.add_worksheet(sheet_name)
+        sheet.set_column(0, 0, 100, text_format)
+        section_sheets[section_key] = sheet
+    section_rows = {section_key: 0 for section_key, _ in EXCEL_SECTION_SHEETS}
+
+    grade_positions = [RISK_TABLE_COLUMNS.index(column) for column in GRADE_COLUMNS]
+    risk_row = 1
+    assessment_count = 0
+    for result in results:
+        assessment_count += 1
+        prefix_values = [result.get('assessment_id', ''), result.get('work_description', ''), result.get('timestamp', '')]
+        for row in extract_risk_table_rows(result.get('full_report', '')):
+            row = row + [''] * (len(RISK_TABLE_COLUMNS) - len(row))
+            row[0] = int(row[0])
+            for grade_col in grade_positions:
+                row[grade_col] = normalize_grade_label(row[grade_col]) or row[grade_col]
+            risk_sheet.write_row(risk_row, 0, prefix_values[:len(prefix_columns)] + row)
+            risk_row += 1
+
+        sections = result.get('sections') or parse_analysis_sections(result.get('full_report', ''))
+        for section_key, sheet in section_sheets.items():
+            row = section_rows[section_key]
+            sheet.write(row, 0, f"[{result.get('timestamp', '')}] {result.get('work_description', '')}", title_format)
+            row += 1
+            for line in (sections.get(section_key) or "").splitlines():
+                if line.strip():
+                    sheet.write(row, 0, line)
+                    row += 1
+            section_rows[section_key] = row + 1
+
+    # 행 기록이 끝난 뒤 전체 범위에 등급 조건부 서식/필터 적용
+    if risk_row > 1:
+        grade_col = risk_columns.index("위험등급-개선전")
+        for grade, grade_format in EXCEL_GRADE_FORMATS.items():
+            risk_sheet.conditional_format(1, grade_col, risk_row - 1, grade_col, {
+                'type': 'cell',
+                'criteria': 'equal to',
+                'value': f'"{grade}"',
+                'format': workbook.add_format(grade_format)
+            })
+        risk_sheet.autofilter(0, 0, risk_row - 1, len(risk_columns) - 1)
+
+    workbook.close()
+    return assessment_count
+
+def build_excel_file(results, include_assessment_columns: bool = False) -> tempfile.SpooledTemporaryFile:
+    """
+    분석 결과들의 엑셀 파일을 임시 파일로 작성하여 처음 위치로 되돌린 파일 객체를 반환
+    (작은 파일은 메모리, 큰 파일은 디스크에 보관)
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    write_assessments_workbook(results, output, include_assessment_columns)
+    output.seek(0)
+    return output
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_excel_report(result: dict) -> bytes:
+    """
+    단일 분석 결과의 엑셀 보고서 (분석 결과별로 한 번만 생성)
+    """
+    with build_excel_file([result]) as output:
+        return output.read()
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_report_template(file_path: str, sheet_name: str, modified: float) -> dict:
+    """
+    참조 양식 시트를 보고서 템플릿으로 변환 (파일별로 한 번만 파싱)
+    헤더 행과 첫 데이터 행(서식 원본)만 남긴 작은 통합문서를 bytes로 보관하여
+    내보낼 때마다 1MB 원본 대신 이 템플릿만 다시 여는 방식
+    """
+    workbook = openpyxl.load_workbook(file_path)
+    worksheet = workbook[sheet_name] if sheet_name in workbook.sheetnames else workbook.worksheets[0]
+    for other in list(workbook.worksheets):
+        if other is not worksheet:
+            workbook.remove(other)
+
+    header_row = None
+    for row in range(1, min(worksheet.max_row, 10) + 1):
+        if any("세부 위험요인" in str(cell.value) for cell in worksheet[row]):
+            header_row = row
+            break
+    if header_row is None:
+        raise ValueError(f"'{os.path.basename(file_path)}'에서 위험성평가 양식 헤더를 찾을 수 없습니다.")
+
+    header_values = [cell.value for cell in worksheet[header_row]]
+    # 첫 데이터 행은 서식 원본으로 남기고 나머지 데이터 행 삭제
+    prototype_row = header_row + 1
+    if worksheet.max_row > prototype_row:
+        worksheet.delete_rows(prototype_row + 1, worksheet.max_row - prototype_row)
+    # delete_rows는 행 높이 정보를 남기므로 함께 제거 (시트 복사/저장 비용의 대부분)
+    for row in [row for row in worksheet.row_dimensions if row > prototype_row]:
+        del worksheet.row_dimensions[row]
+    # 원본의 틀 고정/필터 범위는 데이터 행이 바뀌므로 헤더 기준으로 다시 지정
+    worksheet.freeze_panes = worksheet.cell(prototype_row, 1).coordinate
+    worksheet.auto_filter.ref = None
+
+    template = io.BytesIO()
+    workbook.save(template)
+    return {
+        "bytes": template.getvalue(),
+        "sheet_title": worksheet.title,
+        "header_row": header_row,
+        "prototype_row": prototype_row,
+        "columns": reference_header_mapping(header_values),
+        "column_count": len(header_values),
+    }
+
+def select_report_template(result: dict) -> tuple:
+    """
+    분석 결과와 가장 잘 맞는 참조 양식 (파일 경로, 시트명) 선택
+    생성된 작업 내용이 가장 많이 들어 있는 참조 파일의 시트를 사용하고, 없으면 기본 참조 파일 사용
+    """
+    item_keys = set(_normalize_match_key(pd.Series([row[1] for row in extract_risk_table_rows(result.get('full_report', '')) if len(row) > 1], dtype=str)))
+    candidates = [
+        os.path.join(REFERENCE_FILES_FOLDER, ref_name)
+        for ref_name in result.get('used_references', [])
+        if ref_name.lower().endswith('.xlsx')
+    ] + [os.path.join(REFERENCE_FILES_FOLDER, DEFAULT_REFERENCE_FILE)]
+
+    best = None
+    for file_path in candidates:
+        if not os.path.exists(file_path):
+            continue
+        rows = load_reference_rows(file_path)
+        if rows.empty:
+            continue
+        if best is None:
+            best = (0, file_path, str(rows["시트"].iloc[0]))
+        matches = rows[_normalize_match_key(rows["작업 내용"]).isin(item_keys)]
+        if not matches.empty:
+            sheet_counts = matches["시트"].astype(str).value_counts()
+            if sheet_counts.iloc[0] > best[0]:
+                best = (int(sheet_counts.iloc[0]), file_path, sheet_counts.index[0])
+    if best is None:
+        raise ValueError("보고서 템플릿으로 사용할 참조 양식 파일이 없습니다.")
+    return best[1], best[2]
+
+def write_template_workbook(results, output, file_path: str, sheet_name: str, start: int = 0) -> int:
+    """
+    참조 양식(헤더, 병합 셀, 서식 유지)의 복사본에 생성된 위험요인 행을 채워 저장하고 작성한 분석 건수를 반환
+    분석 결과마다 양식 시트를 복사하여 한 통합문서에 여러 건을 담음 (통합문서 전체가 메모리에 있으므로
+    건수가 많으면 write_template_bundle 사용, start는 시트 이름 번호의 시작 위치)
+    """
+    template = load_report_template(file_path, sheet_name, os.path.getmtime(file_path))
+    workbook = openpyxl.load_workbook(io.BytesIO(template["bytes"]))
+    prototype_sheet = workbook[template["sheet_title"]]
+    prototype_row = template["prototype_row"]
+    prototype_styles = [
+        prototype_sheet.cell(prototype_row, col)._style
+        for col in range(1, template["column_count"] + 1)
+    ]
+    prototype_height = prototype_sheet.row_dimensions[prototype_row].height
+    positions = {name: pos for pos, name in template["columns"].items()}
+
+    # 작업 내용 → 구분/대분류/중분류 (참조자료 기준)
+    reference_rows = load_reference_rows(file_path)
+    reference_rows = reference_rows[reference_rows["시트"].astype(str) == sheet_name]
+    work_info = pd.DataFrame({
+        "작업키": _normalize_match_key(reference_rows["작업 내용"]),
+        "구분": reference_rows["구분"].astype(str),
+        "대분류": reference_rows["대분류"].astype(str),
+        "중분류": reference_rows["중분류"].astype(str),
+    }).drop_duplicates("작업키").set_index("작업키").to_dict("index")
+
+    assessment_count = 0
+    for result in results:
+        assessment_count += 1
+        worksheet = workbook.copy_worksheet(prototype_sheet)
+        worksheet.title = f"{start + assessment_count}_{str(result.get('timestamp', ''))[:10]}"[:31]
+        worksheet.freeze_panes = prototype_sheet.freeze_panes
+
+        row_index = prototype_row
+        for row in extract_risk_table_rows(result.get('full_report', '')):
+            row = dict(zip(RISK_TABLE_COLUMNS, row + [''] * (len(RISK_TABLE_COLUMNS) - len(row))))
+            info = work_info.get(re.sub(r"\s+", "", row["작업 내용"]), {})
+            work_grade = normalize_grade_label(row["작업등급"]) or row["작업등급"]
+            values = {
+                "No": int(row["순번"]),
+                "구분": info.get("구분", ""),
+                "대분류": info.get("대분류", ""),
+                "중분류": info.get("중분류", ""),
+                "작업 내용": row["작업 내용"],
+                "작업등급": "S등급" if work_grade == "S" else work_grade,
+                "재해유형": row["재해유형"],
+                "세부 위험요인": row["세부 위험요인"],
+                "위험등급-개선전": normalize_grade_label(row["위험등급-개선전"]) or row["위험등급-개선전"],
+                "위험성 감소대책": row["위험성 감소대책"],
+                "위험등급-개선후": normalize_grade_label(row["위험등급-개선후"]) or row["위험등급-개선후"],
+            }
+            for col in range(1, template["column_count"] + 1):
+                cell = worksheet.cell(row_index, col)
+                cell._style = prototype_styles[col - 1]
+                name = template["columns"].get(col - 1)
+                cell.value = values.get(name, "") if name else None
+            worksheet.row_dimensions[row_index].height = prototype_height
+            row_index += 1
+
+        # 생성된 행이 없으면 서식 원본 행의 참조 데이터 제거
+        if row_index == prototype_row:
+            for col in range(1, template["column_count"] + 1):
+                worksheet.cell(prototype_row, col).value = None
+        if positions:
+            worksheet.auto_filter.ref = f"A{template['header_row']}:{openpyxl.utils.get_column_letter(template['column_count'])}{max(row_index - 1, prototype_row)}"
+
+    workbook.remove(prototype_sheet)
+    if not workbook.worksheets:
+        raise ValueError("양식에 채울 분석 결과가 없습니다.")
+    workbook.save(output)
+    return assessment_count
+
+def write_template_bundle(results, output, file_path: str, sheet_name: str,
+                          max_sheets: int = TEMPLATE_WORKBOOK_MAX_SHEETS) -> tuple:
+    """
+    분석 결과들을 SKONS 양식에 채워 output에 기록하고 (작성한 분석 건수, ZIP 여부)를 반환
+    - max_sheets건 이하: 통합문서 하나 (.xlsx)
+    - 초과: max_sheets건씩 나눈 통합문서들을 ZIP으로 묶음 (메모리에는 통합문서 하나만 유지)
+    """
+    results = iter(results)
+    batch = list(itertools.islice(results, max_sheets))
+    following = next(results, None)
+    if following is None:
+        return write_template_workbook(batch, output, file_path, sheet_name), False
+
+    assessment_count = 0
+    part = 0
+    results = itertools.chain([following], results)
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        while batch:
+            part += 1
+            with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as workbook_file:
+                assessment_count += write_template_workbook(batch, workbook_file, file_path, sheet_name, start=assessment_count)
+                workbook_file.seek(0)
+                with zip_file.open(f"{stem}_{part:03d}.xlsx", 'w') as entry:
+                    shutil.copyfileobj(workbook_file, entry)
+            batch = list(itertools.islice(results, max_sheets))
+    return assessment_count, True
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_template_report(result: dict) -> tuple:
+    """
+    단일 분석 결과를 가장 잘 맞는 SKONS 양식에 채운 엑셀 파일 (bytes, 양식 파일명)
+    """
+    file_path, sheet_name = select_report_template(result)
+    output = io.BytesIO()
+    write_template_workbook([result], output, file_path, sheet_name)
+    return output.getvalue(), os.path.basename(file_path)
+
+def iter_history_assessments(start_date: str = None, end_date: str = None):
+    """
+    이력 파일에서 분석 결과를 한 건씩 읽음 (YYYY-MM-DD 기간 필터, 전체를 메모리에 올리지 않음)
+    """
+    if not os.path.exists(ASSESSMENT_HISTORY_FILE):
+        return
+    with open(ASSESSMENT_HISTORY_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            day = str(result.get('timestamp', ''))[:10]
+            if (start_date and day < start_date) or (end_date and day > end_date):
+                continue
+            yield result
+
+def grade_code(value) -> int:
+    """
+    등급 코드 (RISK_GRADES 순서 + 1, 등급이 아니면 0)
+    """
+    value = str(value).strip()
+    return RISK_GRADES.index(value) + 1 if value in RISK_GRADES else 0
+
+def _compact_key(*values) -> str:
+    # 표 셀 기준 비교 키 (마크다운 셀 변환 후 공백 제거)
+    return "|".join(re.sub(r"\s+", "", _markdown_cell(value)) for value in values)
+
+def reference_table_etag(file_path: str) -> str:
+    """
+    참조 행 표의 ETag (형식 버전, 파일명, 수정 시각, 크기 기준)
+    """
+    stat = os.stat(file_path)
+    key_source = json.dumps([COMPACT_FORMAT_VERSION, os.path.basename(file_path), stat.st_mtime, stat.st_size])
+    return hashlib.sha1(key_source.encode("utf-8")).hexdigest()[:16]
+
+def compact_reference_table(file_path: str) -> dict:
+    """
+    모바일 클라이언트가 ETag로 캐시해 두는 참조 파일 행 표
+    반복되는 문자열은 strings에 한 번만 넣고, 행은 문자열 번호와 등급 코드로 표현
+    rows 항목: [행 ID (reference_row_versions의 row_id, 다른 행을 고쳐도 바뀌지 않음),
+               작업 내용, 재해유형, 세부 위험요인, 위험성 감소대책 (strings 번호), 작업등급, 위험등급-개선전, 위험등급-개선후 (등급 코드)]
+    """
+    strings = {}
+
+    def string_id(value) -> int:
+        return strings.setdefault(_markdown_cell(value), len(strings))
+
+    row_ids = reference_row_versions(file_path)["row_id"]
+    rows = [
+        [row_id, string_id(row["작업 내용"]), string_id(row["재해유형"]), string_id(row["세부 위험요인"]), string_id(row["위험성 감소대책"]),
+         grade_code(row["작업등급"]), grade_code(row["위험등급-개선전"]), grade_code(row["위험등급-개선후"])]
+        for row_id, row in zip(row_ids, load_reference_rows(file_path).to_dict("records"))
+    ]
+    return {
+        "v": COMPACT_FORMAT_VERSION,
+        "file": os.path.basename(file_path),
+        "etag": reference_table_etag(file_path),
+        "grades": RISK_GRADES,
+        "strings": list(strings),
+        "rows": rows,
+    }
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _compact_reference_table_cached(file_path: str, modified: float) -> dict:
+    return compact_reference_table(file_path)
+
+def load_compact_reference_table(file_path: str) -> dict:
+    """
+    참조 행 표 (파일 수정 시각 기준 캐시, 반환값은 수정하지 말 것)
+    """
+    return _compact_reference_table_cached(file_path, os.path.getmtime(file_path))
+
+def compact_assessment(result: dict, reference_files: dict) -> dict:
+    """
+    분석 결과의 간편 응답 (반복되는 참조 텍스트 대신 참조 행 번호와 등급 코드)
+    refs: [[참조 파일명, ETag]] (클라이언트는 ETag가 같으면 캐시한 참조 행 표 사용)
+    rows 항목: 참조 행과 같으면 [refs 번호, 행 ID, 위험등급-개선전, 위험등급-개선후],
+              다르면 [작업 내용, 작업등급, 재해유형, 세부 위험요인, 위험등급-개선전, 위험성 감소대책, 위험등급-개선후] (등급은 코드)
+    """
+    refs = []
+    lookup = {}
+    for ref_name in result.get('used_references', []):
+        file_info = reference_files.get(ref_name)
+        if not file_info or not os.path.exists(file_info['path']):
+            continue
+        refs.append([ref_name, reference_table_etag(file_info['path'])])
+        rows = load_reference_rows(file_info['path'])
+        row_ids = reference_row_versions(file_info['path'])["row_id"]
+        for row_id, key in zip(row_ids, map(_compact_key, rows["작업 내용"], rows["세부 위험요인"], rows["위험성 감소대책"])):
+            lookup.setdefault(key, (len(refs) - 1, row_id))
+
+    compact_rows = []
+    for row in extract_risk_table_rows(result.get('full_report', '')):
+        cells = (list(row) + [""] * len(RISK_TABLE_COLUMNS))[:len(RISK_TABLE_COLUMNS)]
+        match = lookup.get(_compact_key(cells[1], cells[4], cells[6]))
+        if match is not None:
+            compact_rows.append([*match, grade_code(cells[5]), grade_code(cells[7])])
+        else:
+            compact_rows.append([cells[1], grade_code(cells[2]), cells[3], cells[4], grade_code(cells[5]), cells[6], grade_code(cells[7])])
+
+    sections = result.get('sections') or parse_analysis_sections(result.get('full_report', ''))
+    return {
+        "v": COMPACT_FORMAT_VERSION,
+        "id": result.get('assessment_id'),
+        "ts": result.get('timestamp'),
+        "work": result.get('work_description'),
+        "model": result.get('model'),
+        "flags": [flag for flag in ("offline", "fallback", "cached") if result.get(flag)],
+        "refs": refs,
+        "rows": compact_rows,
+        "analysis": sections.get("work_analysis", ""),
+        "safety": sections.get("additional_safety", ""),
+        "checklist": sections.get("safety_checklist", ""),
+    }
+
+def compact_payload_bytes(payload: dict) -> bytes:
+    """
+    간편 응답 직렬화 (공백 없는 UTF-8 JSON, 전송 시 gzip 압축)
+    """
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def grade_label(code: int) -> str:
+    """
+    등급 코드를 등급 표기로 변환 (grade_code의 역변환, 0이면 빈 문자열)
+    """
+    return RISK_GRADES[code - 1] if 0 < code <= len(RISK_GRADES) else ""
+
+def expand_compact_rows(compact: dict, reference_tables: dict) -> list:
+    """
+    간편 응답의 rows를 위험성 평가표 행(RISK_TABLE_COLUMNS 순서의 문자열 목록)으로 복원 (클라이언트와 같은 방식)
+    reference_tables: {참조 파일명: compact_reference_table 결과} - 표가 없는 참조 행은 건너뜀
+    """
+    lookups = []
+    for ref_name, _ in compact.get("refs", []):
+        table = reference_tables.get(ref_name) or {"strings": [], "rows": []}
+        lookups.append((table["strings"], {row[0]: row for row in table["rows"]}))
+
+    table_rows = []
+    for row in compact.get("rows", []):
+        if len(row) == 4:
+            ref_index, row_id, before, after = row
+            strings, by_id = lookups[ref_index] if ref_index < len(lookups) else ([], {})
+            reference = by_id.get(row_id)
+            if reference is None:
+                continue
+            work, hazard_type, hazard, measure = (strings[pos] for pos in reference[1:5])
+            cells = [work, grade_label(reference[5]), hazard_type, hazard, grade_label(before), measure, grade_label(after)]
+        else:
+            work, job_grade, hazard_type, hazard, before, measure, after = row
+            cells = [work, grade_label(job_grade), hazard_type, hazard, grade_label(before), measure, grade_label(after)]
+        table_rows.append([str(len(table_rows) + 1)] + cells)
+    return table_rows
+
+class AssessmentHistoryIndex:
+    """
+    분석 ID → 이력 파일 내 위치 색인
+    (마지막으로 읽은 위치 이후에 추가된 줄만 읽어 색인에 더하고, 결과는 해당 위치의 한 줄만 읽음)
+    """
+
+    def __init__(self, history_path: str):
+        self.history_path = history_path
+        self._offset = 0
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        if not os.path.exists(self.history_path):
+            return
+        with self._lock:
+            file_size = os.path.getsize(self.history_path)
+            if file_size < self._offset:
+                # 이력 파일이 새로 만들어졌으면 처음부터 다시 색인
+                self._offset, self._positions = 0, {}
+            if file_size == self._offset:
+                return
+            with open(self.history_path, 'rb') as f:
+                f.seek(self._offset)
+                position = self._offset
+                for line in f:
+                    # 쓰는 중인 마지막 줄은 다음 갱신 때 읽음
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        assessment_id = json.loads(line).get('assessment_id')
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        assessment_id = None
+                    if assessment_id:
+                        self._positions[assessment_id] = position
+                    position += len(line)
+                self._offset = position
+
+    def get(self, assessment_id: str) -> dict:
+        """
+        분석 ID의 저장된 결과 (없으면 None)
+        """
+        self.refresh()
+        position = self._positions.get(assessment_id)
+        if position is None:
+            return None
+        with open(self.history_path, 'rb') as f:
+            f.seek(position)
+            return json.loads(f.readline())
+
+@st.cache_resource(show_spinner=False)
+def get_assessment_history_index() -> AssessmentHistoryIndex:
+    """
+    프로세스 전체에서 공유하는 분석 이력 색인
+    """
+    return AssessmentHistoryIndex(ASSESSMENT_HISTORY_FILE)
+
+def find_assessment_result(key: str) -> tuple:
+    """
+    작업 ID 또는 분석 ID로 분석 결과 찾기 (작업 표 → 이력 색인 순)
+    반환: (상태, 결과) 상태는 done / running / failed / not_found
+    """
+    job = get_analysis_job_manager().status(key)
+    if job is not None:
+        return ("done", job["result"]) if job["status"] == "done" else (
+            "failed" if job["status"] == "failed" else "running", None
+        )
+    result = get_assessment_history_index().get(key)
+    return ("done", result) if result is not None else ("not_found", None)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _reference_file_map_cached(folder: str, modified: float) -> dict:
+    return {
+        os.path.basename(file_path): {'path': file_path}
+        for extension in ['*.xlsx', '*.csv']
+        for file_path in sorted(glob.glob(os.path.join(folder, extension)))
+    }
+
+def reference_file_map() -> dict:
+    """
+    참조 폴더의 행 구조가 있는 파일 {파일명: {'path'}} (폴더 수정 시각 기준 캐시, 화면 출력 없음, 읽기 전용)
+    세션 밖(헬스 서버 스레드)에서 참조 파일을 찾을 때 사용
+    """
+    if not os.path.isdir(REFERENCE_FILES_FOLDER):
+        return {}
+    return _reference_file_map_cached(REFERENCE_FILES_FOLDER, os.path.getmtime(REFERENCE_FILES_FOLDER))
+
+def compact_api_authorized(authorization: str, client_host: str) -> bool:
+    """
+    간편 응답 API 접근 허용 여부
+    COMPACT_API_TOKEN이 있으면 Bearer 토큰 일치, 없으면 같은 서버(루프백)에서 온 요청만 허용
+    """
+    if COMPACT_API_TOKEN:
+        return hmac.compare_digest(authorization or "", f"Bearer {COMPACT_API_TOKEN}")
+    return client_host in ("127.0.0.1", "::1", "localhost")
+
+def compact_api_response(path: str, reference_files: dict) -> tuple:
+    """
+    모바일 간편 응답 API (헬스 서버에서 제공)
+    - /api/assessments/<작업 ID 또는 분석 ID>: 분석 결과 (실행 중이면 202)
+    - /api/references/<참조 파일명>: 참조 행 표
+    reference_files: {파일명: {'path'}} (reference_file_map 결과)
+    반환: (HTTP 상태, 응답 dict)
+    """
+    kind, _, key = path[len("/api/"):].partition("/")
+    key = unquote(key)
+    if kind == "assessments":
+        status, result = find_assessment_result(key)
+        if result is not None:
+            return 200, compact_assessment(result, reference_files)
+        return {"running": 202, "failed": 500}.get(status, 404), {"status": status}
+    if kind == "references":
+        file_info = reference_files.get(key)
+        if file_info is not None and os.path.exists(file_info['path']):
+            return 200, load_compact_reference_table(file_info['path'])
+    return 404, {"status": "not_found"}
+
+def build_full_report_markdown(result: dict) -> str:
+    """
+    전체 보고서 마크다운 (작업 내용/참조 파일/생성 시간 머리말 포함)
+    """
+    full_report_content = f"# 작업 위험성 평가 보고서\n\n"
+    full_report_content += f"**작업 내용:** {result['work_description']}\n\n"
+    full_report_content += f"**사용된 참조 파일:** {', '.join(result.get('used_references', []))}\n\n"
+    full_report_content += f"**생성 시간:** {result['timestamp']}\n\n"
+    full_report_content += result['full_report']
+    return full_report_content
+
+def _render_excel_entry(result: dict) -> bytes:
+    with build_excel_file([result]) as output:
+        return output.read()
+
+def assessment_bundle_entries(result: dict, stamp: str, folder: str = "") -> list:
+    """
+    분석 결과 한 건의 ZIP 항목 목록 [(파일명, 내용 생성 함수)]
+    내용은 기록 직전에 생성하여 묶음 전체를 메모리에 올리지 않음
+    """
+    sections = result.get('sections') or parse_analysis_sections(result.get('full_report', ''))
+    section_files = create_section_files(sections, result['timestamp'], result['work_description'])
+    entries = [(
+        f"{folder}0.전체보고서_{stamp}.md",
+        lambda: build_full_report_markdown(result).encode('utf-8-sig')
+    )]
+    for section_key, content in section_files.items():
+        entries.append((
+            f"{folder}{ZIP_SECTION_FILE_NAMES.get(section_key, section_key)}_{stamp}.md",
+            lambda content=content: content.encode('utf-8-sig')
+        ))
+    if sections.get("risk_table"):
+        entries.append((f"{folder}위험성평가표_{stamp}.xlsx", lambda: _render_excel_entry(result)))
+    return entries
+
+def write_zip_bundle(results, output, bundle_time: datetime = None, folders: bool = False, workers: int = ZIP_RENDER_WORKERS) -> int:
+    """
+    분석 결과들을 ZIP 묶음으로 output에 순차 기록하고 묶은 분석 건수를 반환
+    - 모든 항목의 파일명/수정 시각은 묶음 생성 시각 하나로 통일
+    - 항목 내용(특히 엑셀)은 스레드에서 병렬 생성하되, 미리 생성하는 항목 수를 제한하여 메모리 사용을 일정하게 유지
+    - folders=True이면 분석별 폴더로 구분
+    """
+    bundle_time = bundle_time or datetime.now()
+    stamp = bundle_time.strftime('%Y%m%d_%H%M%S')
+    date_time = bundle_time.timetuple()[:6]
+    assessment_count = 0
+
+    def iter_entries():
+        nonlocal assessment_count
+        for result in results:
+            assessment_count += 1
+            folder = f"{assessment_count:03d}_{str(result.get('timestamp', ''))[:10]}/" if folders else ""
+            yield from assessment_bundle_entries(result, stamp, folder)
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        def write_entry(name, content):
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zip_file.writestr(info, content)
+
+        if workers <= 1:
+            for name, render in iter_entries():
+                write_entry(name, render())
+        else:
+            # 기록 순서를 유지하면서 최대 workers*2개 항목만 미리 생성
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for name, render in iter_entries():
+                    pending.append((name, executor.submit(render)))
+                    if len(pending) >= workers * 2:
+                        name, future = pending.popleft()
+                        write_entry(name, future.result())
+                while pending:
+                    name, future = pending.popleft()
+                    write_entry(name, future.result())
+    return assessment_count
+
+def build_zip_file(results, bundle_time: datetime = None, folders: bool = False) -> tempfile.SpooledTemporaryFile:
+    """
+    ZIP 묶음을 임시 파일로 작성하여 처음 위치로 되돌린 파일 객체를 반환
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    write_zip_bundle(results, output, bundle_time, folders)
+    output.seek(0)
+    return output
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_zip_report(result: dict) -> bytes:
+    """
+    단일 분석 결과의 ZIP 묶음 (분석 생성 시각 기준이라 분석 결과별로 한 번만 생성)
+    """
+    bundle_time = datetime.strptime(result['timestamp'], "%Y-%m-%d %H:%M:%S")
+    with build_zip_file([result], bundle_time) as output:
+        return output.read()
+
+def build_pdf_payload(result: dict) -> dict:
+    """
+    PDF 렌더링 작업 프로세스에 넘길 분석 결과 요약 (문자열/리스트만 포함)
+    """
+    sections = result.get('sections') or parse_analysis_sections(result.get('full_report', ''))
+    grade_positions = [RISK_TABLE_COLUMNS.index(column) for column in GRADE_COLUMNS]
+    rows = []
+    for row in extract_risk_table_rows(result.get('full_report', '')):
+        row = row + [''] * (len(RISK_TABLE_COLUMNS) - len(row))
+        for grade_col in grade_positions:
+            row[grade_col] = normalize_grade_label(row[grade_col]) or row[grade_col]
+        rows.append(row)
+    return {
+        "work_description": result.get('work_description', ''),
+        "timestamp": result.get('timestamp', ''),
+        "used_references": list(result.get('used_references', [])),
+        "sections": {key: sections.get(key, "") for key in ("work_analysis", "additional_safety", "safety_checklist")},
+        "columns": RISK_TABLE_COLUMNS,
+        "rows": rows,
+    }
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_pdf_report(result: dict) -> bytes:
+    """
+    단일 분석 결과의 PDF 보고서 (분석 결과별로 한 번만 생성)
+    """
+    return risk_report_pdf.render_assessment_pdf(build_pdf_payload(result), PDF_FONT_PATH)
+
+def write_pdf_bundle(results, output, bundle_time: datetime = None, workers: int = PDF_RENDER_WORKERS) -> int:
+    """
+    분석 결과들을 PDF_BATCH_CHUNK_SIZE건씩 한 PDF로 묶어 작업 프로세스에서 병렬 렌더링하고,
+    ZIP으로 묶어 output에 기록한 뒤 분석 건수를 반환
+    """
+    bundle_time = bundle_time or datetime.now()
+    date_time = bundle_time.timetuple()[:6]
+    payloads = (build_pdf_payload(result) for result in results)
+    assessment_count = 0
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for count, content in risk_report_pdf.render_pdf_batch(payloads, PDF_FONT_PATH, workers, PDF_BATCH_CHUNK_SIZE):
+            info = zipfile.ZipInfo(f"위험성평가서_{assessment_count + 1:03d}-{assessment_count + count:03d}.pdf", date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zip_file.writestr(info, content)
+            assessment_count += count
+    return assessment_count
+
+# 이력 파일 동시 쓰기 방지용 잠금
+_history_lock = threading.Lock()
+
+def _normalize_match_key(series: pd.Series) -> pd.Series:
+    """
+    매칭 비교용 키 생성 (공백 제거)
+    """
+    return series.astype(str).str.replace(r"\s+", "", regex=True)
+
+def save_assessment_to_history(result: dict, risk_df: pd.DataFrame) -> None:
+    """
+    분석 결과와 위험성 평가표 행을 이력 파일에 추가 저장
+    """
+    os.makedirs(ASSESSMENT_HISTORY_FOLDER, exist_ok=True)
+
+    rows = risk_df.reindex(columns=RISK_TABLE_COLUMNS).astype(object).fillna("")
+    rows.insert(0, "timestamp", result["timestamp"])
+    rows.insert(0, "assessment_id", result["assessment_id"])
+
+    with _history_lock:
+        write_header = not os.path.exists(RISK_HISTORY_FILE)
+        rows.to_csv(RISK_HISTORY_FILE, mode='a', header=write_header, index=False, encoding='utf-8')
+        with open(ASSESSMENT_HISTORY_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+class ReferenceCoverageAnalytics:
+    """
+    저장된 위험성 평가표 행을 증분 집계하여 참조자료 활용도를 계산하는 클래스
+    (이력 파일에서 마지막으로 읽은 위치 이후에 추가된 행만 읽어 누적 집계에 더함)
+    """
+
+    def __init__(self, history_path: str, reference_df: pd.DataFrame):
+        self.history_path = history_path
+        self._offset = 0
+        self._lock = threading.Lock()
+        self.assessment_count = 0
+        self.row_count = 0
+        self.work_item_counts = pd.Series(dtype="int64")
+        self.hazard_counts = pd.Series(dtype="int64")
+        self.expected_counts = pd.Series(dtype="int64")
+        self.missing_counts = pd.Series(dtype="int64")
+
+        # C3/C4 참조 위험요인 (작업 내용 기준으로 기대되는 위험요인)
+        self._reference_df = reference_df
+        reference = reference_df[reference_df["위험등급-개선전"].isin(["C3", "C4"])]
+        self._reference_c34 = pd.DataFrame({
+            "위험요인키": _normalize_match_key(reference["세부 위험요인"]),
+            "작업 내용": reference["작업 내용"],
+            "세부 위험요인": reference["세부 위험요인"],
+            "위험등급": reference["위험등급-개선전"],
+        }).astype(str).drop_duplicates(subset=["작업 내용", "위험요인키"]).drop(columns=["위험요인키"])
+
+        # 참조 위험요인별 문자 2-gram을 한 번만 계산 ((위험요인 번호, 2-gram 어휘 번호) 정렬 키로 보관)
+        hazard_ids, hazards = pd.factorize(self._reference_c34["세부 위험요인"])
+        self._reference_c34["위험요인번호"] = hazard_ids
+        grams = hazard_bigram_keys(hazards)
+        self._vocabulary = np.unique(grams["key"].to_numpy())
+        self._reference_sizes = np.bincount(grams["id"].to_numpy(), minlength=len(hazards))
+        self._reference_keys = np.sort(
+            grams["id"].to_numpy() * max(len(self._vocabulary), 1) + np.searchsorted(self._vocabulary, grams["key"].to_numpy())
+        )
+
+    def refresh(self) -> int:
+        """
+        이력 파일에 새로 추가된 행만 읽어 집계에 반영하고 반영한 행 수를 반환
+        """
+        if not os.path.exists(self.history_path):
+            return 0
+
+        with self._lock:
+            file_size = os.path.getsize(self.history_path)
+            if file_size <= self._offset:
+                return 0
+            with open(self.history_path, 'rb') as f:
+                f.seek(self._offset)
+                chunk = f.read(file_size - self._offset)
+            # 쓰는 중인 마지막 행은 다음 갱신 때 읽음
+            chunk = chunk[:chunk.rfind(b"\n") + 1]
+            if not chunk:
+                return 0
+
+            header = 0 if self._offset == 0 else None
+            new_rows = pd.read_csv(
+                io.BytesIO(chunk),
+                header=header,
+                names=None if header == 0 else ["assessment_id", "timestamp"] + RISK_TABLE_COLUMNS,
+                dtype=str,
+                keep_default_na=False,
+                encoding='utf-8'
+            )
+            self._offset += len(chunk)
+            self.update(new_rows)
+            return len(new_rows)
+
+    @staticmethod
+    def _accumulate(current: pd.Series, new_counts: pd.Series) -> pd.Series:
+        """
+        누적 집계 Series에 새 집계를 더함
+        """
+        if current.empty:
+            return new_counts
+        if new_counts.empty:
+            return current
+        return current.add(new_counts, fill_value=0)
+
+    def update(self, rows: pd.DataFrame) -> None:
+        """
+        새 위험성 평가표 행을 누적 집계에 반영 (벡터화 연산)
+        """
+        if rows.empty:
+            return
+
+        self.assessment_count += rows["assessment_id"].nunique()
+        self.row_count += len(rows)
+
+        # 평가별로 매칭된 작업 내용 (평가 1건당 1회 집계)
+        matched_items = rows[["assessment_id", "작업 내용"]].drop_duplicates()
+        self.work_item_counts = self._accumulate(
+            self.work_item_counts, matched_items["작업 내용"].value_counts()
+        )
+
+        # 매칭된 위험요인 빈도
+        self.hazard_counts = self._accumulate(
+            self.hazard_counts, rows.groupby(["재해유형", "세부 위험요인"]).size()
+        )
+
+        # 매칭된 작업 내용의 C3/C4 참조 위험요인 중 생성되지 않은 항목
+        # (결과 화면의 점검과 같은 기준: 작업은 verify_risk_table의 작업 대응, 위험요인은 문자 2-gram 유사도)
+        if self._reference_c34.empty:
+            return
+        item_map = map_table_work_items(matched_items["작업 내용"].astype(str).unique(), self._reference_df)
+        expected = pd.DataFrame({
+            "assessment_id": matched_items["assessment_id"].values,
+            "작업 내용": matched_items["작업 내용"].astype(str).map(item_map).values,
+        }).dropna().drop_duplicates().merge(self._reference_c34, on="작업 내용")
+        if expected.empty:
+            return
+        found = self._covered(expected, rows)
+        keys = ["작업 내용", "세부 위험요인", "위험등급"]
+        self.expected_counts = self._accumulate(self.expected_counts, expected.groupby(keys).size())
+        self.missing_counts = self._accumulate(self.missing_counts, expected[~found].groupby(keys).size())
+
+    def _covered(self, expected: pd.DataFrame, rows: pd.DataFrame, block_pairs: int = 500_000) -> np.ndarray:
+        """
+        기대 위험요인 행별로 같은 평가의 생성 위험요인 중 문자 2-gram Dice 유사도가
+        VERIFY_MIN_SIMILARITY 이상인 것이 있는지 (hazards_covered와 같은 기준)
+        (평가 기준으로 기대·생성 위험요인 쌍을 만들고, 공통 2-gram 수는 참조 위험요인 2-gram 키 배열에서 한 번에 조회)
+        """
+        generated = rows[["assessment_id", "세부 위험요인"]].astype(str).drop_duplicates()
+        generated_ids, generated_hazards = pd.factorize(generated["세부 위험요인"])
+        # 생성 위험요인은 고유 문구마다 한 번만 변환 (참조 어휘에 없는 2-gram은 크기에만 반영)
+        grams = hazard_bigram_keys(generated_hazards)
+        generated_sizes = np.bincount(grams["id"].to_numpy(), minlength=len(generated_hazards))
+        keys = grams["key"].to_numpy()
+        located = np.minimum(np.searchsorted(self._vocabulary, keys), max(len(self._vocabulary) - 1, 0))
+        known = self._vocabulary[located] == keys if len(self._vocabulary) else np.zeros(len(keys), dtype=bool)
+        flat_codes = located[known]
+        lengths = np.bincount(grams["id"].to_numpy()[known], minlength=len(generated_hazards))
+        offsets = np.cumsum(lengths) - lengths
+
+        pairs = pd.DataFrame({
+            "expected_row": np.arange(len(expected)),
+            "assessment_id": expected["assessment_id"].to_numpy(),
+            "reference_id": expected["위험요인번호"].to_numpy(),
+        }).merge(pd.DataFrame({"assessment_id": generated["assessment_id"].to_numpy(), "generated_id": generated_ids}), on="assessment_id")
+
+        found = np.zeros(len(expected), dtype=bool)
+        vocabulary = max(len(self._vocabulary), 1)
+        for start in range(0, len(pairs), block_pairs):
+            block = pairs.iloc[start:start + block_pairs]
+            generated_block = block["generated_id"].to_numpy()
+            reference_block = block["reference_id"].to_numpy()
+            counts = lengths[generated_block]
+            pair_index = np.repeat(np.arange(len(block)), counts)
+            positions = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                         + np.repeat(offsets[generated_block], counts))
+            pair_keys = reference_block[pair_index] * vocabulary + flat_codes[positions]
+            located = np.minimum(np.searchsorted(self._reference_keys, pair_keys), max(len(self._reference_keys) - 1, 0))
+            hits = self._reference_keys[located] == pair_keys if len(self._reference_keys) else np.zeros(len(pair_keys), dtype=bool)
+            common = np.bincount(pair_index, weights=hits, minlength=len(block))
+            total = generated_sizes[generated_block] + self._reference_sizes[reference_block]
+            similarity = np.divide(2 * common, total, out=np.zeros(len(block)), where=total > 0)
+            found[block["expected_row"].to_numpy()[similarity >= VERIFY_MIN_SIMILARITY]] = True
+        return found
+
+    def summary(self, top_n: int = 20) -> dict:
+        """
+        대시보드 표시용 집계 결과 반환
+        """
+        work_items = self.work_item_counts.astype("int64").nlargest(top_n)
+        hazards = self.hazard_counts.astype("int64").nlargest(top_n)
+
+        missing = pd.DataFrame({
+            "누락 횟수": self.missing_counts,
+            "기대 횟수": self.expected_counts,
+        }).fillna(0)
+        missing = missing[missing["누락 횟수"] > 0].astype("int64")
+        missing["누락률(%)"] = np.round(
+            np.divide(missing["누락 횟수"].to_numpy(), missing["기대 횟수"].to_numpy()) * 100, 1
+        )
+
+        return {
+            "work_items": work_items.rename_axis("작업 내용").reset_index(name="매칭 횟수"),
+            "hazards": hazards.rename_axis(["재해유형", "세부 위험요인"]).reset_index(name="매칭 횟수"),
+            "missing": missing.sort_values("누락 횟수", ascending=False).head(top_n).reset_index(),
+        }
+
+@st.cache_resource(show_spinner=False)
+def get_coverage_analytics() -> ReferenceCoverageAnalytics:
+    """
+    프로세스 전체에서 공유하는 커버리지 집계 객체
+    """
+    return ReferenceCoverageAnalytics(RISK_HISTORY_FILE, load_all_reference_rows())
+
+def warm_reference_indexes() -> dict:
+    """
+    참조 파일 파싱과 파일별/전체 검색 색인 생성을 미리 수행
+    """
+    reference_files = load_reference_files_from_folder()
+    for file_info in reference_files.values():
+        rows = load_reference_rows(file_info['path'])
+        if not rows.empty:
+            get_reference_search_index(rows)
+    combined = load_selected_reference_rows(list(reference_files), reference_files)
+    if not combined.empty:
+        get_reference_search_index(combined)
+    return {"files": len(reference_files), "rows": len(combined)}
+
+def warm_analysis_cache_from_history(top_n: int = WARMUP_HISTORY_TOP_N) -> dict:
+    """
+    이력에서 자주 요청된 작업의 최근 분석 결과를 분석 결과 캐시에 미리 올림
+    현재 백엔드/프롬프트 버전/후보 선정 방식으로 만든 결과 중 의존하는 참조 행이 그 뒤로 바뀌지 않은 것만 사용
+    """
+    backend = create_model_backend()
+    if backend is None or top_n <= 0 or ANALYSIS_CACHE_SIZE <= 0:
+        return {"warmed": 0}
+    template = PROMPT_TEMPLATES.get(PROMPT_TEMPLATE_VERSION, PROMPT_TEMPLATES[DEFAULT_PROMPT_TEMPLATE_VERSION])
+    candidate_source = "embedding" if EMBEDDING_RETRIEVAL else "lexical"
+    reference_files = load_reference_files_from_folder()
+
+    counts = Counter()
+    latest = {}
+    for result in iter_history_assessments():
+        key = canonical_korean_text(result.get("work_description", "")).replace(" ", "")
+        if not key:
+            continue
+        counts[key] += 1
+        used = result.get("used_references") or []
+        if (
+            result.get("backend") == backend.name
+            and result.get("prompt_version") == template.version
+            and result.get("candidate_source", "lexical") == candidate_source
+            and not result.get("fallback") and not result.get("subtasks")
+            and used and reference_dependencies_valid(result, reference_files)
+        ):
+            latest[key] = result
+
+    cache = get_analysis_result_cache()
+    warmed = 0
+    for key, _ in counts.most_common(top_n):
+        result = latest.get(key)
+        if result is None:
+            continue
+        cache_key = analysis_cache_key(
+            result["work_description"], result["used_references"], backend.name, backend.default_model,
+            analysis_cache_version(template)
+        )
+        if cache.get(cache_key) is None:
+            cache.put(cache_key, {**result, "cached": False})
+            warmed += 1
+    return {"descriptions": len(counts), "warmed": warmed}
+
+def warm_model_connection() -> dict:
+    """
+    설정된 모델 백엔드의 연결을 미리 열어 둠
+    """
+    backend = create_model_backend()
+    if backend is None:
+        return {"backend": None}
+    try:
+        backend.warm_up()
+    except Exception as e:
+        # 시작 시 연결할 수 없으면 첫 요청부터 오프라인 평가
+        if is_connection_error(e):
+            get_model_connectivity(backend.name).record_failure(e)
+        raise
+    return {"backend": backend.name}
+
+class ServerWarmup:
+    """
+    서버 시작 시 한 번 실행하는 준비 작업(워밍업)과 단계별 소요 시간
+    (레디니스 응답은 모든 단계가 끝난 뒤 준비 완료로 바뀜, 단계 오류는 기록만 하고 계속 진행)
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at = None
+        self.stages = {}    # 단계 → 소요 시간(초)
+        self.details = {}
+        self.errors = {}
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def _run_stage(self, name: str, stage_fn) -> None:
+        start = time.perf_counter()
+        try:
+            detail = stage_fn()
+        except Exception as e:
+            detail = None
+            with self._lock:
+                self.errors[name] = str(e)
+        with self._lock:
+            self.stages[name] = round(time.perf_counter() - start, 3)
+            if detail is not None:
+                self.details[name] = detail
+
+    def run(self) -> None:
+        self._run_stage("reference_index", warm_reference_indexes)
+        if EMBEDDING_RETRIEVAL:
+            self._run_stage("embedding_index", lambda: {"loaded": get_embedding_index() is not None})
+        self._run_stage("history_cache", warm_analysis_cache_from_history)
+        self._run_stage("model_connection", warm_model_connection)
+        self.finished_at = time.time()
+        self.ready.set()
+
+    def snapshot(self) -> dict:
+        """
+        헬스/레디니스 응답 및 화면 표시용 상태
+        """
+        with self._lock:
+            return {
+                "status": "ready" if self.ready.is_set() else "warming_up",
+                "startup_seconds": round((self.finished_at or time.time()) - self.started_at, 3),
+                "stages": dict(self.stages),
+                "details": dict(self.details),
+                "errors": dict(self.errors),
+            }
+
+def start_health_server(warmup: ServerWarmup, port: int = HEALTH_PORT, host: str = HEALTH_HOST) -> ThreadingHTTPServer:
+    """
+    헬스/레디니스 확인용 HTTP 서버를 백그라운드 스레드로 실행
+    - /healthz: 프로세스가 살아 있으면 200
+    - /readyz: 워밍업이 끝나면 200, 진행 중이면 503 (로드밸런서는 200일 때부터 트래픽 전달)
+    - /api/...: 모바일 간편 응답 (compact_api_response, ETag/If-None-Match와 gzip 지원, compact_api_authorized로 접근 제한)
+    """
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0].rstrip("/")
+            if path.startswith("/api/"):
+                if not compact_api_authorized(self.headers.get("Authorization", ""), self.client_address[0]):
+                    self.send_json(401, compact_payload_bytes({"status": "unauthorized"}))
+                    return
+                try:
+                    status, body = compact_api_response(path, reference_file_map())
+                except Exception as e:
+                    status, body = 500, {"status": "error", "error": str(e)}
+                self.send_json(status, compact_payload_bytes(body), cacheable=status == 200)
+                return
+            if path == "/healthz":
+                status, body = 200, {"status": "ok"}
+            elif path == "/readyz":
+                body = warmup.snapshot()
+                status = 200 if body["status"] == "ready" else 503
+            else:
+                status, body = 404, {"status": "not_found"}
+            self.send_json(status, json.dumps(body, ensure_ascii=False).encode("utf-8"))
+
+        def send_json(self, status: int, data: bytes, cacheable: bool = False):
+            headers = {"Content-Type": "application/json; charset=utf-8", "Cache-Control": "no-store"}
+            if cacheable:
+                # 내용이 같으면 본문 없이 304 (클라이언트는 캐시한 응답 재사용)
+                etag = '"' + hashlib.sha1(data).hexdigest()[:16] + '"'
+                headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+                if etag in self.headers.get("If-None-Match", ""):
+                    status, data = 304, b""
+            if data and "gzip" in self.headers.get("Accept-Encoding", ""):
+                data = gzip.compress(data, mtime=0)
+                headers.update({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), HealthHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="health-server", daemon=True).start()
+    return server
+
+@st.cache_resource(show_spinner=False)
+def start_server_warmup() -> ServerWarmup:
+    """
+    프로세스당 한 번 헬스 서버와 워밍업을 백그라운드에서 시작
+    """
+    warmup = ServerWarmup()
+    if HEALTH_PORT:
+        try:
+            start_health_server(warmup)
+        except OSError as e:
+            # 같은 포트를 다른 프로세스가 이미 사용 중이면 헬스 서버 없이 진행
+            warmup.errors["health_server"] = str(e)
+    threading.Thread(target=warmup.run, name="server-warmup", daemon=True).start()
+    return warmup
+
+def run_with_warmup() -> None:
+    """
+    워밍업/헬스 서버를 먼저 시작한 뒤 같은 프로세스에서 Streamlit 서버 실행
+    (python text_risk_assessment_app_0825_v0.1.py [--server.port 8501 ...])
+    """
+    from streamlit.web import cli as stcli
+    start_server_warmup()
+    sys.argv = ["streamlit", "run", os.path.abspath(__file__)] + sys.argv[1:]
+    sys.exit(stcli.main())
+
+# python으로 직접 실행하면 트래픽을 받기 전에 워밍업 시작 (streamlit run으로 실행하면 첫 세션에서 시작)
+if __name__ == "__main__" and get_script_run_ctx(suppress_warning=True) is None:
+    run_with_warmup()
+
+# Streamlit App UI
+st.title("🛠️ 작업 위험성 평가 가이드")
+
+# 서버 워밍업/헬스 서버 (프로세스당 한 번)
+server_warmup = start_server_warmup()
+
+# 설정된 모델 백엔드
+model_backend = create_model_backend()
+
+# 세션 상태 초기화
+if 'reference_files' not in st.session_state:
+    st.session_state['reference_files'] = {}
+if 'reference_loaded' not in st.session_state:
+    st.session_state['reference_loaded'] = False
+if 'analysis_result' not in st.session_state:
+    st.session_state['analysis_result'] = None
+if 'user_id' not in st.session_state:
+    st.session_state['user_id'] = uuid.uuid4().hex
+
+# 1. 기본 참조 파일 자동 로드 섹션
+st.header("📁 위험성분석 참조 파일 관리")
+
+# 기본 참조 파일 정보 표시
+st.info(f"📂 기본 참조 파일: `{DEFAULT_REFERENCE_FILE}`")
+
+# 참조 파일 로드 버튼
+col1, col2 = st.columns([3, 1])
+with col1:
+    st.caption(f"파일 위치: `{REFERENCE_FILES_FOLDER}/{DEFAULT_REFERENCE_FILE}`")
+with col2:
+    if st.button("🔄 파일 새로고침", type="secondary"):
+        st.session_state['reference_files'] = load_reference_files_from_folder()
+        st.session_state['reference_loaded'] = True
+        record_reference_versions(st.session_state['reference_files'])
+        st.rerun()
+
+# 앱 시작 시 자동으로 참조 파일 로드
+if not st.session_state['reference_loaded']:
+    with st.spinner("참조 파일들을 로딩하고 있습니다..."):
+        st.session_state['reference_files'] = load_reference_files_from_folder()
+        st.session_state['reference_loaded'] = True
+        record_reference_versions(st.session_state['reference_files'])
+
+# 로드된 참조 파일 목록 표시
+if st.session_state['reference_files']:
+    st.success(f"✅ {len(st.session_state['reference_files'])}개의 참조 파일이 로드되었습니다!")
+    
+    # 참조 파일 선택
+    st.subheader("📋 사용할 참조 파일 선택")
+    
+    auto_route = st.checkbox(
+        "🧭 작업 내용에 맞는 참조 파일 자동 선택",
+        value=REFERENCE_AUTO_ROUTING,
+        help="선택한 파일 중 작업 내용과 관련된 파일만 모델에 전달합니다. (관련 파일을 찾지 못하면 선택한 파일 전체 사용)"
+    )
+    
+    # 자동 선택을 사용하면 모든 파일을, 아니면 기본 파일을 기본으로 선택
     default_selection = list(st.session_state['reference_files'].keys())
+    if not auto_route and DEFAULT_REFERENCE_FILE in st.session_state['reference_files']:
+        default_selection = [DEFAULT_REFERENCE_FILE]
     selected_files = st.multiselect(
         "분석에 사용할 참조 파일을 선택하세요 (여러 개 선택 가능)",
         options=list(st.session_state['reference_files'].keys()),
@@ -510,10 +4656,37 @@ if st.session_state['reference_files']:
                 with col3:
                     st.write(f"수정: {file_info['modified']}")
                 
-                # 파일 내용 미리보기
-                # with st.checkbox(f"🔍 {file_name} 미리보기 보기"):
-                    # preview_content = file_info['content'][:1000] + "..." if len(file_info['content']) > 1000 else file_info['content']
-                    # st.text_area("내용", preview_content, height=200, disabled=True, key=f"preview_{file_name}")
+                # 파일 내용 미리보기 (정규화된 위험요인 행)
+                if st.checkbox(f"🔍 {file_name} 미리보기 보기", key=f"preview_{file_name}"):
+                    preview_rows = load_reference_rows(file_info['path'])
+                    if preview_rows.empty:
+                        st.text_area("내용", reference_file_content(file_name)[:1000], height=200, disabled=True, key=f"preview_text_{file_name}")
+                    else:
+                        render_risk_table(preview_rows.drop(columns=["참조파일"]), key=f"preview_table_{file_name}")
+
+        # 참조자료 위험요인 검색 (모델 호출 없이 색인 검색)
+        with st.expander("🔎 참조자료 위험요인 검색"):
+            search_query = st.text_input("검색어", placeholder="예: 맨홀 질식, 사다리 추락", key="reference_search_query")
+            if search_query.strip():
+                search_index = get_reference_search_index(load_selected_reference_rows(selected_files))
+                search_start = time.perf_counter()
+                search_results = search_index.search(search_query, limit=REFERENCE_SEARCH_LIMIT)
+                search_ms = (time.perf_counter() - search_start) * 1000
+                st.caption(f"{len(search_results)}건 · {search_ms:.1f}ms (색인 {search_index.row_count:,}행)")
+                if search_results.empty:
+                    st.info("검색 결과가 없습니다.")
+                else:
+                    lines = ["| 작업 내용 | 재해유형 | 세부 위험요인 | 등급 | 위험성 감소대책 | 참조파일 |", "|---|---|---|---|---|---|"]
+                    for _, row in search_results.iterrows():
+                        lines.append("| " + " | ".join([
+                            highlight_matches(_markdown_cell(row["작업 내용"]), search_query),
+                            highlight_matches(_markdown_cell(row["재해유형"]), search_query),
+                            highlight_matches(_markdown_cell(row["세부 위험요인"]), search_query),
+                            _markdown_cell(row["위험등급-개선전"]),
+                            _markdown_cell(row["위험성 감소대책"]),
+                            _markdown_cell(row["참조파일"]),
+                        ]) + " |")
+                    st.markdown("\n".join(lines))
 else:
     st.warning("⚠️ 참조 파일이 없습니다.")
     st.markdown(f"""
@@ -535,30 +4708,94 @@ work_input = st.text_area(
     height=100,
     help="작업 장소, 작업 내용, 사용 장비 등을 구체적으로 입력하면 더 정확한 위험성 평가를 받을 수 있습니다."
 )
+split_tasks = st.checkbox(
+    "🧩 여러 작업이 함께 입력되면 작업별로 나눠 분석",
+    value=WORK_SPLIT_ENABLED,
+    help="예: '맨홀 케이블 교체 후 철탑 안테나 점검' → 작업별로 동시에 분석한 뒤 위험성 평가표를 합칩니다. (공통 위험요인은 한 번만 표시)"
+)
 
 # 3. 분석 실행 버튼
 if st.session_state['reference_files'] and work_input.strip():
+    if selected_files and auto_route:
+        routing_preview = route_reference_files(work_input, selected_files)
+        if routing_preview['routed']:
+            st.caption(f"🧭 자동 선택된 참조 파일: {', '.join(routing_preview['selected'])} ({len(routing_preview['selected'])}/{len(selected_files)}개)")
+        else:
+            st.caption("🧭 관련 참조 파일을 특정하지 못해 선택한 파일을 모두 사용합니다.")
+    if selected_files and split_tasks:
+        subtask_preview = split_work_description(work_input, load_selected_reference_rows(selected_files))
+        if len(subtask_preview) > 1:
+            st.caption("🧩 나눠서 분석할 작업: " + " / ".join(f"({number}) {subtask}" for number, subtask in enumerate(subtask_preview, start=1)))
+    offline_notice = offline_assessment_reason(model_backend)
+    if offline_notice:
+        st.warning(f"📴 오프라인 모드: {offline_notice} · 모델 대신 참조자료에서 위험성 평가표, 등급 요약, 체크리스트를 바로 작성합니다.")
     if not selected_files:
         st.warning("⚠️ 분석에 사용할 참조 파일을 확인해주세요.")
     elif st.button("🔍 위험성 평가 분석 시작", type="primary", use_container_width=True):
-        if client is None:
-            st.error("❌ OpenAI API 키가 설정되지 않았습니다.")
+        if model_backend is None and not offline_notice:
+            st.error("❌ 모델 백엔드가 설정되지 않았습니다. (OpenAI API 키 또는 MODEL_BACKEND 설정 확인)")
         else:
-            try:
-                with st.spinner("AI가 작업 내용을 분석하여 위험성 평가를 수행하고 있습니다..."):
-                    result = analyze_work_risk(work_input, selected_files)
-                    st.session_state['analysis_result'] = result
-                
-                st.success("✅ 위험성 평가 분석 완료!")
-                
-            except Exception as e:
-                st.error(f"❌ 분석 중 오류 발생: {str(e)}")
+            # 분석은 백그라운드 작업으로 실행 (입력 변경/화면 재실행/연결 끊김에도 계속 진행)
+            job_id = get_analysis_job_manager().submit(
+                analyze_multi_task_work_risk if split_tasks else analyze_work_risk,
+                work_input,
+                selected_files,
+                st.session_state['reference_files'],
+                user_id=st.session_state['user_id'],
+                backend=model_backend,
+                auto_route=auto_route
+            )
+            st.session_state['analysis_job_id'] = job_id
+            st.query_params["job"] = job_id
 
 elif not st.session_state['reference_files']:
     st.info(f"📁 먼저 기본 참조 파일 '{DEFAULT_REFERENCE_FILE}'을 준비해주세요.")
 elif not work_input.strip():
     st.info("✍️ 작업 내용을 입력해주세요.")
 
+@st.fragment(run_every=ANALYSIS_JOB_POLL_SECONDS)
+def render_analysis_job_progress(job_id: str):
+    """
+    실행 중인 분석 작업 상태를 주기적으로 확인하고, 끝나면 화면 전체를 다시 실행하여 결과 표시
+    """
+    job = get_analysis_job_manager().status(job_id)
+    if job is None or job["status"] in ("done", "failed"):
+        st.rerun()
+    elapsed = time.time() - job["submitted_at"]
+    if job["queue_position"]:
+        st.info(f"⏳ 요청이 많아 대기 중입니다. 현재 대기 순번: {job['queue_position']}번째 (경과 {elapsed:.0f}초)")
+    elif job["status"] == "queued":
+        st.info(f"⏳ 분석 작업이 실행을 기다리고 있습니다. (경과 {elapsed:.0f}초)")
+    else:
+        st.info(f"🔄 AI가 작업 내용을 분석하여 위험성 평가를 수행하고 있습니다... (경과 {elapsed:.0f}초)")
+    st.caption(f"작업 ID: `{job_id}` · 화면을 닫거나 입력을 바꿔도 분석은 계속되며, 같은 주소로 다시 열면 결과를 볼 수 있습니다.")
+
+# 실행 중이거나 끝난 분석 작업 연결 (새 세션은 주소의 작업 ID로 다시 연결)
+if 'analysis_job_id' not in st.session_state:
+    st.session_state['analysis_job_id'] = st.query_params.get("job")
+if st.session_state['analysis_job_id']:
+    analysis_job = get_analysis_job_manager().status(st.session_state['analysis_job_id'])
+    if analysis_job is None or analysis_job["status"] in ("done", "failed"):
+        st.session_state['analysis_job_id'] = None
+        st.query_params.pop("job", None)
+    if analysis_job is None:
+        st.warning("⚠️ 분석 작업을 찾을 수 없습니다. (보관 시간이 지났거나 서버가 다시 시작됨) 분석을 다시 실행해주세요.")
+    elif analysis_job["status"] == "done":
+        st.session_state['analysis_result'] = analysis_job["result"]
+        if analysis_job["history_error"]:
+            st.warning(f"⚠️ 평가 이력 저장 중 오류: {analysis_job['history_error']}")
+        st.success("✅ 위험성 평가 분석 완료!")
+    elif analysis_job["status"] == "failed":
+        error = analysis_job["error"]
+        if isinstance(error, ModelRequestRejected):
+            st.warning(f"⏳ {str(error)}")
+        elif isinstance(error, openai.RateLimitError):
+            st.error("❌ OpenAI 요청 한도를 초과했습니다. 잠시 후 다시 시도해주세요.")
+        else:
+            st.error(f"❌ 분석 중 오류 발생: {str(error)}")
+    else:
+        render_analysis_job_progress(analysis_job["id"])
+
 # 4. 분석 결과 표시
 if st.session_state['analysis_result']:
     result = st.session_state['analysis_result']
@@ -569,196 +4806,498 @@ if st.session_state['analysis_result']:
     # 작업 정보 표시
     st.markdown(f"**작업 내용**: {result['work_description']}")
     st.markdown(f"**사용된 참조 파일**: {', '.join(result.get('used_references', []))}")
-    st.caption(f"생성 시간: {result['timestamp']}")
+    if len(result.get('requested_references') or []) > len(result.get('used_references', [])):
+        st.caption(f"🧭 작업 내용에 따라 선택한 {len(result['requested_references'])}개 중 {len(result['used_references'])}개 참조 파일만 사용했습니다.")
+    st.caption(f"생성 시간: {result['timestamp']} · 모델: {result.get('model', MODEL_NAME)}")
+    if result.get('candidate_items'):
+        st.caption(f"참조자료 유사 작업 후보: {', '.join(result['candidate_items'])}")
+    if result.get('subtasks'):
+        st.caption("🧩 작업별 분석: " + " / ".join(
+            f"({number}) {subtask['work_description']} - {subtask['risk_rows']}건"
+            for number, subtask in enumerate(result['subtasks'], start=1)
+        ))
+    generation = result.get('generation') or {}
+    verification = result.get('verification') or {}
+    if verification.get('coverage') is not None:
+        coverage_text = f"참조자료 C2~C4 위험요인 포함률: {verification['coverage']}% ({verification['matched']}/{verification['expected']})"
+        if verification.get('inserted'):
+            st.info(f"ℹ️ {coverage_text} · 누락된 위험요인 {verification['inserted']}건을 참조자료에서 표에 추가했습니다.")
+            with st.expander("추가된 위험요인 보기"):
+                st.markdown("\n".join(f"- {hazard}" for hazard in verification.get('missing', [])))
+        elif verification.get('missing'):
+            st.warning(f"⚠️ {coverage_text} · 누락: {', '.join(verification['missing'][:5])}{' 외' if len(verification['missing']) > 5 else ''}")
+        else:
+            st.caption(coverage_text)
+    if generation.get('chunks'):
+        st.caption(f"위험요인이 많아 표를 {generation['chunks']}개로 나눠 동시에 생성했습니다. (모델 요청 {generation['requests']}회)")
+    if generation.get('truncated'):
+        st.info(f"ℹ️ 응답이 길이 제한으로 잘려 빠진 위험요인 {generation.get('recovered_rows', 0)}건을 추가로 채웠습니다.")
+    if result.get('cached'):
+        st.info("ℹ️ 같은 작업의 이전 분석 결과를 재사용했습니다.")
+    usage = result.get('usage') or {}
+    if usage.get('prompt_tokens'):
+        st.caption(
+            f"프롬프트 토큰: {usage['prompt_tokens']:,} (캐시 적중 {usage.get('cached_tokens', 0):,}, "
+            f"{usage.get('cached_ratio') or 0}%) · 응답 토큰: {usage.get('completion_tokens') or 0:,} · "
+            f"프롬프트 버전: {result.get('prompt_version', '-')}"
+        )
+    if result.get('offline'):
+        st.warning(f"📴 오프라인 평가 결과입니다. 모델 없이 참조자료만으로 작성했으므로 현장에서 내용을 확인하세요. (사유: {result.get('offline_reason')})")
+    elif result.get('fallback'):
+        st.warning(f"⚠️ 모델 응답을 받지 못해 대체 결과를 표시합니다. (생성: {result.get('model')}, 사유: {result.get('fallback_reason') or '응답 마감 시간 초과'})")
     
-    # 섹션별 탭 생성
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "📋 전체 보고서",
-        "🔍 작업 분석", 
-        "⚠️ 위험성 평가표", 
-        "✅ 안전 조치"
-    ])
+    compact_view = st.toggle(
+        "📱 간편 보기 (저속 통신용)",
+        value=st.query_params.get("view") == "compact",
+        help="표 서식과 다운로드 파일 없이 위험요인 목록만 표시하여 전송량을 줄입니다. (터널/철탑 등 통신이 약한 현장용)"
+    )
+    if compact_view:
+        st.query_params["view"] = "compact"
+    else:
+        st.query_params.pop("view", None)
+
+    if compact_view:
+        # 간편 보기: 모바일 API와 같은 간편 응답으로 등급/위험요인/대책을 한 줄씩 표시
+        # (보고서 마크다운, 스타일 표, 다운로드 파일은 만들지 않음)
+        reference_files = st.session_state['reference_files']
+        compact = compact_assessment(result, reference_files)
+        reference_tables = {
+            ref_name: load_compact_reference_table(reference_files[ref_name]['path'])
+            for ref_name, _ in compact["refs"]
+        }
+        compact_lines = [
+            f"- **{cells[5]}** {cells[3]} · {cells[4]} → {cells[6]}"
+            for cells in expand_compact_rows(compact, reference_tables)
+        ]
+        st.markdown("\n".join(["#### ⚠️ 위험요인과 감소대책"] + (compact_lines or ["- 위험성 평가표 내용을 찾을 수 없습니다."])))
+        if compact["checklist"]:
+            st.markdown("#### ✅ 작업 전 체크리스트\n" + compact["checklist"])
+        compact_size = len(gzip.compress(compact_payload_bytes(compact), mtime=0))
+        full_size = len(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+        st.caption(
+            f"간편 응답 {compact_size / 1024:.1f}KB (전체 결과 {full_size / 1024:.1f}KB, 참조 문구는 행 ID로 전송)"
+            + (f" · API: `http://<서버>:{HEALTH_PORT}/api/assessments/{result.get('assessment_id')}`" if HEALTH_PORT else "")
+        )
+    else:
+        # 섹션별 탭 생성
+        tab1, tab2, tab3, tab4 = st.tabs([
+            "📋 전체 보고서",
+            "🔍 작업 분석", 
+            "⚠️ 위험성 평가표", 
+            "✅ 안전 조치"
+        ])
     
-    sections = result.get('sections', {})
-    section_files = create_section_files(sections, result['timestamp'], result['work_description'])
+        sections = result.get('sections', {})
+        section_files = create_section_files(sections, result['timestamp'], result['work_description'])
     
-    with tab1:
-        st.subheader("전체 위험성 평가 보고서")
-        st.markdown(result['full_report'])
+        with tab1:
+            st.subheader("전체 위험성 평가 보고서")
+            st.markdown(result['full_report'])
         
-        # 전체 보고서 다운로드
-        md_content = f"# 작업 위험성 평가 보고서\n\n"
-        md_content += f"**작업 내용:** {result['work_description']}\n\n"
-        md_content += f"**사용된 참조 파일:** {', '.join(result.get('used_references', []))}\n\n"
-        md_content += f"**생성 시간:** {result['timestamp']}\n\n"
-        md_content += result['full_report']
+            # 전체 보고서 다운로드
+            md_content = f"# 작업 위험성 평가 보고서\n\n"
+            md_content += f"**작업 내용:** {result['work_description']}\n\n"
+            md_content += f"**사용된 참조 파일:** {', '.join(result.get('used_references', []))}\n\n"
+            md_content += f"**생성 시간:** {result['timestamp']}\n\n"
+            md_content += result['full_report']
         
-        st.download_button(
-            label="📄 전체 보고서 다운로드 (.md)",
-            data=md_content.encode('utf-8-sig'),
-            file_name=f"위험성평가보고서_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-            mime="text/markdown",
-            key="full_report_download"
-        )
-    
-    with tab2:
-        st.subheader("작업 내용 분석")
-        if sections.get("work_analysis"):
-            st.markdown(sections["work_analysis"])
-            if "work_analysis" in section_files:
-                st.download_button(
-                    label="📥 작업 분석 다운로드 (.md)",
-                    data=section_files["work_analysis"].encode('utf-8-sig'),
-                    file_name=f"작업분석_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                    mime="text/markdown",
-                    key="work_analysis_download"
-                )
-        else:
-            st.info("작업 분석 내용을 찾을 수 없습니다.")
+            st.download_button(
+                label="📄 전체 보고서 다운로드 (.md)",
+                data=md_content.encode('utf-8-sig'),
+                file_name=f"위험성평가보고서_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+                mime="text/markdown",
+                key="full_report_download"
+            )
     
-    with tab3:
-        st.subheader("위험성 평가표")
-        if sections.get("risk_table"):
-            # 위험성 평가표를 DataFrame으로 추출
-            try:
-                risk_df = parse_risk_table_from_markdown(result['full_report'])
-                if not risk_df.empty:
-                    st.markdown("### 📋 위험성 평가 표 (데이터프레임)")
-
-                    # 위험등급-개선전 컬러링 함수
-                    def highlight_risk(row):
-                        color = ""
-                        text_color = ""
-                        val = str(row["위험등급-개선전"]).strip()
-                        if val == "C4":
-                            color = "background-color: #e53935;"  # 빨간색
-                            text_color = "color: #fff;"
-                        elif val == "C3":
-                            color = "background-color: #ff9800;"  # 주황색
-                            text_color = "color: #000;"
-                        elif val == "C2":
-                            color = "background-color: #fff176;"  # 노랑색
-                            text_color = "color: #000;"
-                        else:
-                            color = ""
-                            text_color = ""
-                        return [f"{color}{text_color}" if col == "위험등급-개선전" else "" for col in risk_df.columns]
-
-                    styled_df = risk_df.style.apply(highlight_risk, axis=1)
-
-                    st.dataframe(
-                        styled_df,
-                        use_container_width=True,
-                        hide_index=True,
-                        column_config={
-                            "순번": st.column_config.NumberColumn("순번", width="small"),
-                            "작업 내용": st.column_config.TextColumn("작업 내용", width="medium"),
-                            "작업등급": st.column_config.TextColumn("작업등급", width="small"),
-                            "재해유형": st.column_config.TextColumn("재해유형", width="medium"),
-                            "세부 위험요인": st.column_config.TextColumn("세부 위험요인", width="large"),
-                            "위험등급-개선전": st.column_config.TextColumn("위험등급-개선전", width="small"),
-                            "위험성 감소대책": st.column_config.TextColumn("위험성 감소대책", width="large"),
-                            "위험등급-개선후": st.column_config.TextColumn("위험등급-개선후", width="small")
-                        }
+        with tab2:
+            st.subheader("작업 내용 분석")
+            if sections.get("work_analysis"):
+                st.markdown(sections["work_analysis"])
+                if "work_analysis" in section_files:
+                    st.download_button(
+                        label="📥 작업 분석 다운로드 (.md)",
+                        data=section_files["work_analysis"].encode('utf-8-sig'),
+                        file_name=f"작업분석_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+                        mime="text/markdown",
+                        key="work_analysis_download"
                     )
+            else:
+                st.info("작업 분석 내용을 찾을 수 없습니다.")
+    
+        with tab3:
+            st.subheader("위험성 평가표")
+            if sections.get("risk_table"):
+                # 위험성 평가표를 DataFrame으로 추출
+                try:
+                    risk_df, risk_styles = load_risk_table(result.get('assessment_id', ''), result['full_report'])
+                    if not risk_df.empty:
+                        st.markdown("### 📋 위험성 평가 표 (데이터프레임)")
+                        render_risk_table(risk_df, risk_styles, key="result_risk_table")
 
-                    # 다운로드 버튼들을 나란히 배치
-                    col1, col2, col3 = st.columns(3)
-                    with col2:
-                        md_table_content = f"""# 위험성 평가표
+                        # 다운로드 버튼들을 나란히 배치
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col2:
+                            md_table_content = f"""# 위험성 평가표
 
 작업 설명: {result['work_description']}
 생성 시간: {result['timestamp']}
 
 {sections["risk_table"]}
 """
-                        st.download_button(
-                            label="📄 위험성 평가표 MD 다운로드",
-                            data=md_table_content.encode('utf-8-sig'),
-                            file_name=f"위험성평가표_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                            mime="text/markdown",
-                            key="risk_table_md_download"
-                        )
-                    with col3:
-                        # 엑셀 다운로드 버튼 추가
-                        import io
-                        excel_buffer = io.BytesIO()
-                        with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-                            risk_df.to_excel(writer, index=False, sheet_name='위험성평가표')
-                        excel_buffer.seek(0)
-                        st.download_button(
-                            label="📊 위험성 평가표 Excel 다운로드",
-                            data=excel_buffer.getvalue(),
-                            file_name=f"위험성평가표_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            key="risk_table_excel_download"
-                        )
-                else:
-                    st.info("위험성 평가표를 추출할 수 없습니다.")
-            except Exception as e:
-                st.warning(f"⚠️ 위험성 평가표 파싱 중 오류: {str(e)}")
-        else:
-            st.info("위험성 평가표 내용을 찾을 수 없습니다.")    
+                            st.download_button(
+                                label="📄 위험성 평가표 MD 다운로드",
+                                data=md_table_content.encode('utf-8-sig'),
+                                file_name=f"위험성평가표_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+                                mime="text/markdown",
+                                key="risk_table_md_download"
+                            )
+                        with col3:
+                            # 엑셀 다운로드 (위험성평가표 등급 서식 + 작업분석/안전조치/체크리스트 시트)
+                            st.download_button(
+                                label="📊 위험성 평가표 Excel 다운로드",
+                                data=build_excel_report(result),
+                                file_name=f"위험성평가표_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                key="risk_table_excel_download"
+                            )
+                        with col4:
+                            # SKONS 위험성평가양식에 채운 엑셀 다운로드
+                            try:
+                                template_bytes, template_name = build_template_report(result)
+                                st.download_button(
+                                    label="📑 SKONS 양식 Excel 다운로드",
+                                    data=template_bytes,
+                                    file_name=f"위험성평가양식_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                    help=f"양식: {template_name}",
+                                    key="risk_table_template_download"
+                                )
+                            except Exception as e:
+                                st.caption(f"양식 내보내기 불가: {str(e)}")
+                    else:
+                        st.info("위험성 평가표를 추출할 수 없습니다.")
+                except Exception as e:
+                    st.warning(f"⚠️ 위험성 평가표 파싱 중 오류: {str(e)}")
+            else:
+                st.info("위험성 평가표 내용을 찾을 수 없습니다.")    
 
-    with tab4:
-        st.subheader("안전 조치 사항")
-        col1, col2 = st.columns(2)
+        with tab4:
+            st.subheader("안전 조치 사항")
+            col1, col2 = st.columns(2)
         
-        with col1:
-            st.markdown("**추가 안전 조치**")
-            if sections.get("additional_safety"):
-                st.markdown(sections["additional_safety"])
-            else:
-                st.info("추가 안전 조치 내용을 찾을 수 없습니다.")
+            with col1:
+                st.markdown("**추가 안전 조치**")
+                if sections.get("additional_safety"):
+                    st.markdown(sections["additional_safety"])
+                else:
+                    st.info("추가 안전 조치 내용을 찾을 수 없습니다.")
         
-        with col2:
-            st.markdown("**작업 전 체크리스트**")
-            if sections.get("safety_checklist"):
-                st.markdown(sections["safety_checklist"])
-            else:
-                st.info("체크리스트 내용을 찾을 수 없습니다.")
+            with col2:
+                st.markdown("**작업 전 체크리스트**")
+                if sections.get("safety_checklist"):
+                    st.markdown(sections["safety_checklist"])
+                else:
+                    st.info("체크리스트 내용을 찾을 수 없습니다.")
     
-    # 전체 섹션 ZIP 파일로 다운로드
-    if section_files:
-        st.markdown("---")
-        st.subheader("📦 전체 결과 통합 다운로드")
+        # 전체 섹션 ZIP 파일로 다운로드
+        if section_files:
+            st.markdown("---")
+            st.subheader("📦 전체 결과 통합 다운로드")
         
-        # ZIP 파일 생성
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file_name, content in section_files.items():
-                korean_names = {
-                    "work_analysis": "1.작업분석",
-                    "risk_table": "2.위험성평가표",
-                    "additional_safety": "3.추가안전조치",
-                    "safety_checklist": "4.작업전체크리트"
-                }
-                zip_file.writestr(
-                    f"{korean_names.get(file_name, file_name)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                    content.encode('utf-8-sig')
+            bundle_stamp = datetime.strptime(result['timestamp'], '%Y-%m-%d %H:%M:%S').strftime('%Y%m%d_%H%M%S')
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    label="📁 전체 결과 ZIP 다운로드",
+                    data=build_zip_report(result),
+                    file_name=f"위험성평가결과_{bundle_stamp}.zip",
+                    mime="application/zip",
+                    key="zip_download"
                 )
-            
-            # 전체 보고서도 포함
-            full_report_content = f"# 작업 위험성 평가 보고서\n\n"
-            full_report_content += f"**작업 내용:** {result['work_description']}\n\n"
-            full_report_content += f"**사용된 참조 파일:** {', '.join(result.get('used_references', []))}\n\n"
-            full_report_content += f"**생성 시간:** {result['timestamp']}\n\n"
-            full_report_content += result['full_report']
-            
-            zip_file.writestr(
-                f"0.전체보고서_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
-                full_report_content.encode('utf-8-sig')
+            with col2:
+                # 현장 출력/서명용 PDF
+                pdf_status = risk_report_pdf.pdf_export_status(PDF_FONT_PATH)
+                if pdf_status:
+                    st.caption(f"PDF 내보내기 불가: {pdf_status}")
+                else:
+                    st.download_button(
+                        label="🖨️ 위험성 평가서 PDF 다운로드",
+                        data=build_pdf_report(result),
+                        file_name=f"위험성평가서_{bundle_stamp}.pdf",
+                        mime="application/pdf",
+                        key="pdf_download"
+                    )
+
+# 5. 참조자료 커버리지 대시보드
+with st.expander("📈 참조자료 커버리지 대시보드"):
+    analytics = get_coverage_analytics()
+    refresh_start = datetime.now()
+    analytics.refresh()
+    refresh_ms = (datetime.now() - refresh_start).total_seconds() * 1000
+
+    if analytics.row_count == 0:
+        st.info("저장된 위험성 평가 이력이 없습니다. 분석을 수행하면 자동으로 집계됩니다.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("누적 평가 수", f"{analytics.assessment_count:,}")
+        col2.metric("누적 위험요인 행", f"{analytics.row_count:,}")
+        col3.metric("집계 갱신 시간", f"{refresh_ms:.0f} ms")
+
+        coverage = analytics.summary(top_n=20)
+        dash_tab1, dash_tab2, dash_tab3, dash_tab4 = st.tabs([
+            "📌 자주 매칭된 작업",
+            "⚠️ 자주 매칭된 위험요인",
+            "🚨 C3/C4 누락 위험요인",
+            "🗂️ 평가 이력"
+        ])
+        with dash_tab1:
+            st.dataframe(coverage["work_items"], use_container_width=True, hide_index=True)
+        with dash_tab2:
+            st.dataframe(coverage["hazards"], use_container_width=True, hide_index=True)
+        with dash_tab3:
+            if coverage["missing"].empty:
+                st.success("✅ 누락된 C3/C4 위험요인이 없습니다.")
+            else:
+                st.dataframe(coverage["missing"], use_container_width=True, hide_index=True)
+        with dash_tab4:
+            # 현재 페이지의 행만 이력 파일에서 읽어서 표시
+            start, end = page_bounds(analytics.row_count, key="history_rows")
+            history_page = pd.read_csv(
+                RISK_HISTORY_FILE,
+                skiprows=range(1, start + 1),
+                nrows=end - start,
+                dtype=str,
+                keep_default_na=False,
+                encoding='utf-8'
             )
-        
-        zip_buffer.seek(0)
-        
-        st.download_button(
-            label="📁 전체 결과 ZIP 다운로드",
-            data=zip_buffer.getvalue(),
-            file_name=f"위험성평가결과_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-            mime="application/zip",
-            key="zip_download"
+            history_page = to_compact_risk_frame(history_page)
+            st.dataframe(
+                history_page.style.apply(lambda _: risk_grade_styles(history_page), axis=None),
+                use_container_width=True,
+                hide_index=True,
+                column_config=risk_table_column_config()
+            )
+
+            # 기간별 일괄 내보내기 (여러 평가를 하나의 통합문서로)
+            st.markdown("**📦 기간별 일괄 내보내기**")
+            export_range = st.date_input("내보낼 기간", value=(datetime.now().date(), datetime.now().date()), key="history_export_range")
+            if isinstance(export_range, (list, tuple)) and len(export_range) == 2:
+                export_start, export_end = [day.isoformat() for day in export_range]
+                if st.button("📊 기간별 Excel 생성", key="history_excel_build"):
+                    with st.spinner("엑셀 파일을 생성하고 있습니다..."):
+                        with build_excel_file(iter_history_assessments(export_start, export_end), include_assessment_columns=True) as output:
+                            st.download_button(
+                                label="📥 기간별 위험성 평가 Excel 다운로드",
+                                data=output.read(),
+                                file_name=f"위험성평가이력_{export_start}_{export_end}.xlsx",
+                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                key="history_excel_download"
+                            )
+
+                if st.button("📁 기간별 ZIP 생성", key="history_zip_build"):
+                    with st.spinner("ZIP 파일을 생성하고 있습니다..."):
+                        with build_zip_file(iter_history_assessments(export_start, export_end), folders=True) as output:
+                            st.download_button(
+                                label="📥 기간별 위험성 평가 ZIP 다운로드",
+                                data=output.read(),
+                                file_name=f"위험성평가이력_{export_start}_{export_end}.zip",
+                                mime="application/zip",
+                                key="history_zip_download"
+                            )
+
+                if not risk_report_pdf.pdf_export_status(PDF_FONT_PATH) and st.button("🖨️ 기간별 PDF 생성", key="history_pdf_build"):
+                    with st.spinner("PDF 파일을 생성하고 있습니다..."):
+                        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as output:
+                            write_pdf_bundle(iter_history_assessments(export_start, export_end), output)
+                            output.seek(0)
+                            st.download_button(
+                                label="📥 기간별 위험성 평가서 PDF 다운로드 (ZIP)",
+                                data=output.read(),
+                                file_name=f"위험성평가서_{export_start}_{export_end}.zip",
+                                mime="application/zip",
+                                key="history_pdf_download"
+                            )
+
+                # SKONS 양식으로 일괄 채우기 (평가마다 양식 시트 1개)
+                template_files = sorted(os.path.basename(path) for path in glob.glob(os.path.join(REFERENCE_FILES_FOLDER, "*.xlsx")))
+                if template_files:
+                    template_file = st.selectbox(
+                        "양식 파일",
+                        options=template_files,
+                        index=template_files.index(DEFAULT_REFERENCE_FILE) if DEFAULT_REFERENCE_FILE in template_files else 0,
+                        key="history_template_file"
+                    )
+                    template_path = os.path.join(REFERENCE_FILES_FOLDER, template_file)
+                    template_sheets = list(load_reference_rows(template_path)["시트"].astype(str).unique())
+                    template_sheet = st.selectbox("양식 시트", options=template_sheets, key="history_template_sheet") if len(template_sheets) > 1 else (template_sheets[0] if template_sheets else "")
+                    if template_sheet and st.button("📑 기간별 SKONS 양식 생성", key="history_template_build"):
+                        with st.spinner("양식에 분석 결과를 채우고 있습니다..."):
+                            try:
+                                with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as output:
+                                    _, zipped = write_template_bundle(iter_history_assessments(export_start, export_end), output, template_path, template_sheet)
+                                    output.seek(0)
+                                    if zipped:
+                                        st.caption(f"분석 {TEMPLATE_WORKBOOK_MAX_SHEETS}건씩 나눈 양식 파일을 ZIP으로 묶었습니다.")
+                                    st.download_button(
+                                        label="📥 기간별 SKONS 양식 다운로드" + (" (ZIP)" if zipped else ""),
+                                        data=output.read(),
+                                        file_name=f"위험성평가양식_{export_start}_{export_end}.{'zip' if zipped else 'xlsx'}",
+                                        mime="application/zip" if zipped else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                        key="history_template_download"
+                                    )
+                            except ValueError as e:
+                                st.warning(f"⚠️ {str(e)}")
+
+# 6. 모델 응답 지연 통계
+with st.expander("⏱️ 모델 응답 지연 통계"):
+    hedge_stats = get_hedge_policy().snapshot()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("응답시간 p50", f"{hedge_stats['p50']:.1f}초" if hedge_stats['p50'] is not None else "-")
+    col2.metric("응답시간 p95", f"{hedge_stats['p95']:.1f}초" if hedge_stats['p95'] is not None else "-")
+    col3.metric("헤지 전송 기준", f"{hedge_stats['hedge_delay']:.1f}초")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("전체 요청", hedge_stats['requests'])
+    col2.metric("헤지 전송", hedge_stats['hedges_fired'], help=f"헤지 요청이 먼저 응답: {hedge_stats['hedge_wins']}회 / 혼잡으로 생략: {hedge_stats['hedges_skipped']}회")
+    col3.metric("마감 초과", hedge_stats['deadline_exceeded'])
+    col4.metric("대체 결과", hedge_stats['fallback_model'] + hedge_stats['fallback_reference'], help=f"보조 모델: {hedge_stats['fallback_model']}회 / 참조자료 기반: {hedge_stats['fallback_reference']}회")
+
+# 7. 모델 백엔드 벤치마크
+with st.expander("🧪 모델 백엔드 벤치마크"):
+    backends = available_model_backends()
+    st.caption(f"현재 백엔드: `{MODEL_BACKEND}` · 사용 가능: {', '.join(backends.keys()) or '없음'}")
+    benchmark_backends = st.multiselect("비교할 백엔드", options=list(backends.keys()), default=list(backends.keys()))
+    benchmark_input = st.text_area(
+        "벤치마크 작업 내용 (한 줄에 하나씩)",
+        value="오늘 철탑에서 안테나 재설치 작업이 있어 위험성 평가 안내해줘\n지하 맨홀에서 케이블 교체 작업을 진행할 예정입니다",
+        height=80
+    )
+    if st.button("▶️ 벤치마크 실행", disabled=not (benchmark_backends and st.session_state['reference_files'])):
+        work_descriptions = [line.strip() for line in benchmark_input.splitlines() if line.strip()]
+        with st.spinner("백엔드별로 분석을 실행하고 있습니다..."):
+            benchmark_df = benchmark_model_backends(
+                work_descriptions,
+                list(st.session_state['reference_files'].keys()),
+                {name: backends[name] for name in benchmark_backends}
+            )
+        st.dataframe(benchmark_df, use_container_width=True, hide_index=True)
+        if "응답시간(초)" in benchmark_df:
+            st.dataframe(
+                benchmark_df.groupby("백엔드")[["응답시간(초)", "위험요인 수", "C2~C4 포함률(%)"]].mean(numeric_only=True).round(2),
+                use_container_width=True
+            )
+
+# 8. 임베딩 색인
+with st.expander("🧭 임베딩 색인 (유사 작업 검색)"):
+    embedding_meta_path = os.path.join(EMBEDDING_INDEX_FOLDER, "meta.json")
+    if os.path.exists(embedding_meta_path):
+        saved_index = load_embedding_index(EMBEDDING_INDEX_FOLDER, os.path.getmtime(embedding_meta_path))
+        st.caption(
+            f"색인: {saved_index.meta['encoder']} · 작업 {len(saved_index.work_items)}개 · {saved_index.meta['dim']}차원 · "
+            f"생성 {saved_index.meta['created']}" + (" · ⚠️ 참조 파일이 바뀌어 다시 생성이 필요합니다" if saved_index.stale else "")
+        )
+    else:
+        st.caption("저장된 임베딩 색인이 없습니다.")
+    st.caption(
+        f"분석 시 후보 선정: {'임베딩 색인' if EMBEDDING_RETRIEVAL else '문자 매칭'} (EMBEDDING_RETRIEVAL) · "
+        f"임베딩 모델: {EMBEDDING_MODEL_NAME or HashedNgramEncoder.name}"
+        + ("" if SentenceTransformer is not None or not EMBEDDING_MODEL_NAME else " (sentence-transformers 미설치로 해시 n-gram 사용)")
+    )
+    embedding_queries = st.text_area(
+        "벤치마크 작업 내용 (한 줄에 하나씩)",
+        value="오늘 철탑에서 안테나 재설치 작업이 있어 위험성 평가 안내해줘\n지하 맨홀에서 케이블 교체 작업을 진행할 예정입니다\n스카이차 타고 가로등 옆 광케이블 정비",
+        height=80,
+        key="embedding_benchmark_queries"
+    )
+    if st.button("🔨 색인 생성 및 벤치마크", key="embedding_build"):
+        with st.spinner("임베딩 색인을 생성하고 있습니다..."):
+            embedding_benchmark = benchmark_embedding_index(
+                load_all_reference_rows(),
+                [line.strip() for line in embedding_queries.splitlines() if line.strip()],
+                top_n=PROMPT_CANDIDATE_COUNT
+            )
+        build_stats = embedding_benchmark["build"]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("색인 생성", f"{build_stats['build_seconds']:.2f}초")
+        col2.metric("작업 수", build_stats['items'])
+        col3.metric("차원", build_stats['dim'])
+        st.dataframe(embedding_benchmark["queries"], use_container_width=True, hide_index=True)
+
+# 9. 서버 준비 상태
+with st.expander("🚀 서버 준비 상태 (워밍업)"):
+    warmup_status = server_warmup.snapshot()
+    if warmup_status["status"] == "ready":
+        st.success(f"✅ 서버 준비 완료 · 시작 준비 시간 {warmup_status['startup_seconds']:.1f}초")
+    else:
+        st.info(f"⏳ 서버 준비 중입니다. (경과 {warmup_status['startup_seconds']:.1f}초)")
+    if warmup_status["stages"]:
+        st.dataframe(
+            pd.DataFrame([
+                {"단계": stage, "소요 시간(초)": seconds, "결과": json.dumps(warmup_status["details"].get(stage, {}), ensure_ascii=False),
+                 "오류": warmup_status["errors"].get(stage, "")}
+                for stage, seconds in warmup_status["stages"].items()
+            ]),
+            use_container_width=True, hide_index=True
+        )
+    if warmup_status["errors"].get("health_server"):
+        st.warning(f"⚠️ 헬스 서버를 시작하지 못했습니다: {warmup_status['errors']['health_server']}")
+    elif HEALTH_PORT:
+        st.caption(f"헬스 확인: `http://<서버>:{HEALTH_PORT}/healthz` · 준비 확인: `http://<서버>:{HEALTH_PORT}/readyz`")
+    if SHARED_STORE_FOLDER:
+        st.caption(
+            f"작업 프로세스 공유 저장소: `{SHARED_STORE_FOLDER}` (프로세스 {os.getpid()}) · "
+            "참조자료 행/검색 색인은 메모리 매핑 파일로 한 번만 생성하고, 분석 결과 캐시는 SQLite로 공유합니다."
         )
+    else:
+        st.caption("단일 프로세스 모드 · 여러 서버 프로세스를 띄울 때는 SHARED_STORE_FOLDER를 같은 폴더로, HEALTH_PORT는 프로세스마다 다르게 지정하세요.")
+
+# 10. 참조자료 버전 및 변경 비교
+with st.expander("🗂️ 참조자료 버전 및 변경 비교"):
+    st.caption("참조자료는 행 단위로 버전을 기록합니다. 행을 고치면 그 행(또는 그 작업)에 의존한 분석 결과만 캐시에서 다시 분석되고, 나머지 결과는 그대로 재사용됩니다.")
+    version_files = [
+        name for name, file_info in st.session_state['reference_files'].items()
+        if os.path.splitext(name)[1].lower() in ('.xlsx', '.csv')
+    ]
+    if not version_files:
+        st.info("버전을 기록할 참조 파일이 없습니다.")
+    else:
+        version_file = st.selectbox("참조 파일", version_files, key="version_file")
+        try:
+            version_path = st.session_state['reference_files'][version_file]['path']
+            current_version = reference_row_versions(version_path).attrs["version"] if os.path.exists(version_path) else None
+            recorded_versions = list_reference_versions(version_file)
+        except Exception as e:
+            st.warning(f"⚠️ 참조자료 버전 확인 중 오류: {str(e)}")
+            current_version, recorded_versions = None, []
+        if len(recorded_versions) < 2:
+            st.info(f"현재 버전 `{current_version or '-'}` · 비교할 이전 버전이 없습니다. (파일을 수정한 뒤 '파일 새로고침'을 누르면 새 버전이 기록됩니다)")
+        else:
+            version_labels = {
+                item["version"]: f"{item['version']} (수정 {item['modified']}, {item['rows']}행)"
+                for item in recorded_versions
+            }
+            version_ids = list(version_labels)
+            col1, col2 = st.columns(2)
+            with col1:
+                old_version = st.selectbox("이전 버전", version_ids, index=len(version_ids) - 2,
+                                           format_func=version_labels.get, key="old_reference_version")
+            with col2:
+                new_version = st.selectbox("비교 버전", version_ids, index=version_ids.index(current_version) if current_version in version_ids else len(version_ids) - 1,
+                                           format_func=version_labels.get, key="new_reference_version")
+            changes = diff_reference_versions(
+                load_reference_version(version_file, old_version), load_reference_version(version_file, new_version)
+            )
+            if changes.empty:
+                st.success("두 버전의 참조 행이 같습니다.")
+            else:
+                change_counts = changes["변경"].value_counts()
+                st.markdown(" · ".join(f"**{change}** {change_counts[change]}행" for change in ["추가", "변경", "삭제"] if change in change_counts))
+                st.dataframe(changes.drop(columns=["row_id"]), use_container_width=True, hide_index=True)
+                affected = assessments_affected_by_changes(version_file, changes, new_version)
+                if affected.empty:
+                    st.caption("변경된 행에 의존한 저장된 분석 결과가 없습니다.")
+                else:
+                    st.warning(f"⚠️ 변경된 행에 의존한 저장된 분석 결과 {len(affected)}건 (캐시에서는 다음 요청 때 다시 분석됩니다)")
+                    st.dataframe(affected, use_container_width=True, hide_index=True)
 
 # 사용법 안내
 with st.expander("📖 사용법 안내"):